@@ -1,6 +1,5 @@
 __author__ = 'montanawong'
 
-from random import uniform
 from bots.bot import Bot
 from .strategy import HeadsUpStrategy
 
@@ -28,24 +27,36 @@ class MyBot(Bot):
     num_bets              int; the number of bets your bot has made in the current game
     num_checks            int; the number of checks your bot has made in the current game
     num_raises            int; the number of raises your bot has made in the current game
+    recorder              ContextRecorder or None; when set, records every context for replays
+    time_bank             float or None; seconds the engine's clock allows the bot per match, handed to the
+                          strategy's scheduler at the start of every match (see utils/budget.py); unlimited if None
+    equity_cache          str, True or None; database of the persistent equity cache the strategy reads exact
+                          flop/turn percepts from and saves them to (see utils/equity_cache.py), opened before the
+                          first action: True for the default file in the data directory, None (the default) to go
+                          without
 
     FUNCTIONS:
     get_action()          send an action to the engine for the hand
     get_memory()          send a memory dictionary to the engine
-    set_memory()          receive a memory dictionary from the engine
+    open_equity_cache()   open the persistent equity cache for the strategy
+    set_memory()          receive a memory dictionary from the engine, and load opponent profiles
     set_pocket()          receive your cards from the engine
     ====================  ====================================================
     """
 
-    def __init__(self, name=None):
+    def __init__(self, name=None, seed=None, time_bank=None, equity_cache=None):
         super().__init__(name)
-        self.strategy = HeadsUpStrategy()
-        self.aggression_factor = round(1 / uniform(0.5, 0.9))
+        self.strategy = HeadsUpStrategy(seed=seed)
+        self.time_bank = time_bank
+        self.strategy.scheduler.time_bank = time_bank
+        self.equity_cache = equity_cache
+        self.aggression_factor = round(1 / self.strategy.rng.decision.uniform(0.5, 0.9))
         self.player_index = None
         self.num_bets = 0
         self.num_checks = 0
         self.num_raises = 0
         self.notes = None
+        self.recorder = None
 
     def get_memory(self):
         """
@@ -68,9 +79,28 @@ class MyBot(Bot):
                 action (LegalAction) returns the best determined action based on the bot's interpretation of the current
                         game state and strategy.
         """
+        if self.recorder is not None:
+            self.recorder.record(context, self)
+        if self.equity_cache is not None and self.strategy.equity_cache is None:
+            self.open_equity_cache()
         action = self.strategy.determine_action(context, self)
         return action
 
+    def open_equity_cache(self):
+        """
+        Opens the persistent equity cache for the strategy, shared by every bot of the process and flushed when
+        it exits. A cache that can't be opened, e.g. on a read-only disk, is gone without.
+
+        :return: (void)
+        """
+        import sqlite3
+        from .utils.equity_cache import get_equity_cache
+
+        try:
+            self.strategy.equity_cache = get_equity_cache(None if self.equity_cache is True else self.equity_cache)
+        except (sqlite3.Error, OSError):
+            self.equity_cache = None
+
     def set_pocket(self, card1, card2):
         """
         @Override
@@ -85,7 +115,18 @@ class MyBot(Bot):
         """
         @Override
 
+        Called at the start of a match. Besides the notes, loads the profiles of opponents built offline from
+        past match logs (see utils/profiles.py), so the strategy can read the opponent's moves from the first hand,
+        and resets the scheduler's clock to the match's time_bank.
+
         :param notes:
         :return:
         """
+        from .utils.profiles import load_profiles
+
         self.notes = notes
+        # a new match, with a full clock
+        self.strategy.scheduler.time_bank = self.time_bank
+        self.strategy.profiles = load_profiles()
+        # the range tracker holds the profiles it was created with
+        self.strategy.ranges = None
@@ -1,18 +1,31 @@
 __author__ = 'montanawong'
 
 from deuces3x.deuces.card import Card
-from deuces3x.deuces.deck import Deck
 from api import LegalFold, LegalRaise, LegalCall, LegalBet, LegalCheck
-from deuces3x.deuces.evaluator import Evaluator
-from random import uniform, random, shuffle
-from math import sqrt
-from .utils.prediction import generate_possible_hands as gen_hands, \
-                                generate_possible_boards as gen_boards, \
-                                EPSILON, \
+from time import perf_counter
+from .utils.prediction import EPSILON, \
                                 load_cache
-
-
-FULL_DECK = set(Deck().GetFullDeck())
+from .utils.rng import StrategyRandom
+from .utils.budget import ComputeScheduler, LOOKUP, EXACT, MIN_SAMPLES
+
+# NumPy and the table backed helpers in utils are imported where they are first used, so that
+# importing the bot stays cheap. See utils/startup.py to load them ahead of the first action.
+
+# share of all pockets we assume an opponent goes all-in with pre-flop
+PREFLOP_ALL_IN_RANGE = 0.35
+# number of bet/raise amounts weighed by size_wager
+WAGER_GRID_SIZE = 32
+# a larger bet/raise is only picked if its value is better by this share of the pot
+WAGER_TOLERANCE = 0.01
+# share of the pot a bet/raise of the highest risk must make up for, see size_wager
+RISK_AVERSION = 0.1
+# how much less of their range the opponent calls a bigger bet/raise with, see size_wager: at 1 they would call
+# just enough that no bluff profits whatever its size, below 1 they call more and bluffs lose more the bigger they are
+CALL_ELASTICITY = 0.75
+# largest bet/raise weighed by size_wager, in pots on top of the amount to call
+MAX_WAGER_POTS = 2
+# TableStrategy bets/raises for value once its equity is this many times its fair share of the pot
+VALUE_MARGIN = 1.5
 
 
 class PokerStrategy(object):
@@ -24,8 +37,11 @@ class PokerStrategy(object):
     ====================  =====================================================
 
     DATA:
-    evaluator             Evaluator; an Evaluator object from the deuces module that allows
-                          your strategy to check the strength of the bot's hand.
+    backend               str; which evaluator the strategy uses, the table based 'seven_card' by default or
+                          'deuces', kept for A/B runs against it
+    rng                   StrategyRandom; seedable random streams for decisions and simulations
+    evaluator             Evaluator; the process wide Evaluator of the backend that allows
+                          your strategy to check the strength of the bot's hand. Built on first use.
 
     FUNCTIONS:
     determine_action()                 determine which action the bot should take given the situation
@@ -37,8 +53,17 @@ class PokerStrategy(object):
     create_action()                    creates a LegalAction object or one of its subclasses, given action data
     ====================  ====================================================
     """
-    def __init__(self):
-        self.evaluator = Evaluator()
+    def __init__(self, backend='seven_card', seed=None):
+        self.backend = backend
+        # separate seedable streams for decision noise and simulations
+        self.rng = StrategyRandom(seed)
+
+    @property
+    def evaluator(self):
+        # the evaluator's lookup tables are shared by every strategy in the process and only
+        # built when a strategy first needs them
+        from .utils.evaluation import get_evaluator
+        return get_evaluator(self.backend)
 
     def determine_action(self, context, bot):
         """
@@ -255,62 +280,97 @@ class HeadsUpStrategy(PokerStrategy):
     evaluator             Evaluator; an Evaluator object from the deuces module that allows
                           your strategy to check the strength of the bot's hand/pocket
     do                    dict; The dictionary that we write our actions and action meta data to.
+    percepts              dict; The hand strength and potential the last decision was based on, and the
+                          seconds spent on the potential.
+    tracer                DecisionTracer or None; when set, every decision is recorded to it (see utils/trace.py)
+    abstraction           boolean; allow hand potentials to be looked up from the bucketed abstraction of the street
+                          when it has been built (see utils/abstraction.py)
+    scheduler             ComputeScheduler; gives every decision a time budget and picks how hand potential is
+                          estimated to fit it (see utils/budget.py)
+    budget                Budget or None; the budget of the last decision
+    equity_cache          EquityCache or None; when set, exact flop/turn percepts are looked up in and saved to
+                          it, so they outlive the process (see utils/equity_cache.py)
+    track_ranges          boolean; narrow the opponent's range by their moves in the hand, rather than assume
+                          they may hold any pocket (see utils/ranges.py)
+    ranges                RangeTracker or None; the opponent's range in the current hand, created on first use
+    profiles              dict; player name -> profile built from past matches, calibrates how their moves narrow
+                          their range (see utils/profiles.py)
+    policy                PolicyTable or None; when set, actions are sampled from this compiled table of the rules
+                          rather than decided by them (see utils/policy.py)
     FUNCTIONS:
     calculate_hand_strength()            calculates the strength of a bot's hand/pocket at a given point in the game.
     calculate_effective_hand_strength()  improves the above calculation by factoring in negative/positive potential
     calculate_hand_potential()           calculates the positive and negative potential of a hand/pocket
+    potential_from_matrix()              turns the 3 * 3 matrix of hand potential counts into positive/negative potential
+    estimate_hand_potential()            estimates the potential of a hand/pocket from sampled runouts
+    lookup_hand_potential()              looks up the potential of a hand/pocket's bucket in the card abstraction
+    calculate_budgeted_potential()       calculates the potential of a hand/pocket with the method the budget picked
     calculate_risk()                     calculates the risk of a certain move
+    estimate_opponent_range()            weighs the pockets the opponent may hold
+    calculate_calling_equities()         estimates our equity against the hands the opponent calls a bet/raise with
+    size_wager()                         picks the bet/raise size with the best expected value
+    calculate_all_in_equity()            calculates our exact equity on the turn or river if all the chips go in
     do_bet()                             determines whether or not a bet is the best course of action given the situation
     do_call()                            determines whether or not a call is the best course of action given the situation
     do_raise()                           determines whether or not a raise is the best course of action given the situation
     determine_action()                   determine which action the bot should take given the situation
     determine_pre_flop_action()          determine which action the bot should take pre-flop given the situation.
+    choose_action()                      picks the action for the percepts from the compiled policy or the rules
+    apply_rules()                        the rules deciding the action once the percepts are known
     simulate_games()                     simulates n iterations of a poker game pre-flop to calculate win/lose ratio of a hand
+    trace_decision()                     records the decision that was just made and the time it took
     ====================  ====================================================
     """
 
-    def __init__(self):
-        super().__init__()
-        self.evaluator = Evaluator()
+    def __init__(self, backend='seven_card', seed=None):
+        super().__init__(backend, seed)
         self.do = dict()
-
-    def calculate_hand_strength(self, board, pocket):
+        self.percepts = dict()
+        self.tracer = None
+        self.abstraction = True
+        self.scheduler = ComputeScheduler(backend=backend)
+        self.budget = None
+        self.equity_cache = None
+        self.track_ranges = True
+        self.ranges = None
+        self.profiles = dict()
+        self.policy = None
+
+    def calculate_hand_strength(self, board, pocket, weights=None):
         """
         Calculates hand strength by evaluating the current hand/pocket & visible board with every possible
         combination of hands the opponent may have. The algorithm is inspired by a similar one used by
         AI researchers at the University of Alberta. The literature is contained at this link:
         http://poker.cs.ualberta.ca/publications/billings.phd.pdf - see page 45
 
+        The opponent's hands are counted from a sorted, cached rank index of the board (see
+        utils/board_index.py) rather than evaluated on every call. Given the weights of the opponent's range, their
+        hands are weighted by them instead of counted.
+
         :param board: (list) a list of 3-5 Card objects that depict the current visible game board
         :param pocket: (list) a list of 2 Card objects that depict the bot's current hand
+        :param weights: (ndarray) weights of the opponent's pockets, see estimate_opponent_range(); every pocket
+                        counts the same if None
 
         :return:
                 hand_strength: (float) an irrational number between 0 and 1 and represents the
                                 strength of the current hand/pocket with respect to the current board.
         """
 
-        ahead = 0
-        behind = 0
-        tied = 0
-
         # map each card in our pocket/hand and board from its str to integer representation
         curr_pocket = list(map(Card.new, pocket))
         board = list(map(Card.new, board))
-        hand_rank = self.evaluator.evaluate(curr_pocket, board)
 
-        #consider all combinations of cards that the opponent can have and rank ours against his/hers
-        other_pockets = gen_hands(curr_pocket + board)
-
-        # iterate through all possible opponent's hands
-        for other_pocket in other_pockets:
-            other_rank = self.evaluator.evaluate(other_pocket, board)
-            #lower rank means stronger hand
-            if hand_rank < other_rank:
-                ahead += 1
-            elif hand_rank == other_rank:
-                tied += 1
-            else:
-                behind += 1
+        # every possible opponent's hand on this board is ranked once and shared between decisions and bots,
+        # ours is ranked against them with a binary search
+        from .utils.board_index import get_board_index
+        if weights is not None:
+            from .utils.cards import pocket_index
+            return float(get_board_index(board, self.evaluator).range_equities(weights)[pocket_index(curr_pocket)])
+        behind, tied, ahead = get_board_index(board, self.evaluator).count(
+            self.evaluator.evaluate(curr_pocket, board),
+            curr_pocket
+        )
         hand_strength = (ahead + (tied / 2.0)) / (ahead + tied + behind)
         return hand_strength
 
@@ -364,53 +424,63 @@ class HeadsUpStrategy(PokerStrategy):
         opponents before generating possible boards, but became the stronger hand after.
         The others follow the same logic.
 
-        :param board: (list) a list of 3-5 Card objects that depict the current visible game board
+        Our rank after every next card is evaluated once, and the opponent's in a single next card *
+        pocket matrix, so the counts are a few array comparisons rather than a loop over every pocket.
+
+        :param board: (list) a list of 3-4 Card objects that depict the current visible game board
         :param pocket: (list) a list of 2 Card objects that depict the bot's current hand
 
         :return:
                 (list) containing the positive potential and negative potential respectively.
         """
+        import numpy as np
+        from .utils.board_index import get_board_index
+        from .utils.cards import DECK, POCKETS, live_pockets
+
         AHEAD = 0
         TIED = 1
         BEHIND = 2
 
-        #init 3*3 array with 0's
-        hand_potential = [[0] * 3 for i in range(3)]
-        hp_total = [0] * 3
-
         # convert cards from string to int representation
         curr_pocket = list(map(Card.new, pocket))
         board = list(map(Card.new, board))
 
         hand_rank = self.evaluator.evaluate(curr_pocket, board)
-        # generate set of all possible pockets the opponent can have
-        other_pockets = gen_hands(curr_pocket + board)
-
-        index = None
-        # go through each possible pocket the opponent has and evaluate it against the bots
-        for other_pocket in other_pockets:
-            other_rank = self.evaluator.evaluate(other_pocket, board)
-            #lower rank means stronger hand
-            if hand_rank < other_rank:
-                index = AHEAD
-            elif hand_rank == other_rank:
-                index = TIED
-            else:
-               index = BEHIND
+        # every possible pocket of the opponent, ranked once from the board's cached rank index
+        other_pockets = np.flatnonzero(live_pockets(curr_pocket + board))
+        other_ranks = get_board_index(board, self.evaluator).pocket_ranks[other_pockets]
+
+        # every possible next card, our rank after it doesn't depend on the opponent's pocket
+        deck = np.setdiff1d(DECK, curr_pocket + board)
+        possible_boards = np.column_stack([np.tile(np.asarray(board, dtype=np.int64), (len(deck), 1)), deck])
+        our_best = self.evaluator.evaluate_boards(curr_pocket, possible_boards)
+        # next card * opponent's pocket ranks, 0 where the next card is in the pocket
+        other_best = self.evaluator.evaluate_runouts(POCKETS[other_pockets], possible_boards)
+
+        # lower rank means stronger hand
+        before = np.where(hand_rank < other_ranks, AHEAD, np.where(hand_rank == other_ranks, TIED, BEHIND))
+        after = np.where(our_best[:, None] < other_best, AHEAD,
+                         np.where(our_best[:, None] == other_best, TIED, BEHIND))
+        dealt = other_best > 0
+        hand_potential = np.bincount((3 * before + after)[dealt], minlength=9).reshape(3, 3)
+
+        return HeadsUpStrategy.potential_from_matrix(hand_potential.tolist(), hand_potential.sum(axis=1).tolist())
 
-            # check all possible future boards
-            for possible_board in gen_boards(board, curr_pocket + other_pocket):
+    @staticmethod
+    def potential_from_matrix(hand_potential, hp_total):
+        """
+        Turns the 3 * 3 matrix of calculate_hand_potential() into the positive and negative potential.
 
-                our_best = self.evaluator.evaluate(curr_pocket, possible_board)
-                other_best = self.evaluator.evaluate(other_pocket, possible_board)
+        :param hand_potential: (list) 3 * 3 counts, rows are AHEAD, TIED, BEHIND before the next card and
+                               columns the same after it
+        :param hp_total: (list) the sum of every row
 
-                if our_best < other_best:
-                    hand_potential[index][AHEAD] += 1
-                elif our_best == other_best:
-                    hand_potential[index][TIED] += 1
-                else:
-                    hand_potential[index][BEHIND] += 1
-                hp_total[index] += 1
+        :return:
+                (list) containing the positive potential and negative potential respectively.
+        """
+        AHEAD = 0
+        TIED = 1
+        BEHIND = 2
 
         pos_potential = 0.0
         try:
@@ -430,6 +500,97 @@ class HeadsUpStrategy(PokerStrategy):
 
         return [pos_potential, neg_potential]
 
+    def estimate_hand_potential(self, board, pocket, samples):
+        """
+        Estimates the same positive and negative potential as calculate_hand_potential() from a random sample of
+        (opponent's pocket, next card) pairs instead of all of them, drawn from the strategy's Monte Carlo stream.
+        The opponent's current ranks come from the board's cached rank index, ours after every possible next card
+        are evaluated once, and theirs in a single batch.
+
+        :param board: (list) a list of 3-4 Card objects that depict the current visible game board
+        :param pocket: (list) a list of 2 Card objects that depict the bot's current hand
+        :param samples: (int) number of sampled runouts, the standard error shrinks with its square root
+
+        :return:
+                (list) containing the positive potential and negative potential respectively.
+        """
+        import numpy as np
+        from .utils.board_index import get_board_index
+        from .utils.cards import DECK, POCKETS, live_pockets
+
+        curr_pocket = list(map(Card.new, pocket))
+        board = list(map(Card.new, board))
+        rng = self.rng.monte_carlo
+
+        candidates = np.flatnonzero(live_pockets(curr_pocket + board))
+        opponents = candidates[rng.integers(len(candidates), size=samples)]
+        deck = np.setdiff1d(DECK, curr_pocket + board)
+        next_cards = rng.integers(len(deck), size=samples)
+        # the next card can't be in the opponent's pocket either, draw those again
+        clashes = np.flatnonzero((POCKETS[opponents] == deck[next_cards][:, None]).any(axis=1))
+        while len(clashes):
+            next_cards[clashes] = rng.integers(len(deck), size=len(clashes))
+            clashes = clashes[(POCKETS[opponents[clashes]] == deck[next_cards[clashes]][:, None]).any(axis=1)]
+
+        hand_rank = self.evaluator.evaluate(curr_pocket, board)
+        other_ranks = get_board_index(board, self.evaluator).pocket_ranks[opponents]
+        next_boards = np.column_stack([np.tile(np.asarray(board, dtype=np.int64), (len(deck), 1)), deck])
+        our_best = self.evaluator.evaluate_boards(curr_pocket, next_boards)[next_cards]
+        other_best = self.evaluator.evaluate_hands(np.column_stack([POCKETS[opponents], next_boards[next_cards]]))
+
+        # rows and columns are AHEAD, TIED, BEHIND before and after the next card, lower rank means stronger hand
+        before = (hand_rank == other_ranks) + 2 * (hand_rank > other_ranks)
+        after = (our_best == other_best) + 2 * (our_best > other_best)
+        hand_potential = np.bincount(3 * before + after, minlength=9).reshape(3, 3)
+        return HeadsUpStrategy.potential_from_matrix(hand_potential.tolist(), hand_potential.sum(axis=1).tolist())
+
+    def lookup_hand_potential(self, board, pocket):
+        """
+        Looks up the positive and negative potential of a hand from the card abstraction of the flop or turn.
+        Hands are bucketed offline by the histogram of their hand strength over the next card, so this is a
+        couple of array lookups instead of the enumeration done by calculate_hand_potential().
+
+        :param board: (list) a list of 3-4 Card objects that depict the current visible game board
+        :param pocket: (list) a list of 2 Card objects that depict the bot's current hand
+
+        :return:
+                (list) containing the positive potential and negative potential of the hand's bucket respectively,
+                None if the street hasn't been bucketed or the abstraction is turned off.
+        """
+        if not self.abstraction:
+            return None
+
+        from .utils.abstraction import get_abstraction
+        abstraction = get_abstraction(len(board))
+        if abstraction is None:
+            return None
+        percepts = abstraction.percepts(list(map(Card.new, pocket)), list(map(Card.new, board)))
+        if percepts is None:
+            return None
+        return [percepts[1], percepts[2]]
+
+    def calculate_budgeted_potential(self, board, pocket, budget):
+        """
+        Calculates the positive and negative potential of a hand with the method its compute budget allows:
+        a lookup in the card abstraction, Monte Carlo sampling or the exact enumeration.
+
+        :param board: (list) a list of 3-4 Card objects that depict the current visible game board
+        :param pocket: (list) a list of 2 Card objects that depict the bot's current hand
+        :param budget: (Budget) the plan of the decision from the scheduler
+
+        :return:
+                (list) containing the positive potential and negative potential respectively.
+        """
+        if budget.method == EXACT:
+            return self.calculate_hand_potential(board, pocket)
+        elif budget.method == LOOKUP:
+            potential = self.lookup_hand_potential(board, pocket)
+            if potential is not None:
+                return potential
+            # the board wasn't bucketed, e.g. in an abstraction built from a sample of boards
+            return self.estimate_hand_potential(board, pocket, MIN_SAMPLES)
+        return self.estimate_hand_potential(board, pocket, budget.samples)
+
     def calculate_risk(self, context, bot, bet_size, stack_size):
         """
         Calculates the 'risk' associated with a specific bet/raise action. The algorithm was inspired by
@@ -444,7 +605,7 @@ class HeadsUpStrategy(PokerStrategy):
         :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
                         including but not limited to move history, pot size, and players.
         :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
-        :param bet_size: (int) The size of the bet/raise that we are calculating risk for.
+        :param bet_size: (int or ndarray) The size of the bet/raise that we are calculating risk for, or an array of sizes.
         :param stack_size: (int) The size of the bot's current stack.
 
         :return:
@@ -453,22 +614,152 @@ class HeadsUpStrategy(PokerStrategy):
         """
         pot_size = context['pot']
         max_pot_size = context['pot'] + stack_size + self.check_stack_size(context, bot, our_stack=False)
-        risk = sqrt(
+        # a power rather than math.sqrt so that an array of bet sizes can be weighed at once
+        risk = (
             (4 / 3.0) *
             ((bet_size * (2 * bet_size + pot_size)) /
              (max_pot_size * (bet_size + pot_size)))
-        )
+        ) ** 0.5
 
         return risk
 
+    def estimate_opponent_range(self, context, bot):
+        """
+        Weighs how likely the opponent is to hold each pocket, given the moves they have made so far in the hand
+        (see utils/ranges.py). Every pocket is equally likely if track_ranges is off. The pockets that share a
+        card with the board or our pocket are removed wherever the range is used.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
+
+        :return:
+                (ndarray) a weight for each of the 1326 pockets in utils.cards.POCKETS
+        """
+        if not self.track_ranges:
+            import numpy as np
+            from .utils.cards import NUM_POCKETS
+            return np.ones(NUM_POCKETS)
+
+        if self.ranges is None:
+            from .utils.ranges import RangeTracker
+            self.ranges = RangeTracker(self.profiles)
+        return self.ranges.update(context, bot, self.evaluator).copy()
+
+    def calculate_calling_equities(self, context, bot, call_shares, hand_strength):
+        """
+        Estimates our equity against the hands the opponent calls a bet or raise with, assuming they call with
+        the strongest hands of their range.
+
+        On the river this is exact: the opponent's pockets are ranked strongest first by the board's rank index,
+        so a calling range is a prefix of them and our equity against every calling range is read from two
+        running sums of their weights. Before the river our hand strength is treated as the share of their range
+        we beat, and the hands we beat are the weakest ones, so against the strongest share c of their range our
+        equity is (hand strength - (1 - c)) / c.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
+        :param call_shares: (ndarray) The shares of their range the opponent calls with.
+        :param hand_strength: (float) The hand strength of our current hand/pocket.
+
+        :return:
+                equities (ndarray) Our equity against each calling range, between 0 and 1.
+        """
+        import numpy as np
+
+        if len(context['board']) < 5:
+            return np.clip((hand_strength - (1 - call_shares)) / call_shares, 0.0, 1.0)
+
+        from .utils.board_index import get_board_index
+        from .utils.cards import live_pockets
+
+        pocket = list(map(Card.new, bot.pocket))
+        board = list(map(Card.new, context['board']))
+        index = get_board_index(board, self.evaluator)
+        rank = self.evaluator.evaluate(pocket, board)
+
+        # the opponent can't hold our cards, their pockets are ranked strongest first
+        weights = (self.estimate_opponent_range(context, bot) * live_pockets(pocket + board))[index.sorted_pockets]
+        cumulative_weights = np.cumsum(weights)
+        cumulative_shares = np.cumsum(weights * ((index.sorted_ranks > rank) + 0.5 * (index.sorted_ranks == rank)))
+        last_caller = np.searchsorted(cumulative_weights, call_shares * cumulative_weights[-1] - EPSILON, 'left')
+        return cumulative_shares[last_caller] / cumulative_weights[last_caller]
+
+    def size_wager(self, context, bot, min_amount, max_amount, hand_strength, amount_to_call=0):
+        """
+        Picks the size of a bet or raise by weighing WAGER_GRID_SIZE candidate amounts, spaced geometrically between
+        the minimum and our stack or MAX_WAGER_POTS pots, all at once. Amounts the opponent's stack can't match are
+        left out, they would only ever be called for what the opponent has left.
+
+        For an amount a into a pot p, the opponent is assumed to call with the strongest (p / (p + a)) ** CALL_ELASTICITY
+        share of their range and to fold the rest. That is more than the p / (p + a) share that would make every
+        bluff break even, so the value of an amount isn't the same for a bluff of any size: it grows with a only
+        while our equity against the hands that call it is high enough. The expected value of the amount is
+            fold share * p + call share * (equity against the calling range * (p + 2a - amount to call) - a)
+        from which RISK_AVERSION * p * calculate_risk() is taken off, so we don't commit our stack for a sliver
+        of expected value.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
+        :param min_amount: (int) The smallest legal bet/raise.
+        :param max_amount: (int) The largest legal bet/raise, i.e. our stack.
+        :param hand_strength: (float) The hand strength of our current hand/pocket.
+        :param amount_to_call: (int) The opponent's bet we are raising, 0 when betting.
+
+        :return:
+                amount (int) The smallest amount within WAGER_TOLERANCE of the pot of the best value.
+        """
+        import numpy as np
+
+        pot = context['pot']
+        min_amount = max(1, min(min_amount, max_amount))
+        # the most the opponent can call, the smallest legal amount is still weighed if it is more
+        largest = min(max_amount, self.check_stack_size(context, bot, False) + amount_to_call,
+                      MAX_WAGER_POTS * pot + amount_to_call)
+        largest = max(min_amount, largest)
+        amounts = np.unique(np.round(np.geomspace(min_amount, largest, WAGER_GRID_SIZE)).astype(np.int64))
+
+        call_shares = (pot / (pot + amounts.astype(np.float64))) ** CALL_ELASTICITY
+        equities = self.calculate_calling_equities(context, bot, call_shares, hand_strength)
+        values = (1 - call_shares) * pot + call_shares * (equities * (pot + 2 * amounts - amount_to_call) - amounts)
+        values -= RISK_AVERSION * pot * self.calculate_risk(context, bot, amounts, max_amount)
+
+        # amounts are in ascending order, risk no more than needed for the best value
+        best = np.flatnonzero(values >= values.max() - WAGER_TOLERANCE * pot)
+        return int(amounts[best[0]])
+
+    def calculate_all_in_equity(self, context, bot):
+        """
+        Calculates our exact equity against the opponent's range if all the chips go in on the turn or the
+        river, by dealing every remaining river card to every pocket they may hold (see utils/equity.py).
+        Unlike hand strength, this accounts for the river card still to come on the turn.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
+
+        :return:
+                equity (float) The share of the pot we expect to win at showdown, between 0 and 1.
+        """
+        from .utils.equity import all_in_equity
+
+        return all_in_equity(
+            list(map(Card.new, bot.pocket)),
+            list(map(Card.new, context['board'])),
+            self.estimate_opponent_range(context, bot),
+            self.evaluator
+        )
+
     def do_bet(self, context, bot, stack_size, opponents_stack_size, hand_strength):
         """
         Given percepts (aspects of the game state that our agent perceives such as:
         pot size, opponent's actions, hand strength, risk, aggression level, etc)
         from the world (poker game), determine whether or not a bet should be made, and if so, the quantity.
 
-        The reduce the complexity of all the possible bets that could be made, I abstracted the betting sizes to three
-        categories: large, medium, and small bets. Details can be seen in the code.
+        Whether to bet is drawn at random, favouring strong hands late in the hand, or cheap bets while we
+        haven't been too aggressive. The size is the one with the best expected value (see size_wager()).
 
         :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
                         including but not limited to move history, pot size, and players.
@@ -488,38 +779,12 @@ class HeadsUpStrategy(PokerStrategy):
         # 3-> flop, 4-> turn, 5-> river
         turn = len(context['board'])
 
-        # Reduce complexity by abstracting bets sizes into three categories: small, medium and large sized
-        if random() <= hand_strength * (turn / 5.0):
-            #maybe factor in the number of times I've already raised previously this turn
-            #make large bet
-            if self.calculate_aggression(bot.num_bets, bot.num_raises, bot.num_checks) < bot.aggression_factor and hand_strength >= 0.75:
-                #ensure that bet cannot be smaller than min_bet
-                bet = int(round(stack_size * hand_strength * (turn / 5.0)))
-                bet = bet if bet > min_bet else min_bet
-                bet = min(
-                    bet,
-                    stack_size
-                )
-
-            # make medium bet
-            else:
-                bet = int(round(stack_size / 2 * (1-hand_strength) * (turn / 5.0)))
-                bet = bet if bet > min_bet else min_bet
-                bet = min(
-                    bet,
-                    stack_size
-                )
-        # if risk is small and bot is aggressive, make a small bet
-        elif random() <= (1 - self.calculate_risk(context, bot, min_bet, stack_size) and
-                                  self.calculate_aggression(bot.num_bets, bot.num_raises, bot.num_checks) < bot.aggression_factor):
-
-            if stack_size < opponents_stack_size:
-                bet = min_bet
-            else:
-                bet = min(
-                    int(round(min_bet * (1 + hand_strength))),
-                    stack_size
-                )
+        # bet for value more often with strong hands later in the hand,
+        # otherwise bet if risk is small and bot is aggressive
+        if self.rng.decision.random() <= hand_strength * (turn / 5.0) or \
+                self.rng.decision.random() <= (1 - self.calculate_risk(context, bot, min_bet, stack_size) and
+                                               self.calculate_aggression(bot.num_bets, bot.num_raises, bot.num_checks) < bot.aggression_factor):
+            bet = self.size_wager(context, bot, min_bet, stack_size, hand_strength)
         if bet:
             self.do['action'] = 'bet'
             self.do['amount'] = bet
@@ -533,7 +798,10 @@ class HeadsUpStrategy(PokerStrategy):
         Given percepts (aspects of the game state that our agent perceives such as:
         pot size, opponent's actions, hand strength, risk, aggression level, etc)
         from the world (poker game), determine whether or not a call should be made in response
-        to a current bet or raise.
+        to a current bet or raise. Pre-flop all-in calls are decided by pot odds using the
+        precomputed equity of our hand class against the opponent's estimated range (see utils/preflop.py),
+        turn and river all-in calls by pot odds using our exact equity (see calculate_all_in_equity()), the turn only
+        when the evaluator is vectorized.
 
         :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
                         including but not limited to move history, pot size, and players.
@@ -552,14 +820,28 @@ class HeadsUpStrategy(PokerStrategy):
         at_stake = self.check_amount_in_pot(context, bot)
         #If we are pressured to call ALL IN
         if amount_to_call >= stack_size:
-            if random() / 3.0 * (turn / 5.0) <= hand_strength:
+            # pre-flop, on the turn and on the river, compare our exact equity against the opponent's likely
+            # all-in range with the pot odds. dealing every river on the turn takes most of a second unless the
+            # evaluator is vectorized, so without one the turn is decided like the flop
+            if turn == 0 or turn == 5 or (turn == 4 and self.evaluator.vectorized):
+                # we can only call off our stack, the rest of the opponent's bet goes back to them
+                pot_size = context['pot'] - (amount_to_call - stack_size)
+                if turn == 0:
+                    from .utils.preflop import equity_vs_range, range_weights
+                    equity = equity_vs_range(list(map(Card.new, bot.pocket)), range_weights(PREFLOP_ALL_IN_RANGE))
+                else:
+                    equity = self.calculate_all_in_equity(context, bot)
+                if equity >= stack_size / float(pot_size + stack_size):
+                    call = True
+            # two cards to come on the flop are too many to enumerate
+            elif self.rng.decision.random() / 3.0 * (turn / 5.0) <= hand_strength:
                 call = True
-        elif random() <= hand_strength:
+        elif self.rng.decision.random() <= hand_strength:
             #if risk is low and hand is strong, go ahead and call
-            if random() <= (1- self.calculate_risk(context, bot, amount_to_call, stack_size)):
+            if self.rng.decision.random() <= (1- self.calculate_risk(context, bot, amount_to_call, stack_size)):
                 call = True
             #if we have alot at stake and we're at the river
-            elif turn == 5 and random() <= (at_stake / context['pot']):
+            elif turn == 5 and self.rng.decision.random() <= (at_stake / context['pot']):
                 call = True
         if call:
             self.do['action'] = 'call'
@@ -571,7 +853,7 @@ class HeadsUpStrategy(PokerStrategy):
         Given percepts (aspects of the game state that our agent perceives such as:
         pot size, opponent's actions, hand strength, risk, aggression level, etc)
         from the world (poker game), determine whether or not a (re)raise should be made in response
-        to a current bet or raise.
+        to a current bet or raise. The size of the raise is the one with the best expected value (see size_wager()).
 
         :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
                         including but not limited to move history, pot size, and players.
@@ -587,45 +869,15 @@ class HeadsUpStrategy(PokerStrategy):
                _raise (None) None is returned if (re)raising is determined to be disadvantageous.
         """
         min_raise = context['legal_actions']['RAISE']['min']
-        # turn's value will depend on the state of the board, 3-> flop, 4-> turn, 5-> river
-        turn = len(context['board'])
         _raise = None
 
         if all_in:
             _raise = stack_size
-
-        # Reducing complexity by abstracting 'raises' into three categories: small, medium and large sized
-        elif random() <= hand_strength:
-            #large raise
-            if self.calculate_aggression(bot.num_bets, bot.num_raises, bot.num_checks) < bot.aggression_factor:
-                #go all in
-                if random() <= uniform(0.0, hand_strength/2.0):
-                    _raise = stack_size
-                #bet large
-                else:
-                    # ensure raise is at least the minimum value
-                    _raise = int(round(stack_size / 2 * hand_strength * (turn / 5.0)))
-                    _raise = _raise if _raise > min_raise else min_raise
-                    _raise = min(
-                        _raise,
-                        stack_size
-                    )
-
-            #medium sized raise
-            else:
-                if stack_size > opponents_stack_size:
-                    _raise = int(round(stack_size * (1-hand_strength) * (turn / 5.0)))
-                    _raise = _raise if _raise > min_raise else min_raise
-                    _raise = min(
-                        _raise,
-                        stack_size
-                    )
-                #small sized raise
-                else:
-                    _raise = min(
-                        int(round(min_raise * (1 + hand_strength))),
-                        stack_size
-                    )
+        # raise with strong hands, by the amount of the best expected value
+        elif self.rng.decision.random() <= hand_strength:
+            _raise = self.size_wager(
+                context, bot, min_raise, stack_size, hand_strength, context['legal_actions']['CALL']['amount']
+            )
 
         if _raise:
             self.do['action'] = 'raise'
@@ -652,9 +904,10 @@ class HeadsUpStrategy(PokerStrategy):
                 action (LegalAction) returns the best determined action based on the bot's interpretation of the current
                         game state and strategy.
         """
+        start = perf_counter()
         # clear our action dictionary
         self.do.clear()
-        fold = True
+        self.percepts.clear()
         first_move = False
         opponents_last_move = None
         hand_strength = None
@@ -672,22 +925,55 @@ class HeadsUpStrategy(PokerStrategy):
             if opponents_last_move is None:
                 raise Exception('Error reading history')
 
+        # budget the time of the decision, the abstraction is only an option on the flop and the turn
+        lookup_available = False
+        if self.abstraction and 3 <= len(context['board']) <= 4:
+            from .utils.abstraction import get_abstraction
+            lookup_available = get_abstraction(len(context['board'])) is not None
+        self.budget = self.scheduler.plan(context, stack_size, opponents_stack_size, lookup_available)
+
         # handle pre-flop action in another method
         if len(context['board']) == 0:
-            return self.determine_preflop_action(context, bot, first_move, opponents_last_move, stack_size, opponents_stack_size)
+            return self.trace_decision(
+                context, bot, start,
+                self.determine_preflop_action(context, bot, first_move, opponents_last_move, stack_size, opponents_stack_size)
+            )
+
+        # the pockets the opponent's moves point to, our hand strength is weighed against them once they have moved
+        opponent_range = self.estimate_opponent_range(context, bot)
+        if self.ranges is None or self.ranges.actions == 0:
+            opponent_range = None
 
         # calculate hand strength by simulating possible boards & opponent hands
         if len(context['board']) < 5:
-            potential = self.calculate_hand_potential(context['board'], bot.pocket)
-            hand_strength = self.calculate_effective_hand_strength(
-                self.calculate_hand_strength(context['board'], bot.pocket),
-                potential[0],
-                potential[1])
+            cached = None
+            if self.equity_cache is not None:
+                pocket_cards = list(map(Card.new, bot.pocket))
+                board_cards = list(map(Card.new, context['board']))
+                cached = self.equity_cache.get(pocket_cards, board_cards)
+            if cached is not None:
+                hand_strength, potential = cached[0], cached[1:]
+            else:
+                potential_start = perf_counter()
+                potential = self.calculate_budgeted_potential(context['board'], bot.pocket, self.budget)
+                # the scheduler only learns the cost of potentials that were calculated
+                self.percepts['potential_time'] = perf_counter() - potential_start
+                hand_strength = self.calculate_hand_strength(context['board'], bot.pocket)
+                # only exact percepts are worth keeping
+                if self.equity_cache is not None and self.budget.method == EXACT:
+                    self.equity_cache.put(pocket_cards, board_cards, hand_strength, potential[0], potential[1])
+            # the cache and the potentials are against a random hand
+            if opponent_range is not None:
+                hand_strength = self.calculate_hand_strength(context['board'], bot.pocket, opponent_range)
+            hand_strength = self.calculate_effective_hand_strength(hand_strength, potential[0], potential[1])
+            self.percepts['pos_potential'] = potential[0]
+            self.percepts['neg_potential'] = potential[1]
         # if board is at river, no need to calculate hand potential
         elif len(context['board']) == 5:
-            hand_strength = self.calculate_hand_strength(context['board'], bot.pocket)
+            hand_strength = self.calculate_hand_strength(context['board'], bot.pocket, opponent_range)
         else:
             raise Exception('Invalid board length')
+        self.percepts['hand_strength'] = hand_strength
 
         # check if we're all in
         if stack_size == 0:
@@ -698,91 +984,11 @@ class HeadsUpStrategy(PokerStrategy):
                 self.do['amount'] = 0
             else:
                 self.do['action'] = 'check'
-            return PokerStrategy.create_action(self.do, bot)
-
-        # if we are making the first move of the round
-        if first_move:
-            # percepts -> bet?
-            # given percepts from the world, determine whether or not we should bet
-            bet = self.do_bet(context, bot, stack_size, opponents_stack_size, hand_strength)
-            if bet is not None:
-                # bet info is stored in "do" dict
-                pass
-            else:
-                self.do['action'] = 'check'
-            fold = False
-        # if we are going second this turn
-        else:
-            # if we are following a bet
-            if opponents_last_move == 'BET':
-                amount_to_call = context['legal_actions']['CALL']['amount']
-                # if we are pressured to go all in
-                if amount_to_call >= stack_size:
-                    # percepts -> call?
-                    # given percepts from the game world, determine if we should call the bet
-                    call = self.do_call(context, bot, stack_size, opponents_stack_size, hand_strength)
-                    if call:
-                        fold = False
-                    # fold otherwise
-                # if our hand is strong or the move has low risk, evaluate possibility of raise/call
-                elif random() <= hand_strength or random() / 2 <= (1 - self.calculate_risk(context, bot, amount_to_call, stack_size)):
-                    # percepts -> raise?
-                    _raise = self.do_raise(context, bot, stack_size, opponents_stack_size, hand_strength)
-                    if _raise is not None:
-                        fold = False
-                    # if raising is not recommended given the situation, check if calling is.
-                    else:
-                        # percepts -> call?
-                        call = self.do_call(context,  bot, stack_size, opponents_stack_size, hand_strength)
-                        if call:
-                            fold = False
-                        # if our algorithm doesn't suggest we raise or call, fold ultimately
-            # if we need to reply to a check
-            elif opponents_last_move == 'CHECK':
-                #percepts -> bet?
-                bet = self.do_bet(context, bot, stack_size, opponents_stack_size, hand_strength)
-                if bet:
-                    # bet info is stored in "do" dict when it is passed into the transition function
-                    pass
-                else:
-                    # check by default
-                    self.do['action'] = 'check'
-                fold = False
-            # lastly if we are responding to an opponent's raise
-            elif opponents_last_move == 'RAISE':
-                amount_to_call = context['legal_actions']['CALL']['amount']
-                # if we are pressured to go all in from the last raise
-                if amount_to_call >= stack_size:
-                    # percepts -> all in?
-                    call = self.do_call(context, bot, stack_size, opponents_stack_size, hand_strength)
-                    if call:
-                        # all in! good luck.
-                        fold = False
-                # if our hand is strong, see if re-raising or checking is appropriate
-                elif random() <= hand_strength:
-                    # percepts -> re-raise?
-                    _raise = self.do_raise(context, bot, stack_size, opponents_stack_size, hand_strength)
-                    if _raise is not None:
-                        fold = False
-                    # else re-raising is not recommended, see if we should call the raise.
-                    else:
-                        # percepts -> call?
-                        call = self.do_call(context, bot, stack_size, opponents_stack_size, hand_strength)
-                        if call:
-                            fold = False
-                # stochastically bluff when appropriate
-                else:
-                    # percepts -> appropriate to bluff?
-                    if random() <= uniform(0.0, hand_strength/2.0):
-                        _raise = self.do_raise(context, bot, stack_size, opponents_stack_size, hand_strength, True)
-                        if _raise is not None:
-                            fold = False
-
-        if fold:
-            self.do['action'] = 'fold'
+            return self.trace_decision(context, bot, start, PokerStrategy.create_action(self.do, bot))
 
+        self.choose_action(context, bot, first_move, opponents_last_move, stack_size, opponents_stack_size, hand_strength)
         action = PokerStrategy.create_action(self.do, bot)
-        return action
+        return self.trace_decision(context, bot, start, action)
 
     def determine_preflop_action(self, context, bot, first_move, opponents_last_move, stack_size, opponents_stack_size):
         """
@@ -803,11 +1009,52 @@ class HeadsUpStrategy(PokerStrategy):
                         game state and strategy.
         """
 
-        fold = True
-        #50,000 takes roughly 7.4 seconds to calculate
-        num_simulations = 50000
-        preflop_odds = self.simulate_games(bot.pocket, context, num_simulations)
         hand_strength = self.calculate_pre_flop_hand_strength(bot.pocket)
+        self.percepts['hand_strength'] = hand_strength
+
+        self.choose_action(context, bot, first_move, opponents_last_move, stack_size, opponents_stack_size, hand_strength)
+        action = PokerStrategy.create_action(self.do, bot)
+        return action
+
+    def choose_action(self, context, bot, first_move, opponents_last_move, stack_size, opponents_stack_size, hand_strength):
+        """
+        Writes the action for the given percepts to the "do" dictionary. When a compiled policy is attached (see
+        utils/policy.py) the action is sampled from its table; otherwise, or if the table has no entry for the
+        situation, the rules of apply_rules() decide.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
+        :param first_move: (boolean) True or False depending on if the bot is moving first this round
+        :param opponents_last_move: (string) the opponent's last move
+        :param stack_size: (int) the bot's stack size
+        :param opponents_stack_size: (int) the opponent's stack size
+        :param hand_strength: (float) The hand strength of our current hand/pocket.
+
+        :return: (void)
+        """
+        if self.policy is not None and self.policy.act(self, context, bot, opponents_last_move, stack_size, hand_strength):
+            return
+        self.apply_rules(context, bot, first_move, opponents_last_move, stack_size, opponents_stack_size, hand_strength)
+
+    def apply_rules(self, context, bot, first_move, opponents_last_move, stack_size, opponents_stack_size, hand_strength):
+        """
+        The rules deciding the action on every street once the percepts are known. Bets, calls and raises are
+        weighed by do_bet(), do_call() and do_raise(), which draw from the strategy's decision stream, so the same
+        percepts lead to a mix of actions.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
+        :param first_move: (boolean) True or False depending on if the bot is moving first this round
+        :param opponents_last_move: (string) the opponent's last move
+        :param stack_size: (int) the bot's stack size
+        :param opponents_stack_size: (int) the opponent's stack size
+        :param hand_strength: (float) The hand strength of our current hand/pocket.
+
+        :return: (void)
+        """
+        fold = True
 
         # if we are making the first move of the round
         if first_move:
@@ -815,7 +1062,7 @@ class HeadsUpStrategy(PokerStrategy):
             # given percepts from the world, determine whether or not we should bet
             bet = self.do_bet(context, bot, stack_size, opponents_stack_size, hand_strength)
             if bet is not None:
-                #bet info is stored in "do" dict
+                # bet info is stored in "do" dict
                 pass
             else:
                 self.do['action'] = 'check'
@@ -828,13 +1075,13 @@ class HeadsUpStrategy(PokerStrategy):
                 # if we are pressured to go all in
                 if amount_to_call >= stack_size:
                     # percepts -> call?
-                    # given percepts from the world, determine if we should call the bet
+                    # given percepts from the game world, determine if we should call the bet
                     call = self.do_call(context, bot, stack_size, opponents_stack_size, hand_strength)
                     if call:
                         fold = False
                     # fold otherwise
                 # if our hand is strong or the move has low risk, evaluate possibility of raise/call
-                elif random() <= hand_strength or random() / 2 <= (1 - self.calculate_risk(context, bot, amount_to_call, stack_size)):
+                elif self.rng.decision.random() <= hand_strength or self.rng.decision.random() / 2 <= (1 - self.calculate_risk(context, bot, amount_to_call, stack_size)):
                     # percepts -> raise?
                     _raise = self.do_raise(context, bot, stack_size, opponents_stack_size, hand_strength)
                     if _raise is not None:
@@ -868,7 +1115,7 @@ class HeadsUpStrategy(PokerStrategy):
                         # all in! good luck.
                         fold = False
                 # if our hand is strong, see if re-raising or checking is appropriate
-                elif random() <= hand_strength:
+                elif self.rng.decision.random() <= hand_strength:
                     # percepts -> re-raise?
                     _raise = self.do_raise(context, bot, stack_size, opponents_stack_size, hand_strength)
                     if _raise is not None:
@@ -882,69 +1129,308 @@ class HeadsUpStrategy(PokerStrategy):
                 # stochastically bluff when appropriate
                 else:
                     # percepts -> appropriate to bluff?
-                    if random() <= uniform(0.0, hand_strength/2.0):
+                    if self.rng.decision.random() <= self.rng.decision.uniform(0.0, hand_strength/2.0):
                         _raise = self.do_raise(context, bot, stack_size, opponents_stack_size, hand_strength, True)
                         if _raise is not None:
                             fold = False
-                            
+
         if fold:
             self.do['action'] = 'fold'
-        #print(do['action'])
-        action = PokerStrategy.create_action(self.do, bot)
-        return action
 
-    def simulate_games(self, pocket, context, iterations):
+    def simulate_games(self, pocket, context, iterations, method='iid'):
         """
         Simulates n iterations of games and calculates the ratio that the bot wins against one opponent
         given a certain hand. This is used to partially approximate hand strength preflop.
 
+        Besides plain random deals, the games can be stratified by the opponent's hand class or picked from
+        a quasi-random sequence (see utils/sampling.py), which reach a given standard error with somewhat
+        fewer games. The standard error of the estimate is kept in
+        percepts['simulation_error'].
+
         :param pocket: (list) a list of 2 Card objects that depict the bot's current hand
         :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
                         including but not limited to move history, pot size, and players.
         :param iterations: (int) Number of simulations to run.
+        :param method: (str) 'iid', 'stratified' or 'quasi_random', see utils.sampling.SAMPLERS
 
         :return:
                 odds (float) An irrational number between 0 and 1 that represents the odds that a bot
                 has a strong hand as the number tends to 0, the hand is classified as weaker.
         """
+        from .utils.sampling import SAMPLERS
 
-        wins = 0
-        ties = 0
-        evaluator = Evaluator()
-
-        # change card representations from str to int
-        pocket = list(map(Card.new, pocket))
         if len(context['board']) == 0:
-            for i in range(iterations):
-                # create our available domain for deck cards
-                deck = list(FULL_DECK - set(pocket))
-                shuffle(deck)
-                # randomly set opponent's pocket
-                opponent_pocket = [deck.pop() for i in range(2)]
-
-                # randomly generate possible board
-                board = [deck.pop() for i in range(5)]
-                hand_rank = evaluator.evaluate(pocket, board)
-                opponent_hand_rank = evaluator.evaluate(opponent_pocket, board)
-
-                if hand_rank == opponent_hand_rank:
-                    ties += 1
-                # smaller hand_rank means higher ranking cards
-                elif hand_rank < opponent_hand_rank:
-                    wins += 1
-
-            odds = (wins + (ties / 2.0)) / iterations
+            # change card representations from str to int
+            odds, error = SAMPLERS[method](list(map(Card.new, pocket)), iterations, self.evaluator, self.rng)
+            self.percepts['simulation_error'] = error
             return odds
         else:
             return -1
 
+    def trace_decision(self, context, bot, start, action):
+        """
+        Records the decision that was just made, along with the percepts it was based on, if a
+        DecisionTracer has been attached to the strategy. Recording is queued, so it doesn't slow
+        the decision down. The time the decision took is also reported to the scheduler.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
+        :param start: (float) perf_counter() value from when the decision started
+        :param action: (LegalAction) the action that was decided on
+
+        :return:
+                action (LegalAction) the same action, so it can be returned straight away.
+        """
+        compute_time = perf_counter() - start
+        if self.budget is not None:
+            self.scheduler.record(self.budget, compute_time, self.percepts.get('potential_time'))
+        if self.tracer is not None:
+            amount = self.do.get('amount', 0)
+            risk = 0.0
+            if amount:
+                risk = self.calculate_risk(context, bot, amount, self.check_stack_size(context, bot, True))
+            self.tracer.record(
+                len(context['board']), bot.pocket, context['board'],
+                self.percepts.get('hand_strength', 0.0),
+                self.percepts.get('pos_potential', 0.0),
+                self.percepts.get('neg_potential', 0.0),
+                risk, self.do['action'], amount, compute_time
+            )
+        return action
+
+class TableStrategy(PokerStrategy):
+    """
+    Sub-class of PokerStrategy for tables of up to 9 players. Where HeadsUpStrategy weighs its hand against
+    a single opponent, this strategy finds the opponents still in the hand and estimates its equity against
+    all of them (see utils/multiway.py) with one of two tiers:
+
+    simulated    correlated Monte Carlo deals ranked in a single batch. The number of deals shrinks as the
+                 number of opponents grows, so a decision never ranks more than MAX_EVALUATIONS hands.
+    approximate  HS^N, the heads-up hand strength to the power of the number of opponents, with the next card's
+                 potential factored in on the flop and turn where the street has been bucketed. Used when fast
+                 is set, e.g. when many tables share a core, and heads-up on the river where it is exact.
+
+    It calls when its equity beats the pot odds and bets or raises for value when its equity is well above
+    its fair share of the pot, one over the number of players in the hand.
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    do                    dict; The dictionary that we write our actions and action meta data to.
+    percepts              dict; The number of opponents, the equity tier and the equity the last decision was based on.
+    fast                  boolean; only use the approximate equity tier
+    samples               int; deals wanted by the simulated tier, before MAX_EVALUATIONS caps them
+
+    FUNCTIONS:
+    check_active_opponents()    finds the opponents that haven't folded this hand
+    calculate_hand_strength()   calculates the exact equity of our pocket against a single random hand
+    calculate_equity()          estimates our equity against every opponent still in the hand
+    calculate_risk()            calculates the risk of a bet/raise against every opponent still in the hand
+    size_wager()                sizes a bet/raise by how far our equity is above our fair share
+    determine_action()          determine which action the bot should take given the situation
+    ====================  ====================================================
+    """
+
+    def __init__(self, backend='seven_card', seed=None, fast=False):
+        from .utils.multiway import MULTIWAY_SAMPLES
+
+        super().__init__(backend, seed)
+        self.do = dict()
+        self.percepts = dict()
+        self.fast = fast
+        self.samples = MULTIWAY_SAMPLES
+
+    def check_active_opponents(self, context, bot):
+        """
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current poker game.
+
+        :return:
+                (list) the player dicts of the opponents that haven't folded this hand.
+        """
+        folded = set(action_info['actor'] for action_info in context['history'] if action_info['type'] == 'FOLD')
+        return [player_data for player_data in context['players']
+                if player_data['name'] != bot.name and player_data['name'] not in folded]
+
+    def calculate_hand_strength(self, board, pocket):
+        """
+        Calculates the exact equity of a pocket against a single random hand as the board stands: from the
+        preflop equity table before the flop, from the board's cached rank index after it.
+
+        :param board: (list) 0-5 card ints
+        :param pocket: (list) 2 card ints
+
+        :return:
+                (float) the hand strength, between 0 and 1.
+        """
+        if not board:
+            import numpy as np
+            from .utils.preflop import NUM_CLASSES, equity_vs_range
+            return equity_vs_range(pocket, np.ones(NUM_CLASSES))
+
+        from .utils.board_index import get_board_index
+        from .utils.cards import pocket_index
+        return float(get_board_index(board, self.evaluator).hand_strengths()[pocket_index(pocket)])
+
+    def calculate_equity(self, context, bot, num_opponents):
+        """
+        Estimates our equity against every opponent still in the hand with the simulated or approximate tier.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current poker game.
+        :param num_opponents: (int) opponents still in the hand
+
+        :return:
+                equity (float) The share of the pot we expect to win at showdown, between 0 and 1.
+        """
+        from .utils.multiway import approximate_equity, multiway_samples, simulate_equity
+
+        pocket = list(map(Card.new, bot.pocket))
+        board = list(map(Card.new, context['board']))
+        if self.fast or (num_opponents == 1 and len(board) == 5):
+            self.percepts['tier'] = 'approximate'
+            hand_strength = self.calculate_hand_strength(board, pocket)
+            # on the flop and turn the potentials of the hand's bucket account for the next card, when the
+            # street has been bucketed (see utils/abstraction.py)
+            if 3 <= len(board) <= 4:
+                from .utils.abstraction import get_abstraction
+                abstraction = get_abstraction(len(board))
+                percepts = abstraction.percepts(pocket, board) if abstraction is not None else None
+                if percepts is not None:
+                    hand_strength = hand_strength * (1 - percepts[2]) + (1 - hand_strength) * percepts[1]
+            equity = approximate_equity(hand_strength, num_opponents)
+        else:
+            self.percepts['tier'] = 'simulated'
+            samples = multiway_samples(num_opponents, self.samples)
+            equity = float(simulate_equity(pocket, board, num_opponents, samples, self.evaluator, self.rng)[-1])
+        self.percepts['equity'] = equity
+        return equity
+
+    def calculate_risk(self, context, bot, bet_size, stack_size):
+        """
+        The risk of HeadsUpStrategy.calculate_risk(), with the maximum pot size counting the stack of every
+        opponent still in the hand.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current poker game.
+        :param bet_size: (int) The size of the bet/raise that we are calculating risk for.
+        :param stack_size: (int) The size of the bot's current stack.
+
+        :return:
+                risk (float) between 0 and 1, as the number tends to 0, the move becomes less risky.
+        """
+        pot_size = context['pot']
+        max_pot_size = pot_size + stack_size + sum(player_data['stack']
+                                                   for player_data in self.check_active_opponents(context, bot))
+        return (
+            (4 / 3.0) *
+            ((bet_size * (2 * bet_size + pot_size)) /
+             (max_pot_size * (bet_size + pot_size)))
+        ) ** 0.5
+
+    def size_wager(self, context, min_amount, max_amount, equity, fair_share, amount_to_call=0):
+        """
+        Sizes a bet or raise as a share of the pot that grows with how far our equity is above our fair share,
+        up to the pot itself with a hand that can't lose.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param min_amount: (int) the smallest legal amount
+        :param max_amount: (int) the largest legal amount
+        :param equity: (float) our equity against every opponent still in the hand
+        :param fair_share: (float) one over the number of players in the hand
+        :param amount_to_call: (int) chips needed to call, 0 for a bet
+
+        :return:
+                amount (int) the bet/raise amount.
+        """
+        edge = max(0.0, (equity - fair_share) / (1 - fair_share))
+        amount = amount_to_call + int(round(edge * (context['pot'] + amount_to_call)))
+        return max(min_amount, min(amount, max_amount))
+
+    def determine_action(self, context, bot):
+        """
+        @Override
+
+        Estimates our equity against the opponents still in the hand, then calls when it beats the pot odds
+        and bets or raises for value when it is at least VALUE_MARGIN times our fair share of the pot. Equity
+        between our fair share and VALUE_MARGIN times it bets only when the bet's risk is small.
+
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current poker game.
+
+        :return:
+                action (LegalAction) returns the best determined action based on the bot's interpretation of the current
+                        game state and strategy.
+        """
+        from .utils.multiway import MAX_OPPONENTS
+
+        self.do.clear()
+        self.percepts.clear()
+        legal_actions = context['legal_actions']
+        stack_size = self.check_stack_size(context, bot, True)
+        num_opponents = max(1, min(len(self.check_active_opponents(context, bot)), MAX_OPPONENTS))
+        self.percepts['opponents'] = num_opponents
+
+        # if you're all in you can only call with 0 or check
+        if stack_size == 0:
+            if 'CALL' in legal_actions:
+                self.do['action'] = 'call'
+                self.do['amount'] = 0
+            else:
+                self.do['action'] = 'check'
+            return PokerStrategy.create_action(self.do, bot)
+
+        equity = self.calculate_equity(context, bot, num_opponents)
+        fair_share = 1.0 / (num_opponents + 1)
+
+        # if we are facing a bet or raise
+        if 'CALL' in legal_actions:
+            amount_to_call = legal_actions['CALL']['amount']
+            if 'RAISE' in legal_actions and amount_to_call < stack_size and equity >= VALUE_MARGIN * fair_share:
+                self.do['action'] = 'raise'
+                self.do['min'] = legal_actions['RAISE']['min']
+                self.do['max'] = legal_actions['RAISE']['max']
+                self.do['amount'] = self.size_wager(context, self.do['min'], self.do['max'], equity, fair_share,
+                                                    amount_to_call)
+            # call when our share of the pot is worth more than the chips we put in
+            elif equity >= amount_to_call / float(context['pot'] + amount_to_call):
+                self.do['action'] = 'call'
+                self.do['amount'] = amount_to_call
+            else:
+                self.do['action'] = 'fold'
+        # if we may open the betting
+        elif 'BET' in legal_actions:
+            min_bet = legal_actions['BET']['min']
+            if equity >= VALUE_MARGIN * fair_share or (
+                    equity >= fair_share and
+                    self.rng.decision.random() <= 1 - self.calculate_risk(context, bot, min_bet, stack_size)):
+                self.do['action'] = 'bet'
+                self.do['min'] = min_bet
+                self.do['max'] = legal_actions['BET']['max']
+                self.do['amount'] = self.size_wager(context, min_bet, self.do['max'], equity, fair_share)
+            else:
+                self.do['action'] = 'check'
+        else:
+            self.do['action'] = 'check'
+
+        return PokerStrategy.create_action(self.do, bot)
+
+
 class AlwaysCall(HeadsUpStrategy):
     """
     This Naive strategy always calls bets/raises and checks otherwise.
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, backend='seven_card', seed=None):
+        super().__init__(backend, seed)
 
     def determine_action(self, context, bot):
         """
@@ -1011,8 +1497,8 @@ class AlwaysBet(HeadsUpStrategy):
     This native strategy always bets if others have checked, and will
     call any bet/raise. Should only be used for testing purposes
     """
-    def __init__(self):
-        super().__init__()
+    def __init__(self, backend='seven_card', seed=None):
+        super().__init__(backend, seed)
 
     def determine_action(self, context, bot):
         """
@@ -0,0 +1,3 @@
+__author__ = 'montanawong'
+
+# run from the directory the package is installed in, e.g. python -m pytest montana/tests
@@ -0,0 +1,28 @@
+__author__ = 'montanawong'
+
+import numpy as np
+from deuces3x.deuces.card import Card
+from ..strategy import HeadsUpStrategy
+from ..utils.abstraction import board_histograms, canonical_boards
+from ..utils.cards import DECK, POCKETS
+from ..utils.evaluation import get_evaluator
+
+
+def test_potentials_match_calculate_hand_potential():
+    strategy = HeadsUpStrategy(seed=0)
+    for board in ([0, 17, 40], [3, 9, 22, 51]):
+        histograms, stats, live = board_histograms(board, get_evaluator('seven_card'))
+        board_strs = [Card.int_to_str(int(DECK[card])) for card in board]
+        for pocket in np.flatnonzero(live)[::97]:
+            pocket_strs = [Card.int_to_str(int(card)) for card in POCKETS[pocket]]
+            pos_potential, neg_potential = strategy.calculate_hand_potential(board_strs, pocket_strs)
+            assert abs(stats[pocket, 1] - pos_potential) < 1E-5
+            assert abs(stats[pocket, 2] - neg_potential) < 1E-5
+        # every live pocket's histogram counts every card that can come next
+        assert (histograms[live].sum(axis=1) == 52 - len(board) - 2).all()
+
+
+def test_renamed_boards_share_a_canonical_board():
+    masks, _ = canonical_boards(np.array([[0, 17, 40], [1, 18, 41], [2, 19, 42], [0, 4, 8]]))
+    assert masks[0] == masks[1] == masks[2]
+    assert masks[3] != masks[0]
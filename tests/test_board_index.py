@@ -0,0 +1,45 @@
+__author__ = 'montanawong'
+
+from random import Random
+import numpy as np
+from ..utils.board_index import BoardRankIndex
+from ..utils.cards import DECK, POCKETS, live_pockets
+from ..utils.evaluation import get_evaluator
+
+
+def _brute_force_hand_strength(evaluator, pocket, board):
+    # every pocket the opponent may hold, evaluated one at a time
+    rank = evaluator.evaluate(pocket, board)
+    ahead = tied = behind = 0
+    for other in POCKETS[live_pockets(pocket + board)].tolist():
+        other_rank = evaluator.evaluate(other, board)
+        if rank < other_rank:
+            ahead += 1
+        elif rank == other_rank:
+            tied += 1
+        else:
+            behind += 1
+    return (ahead + tied / 2.0) / (ahead + tied + behind)
+
+
+def test_hand_strength_matches_brute_force():
+    evaluator = get_evaluator('seven_card')
+    rng = Random(0)
+    for num_board_cards in (3, 4, 5):
+        cards = rng.sample(DECK.tolist(), num_board_cards + 2 * 5)
+        board = cards[:num_board_cards]
+        index = BoardRankIndex(board, evaluator)
+        for i in range(num_board_cards, len(cards), 2):
+            pocket = cards[i:i + 2]
+            expected = _brute_force_hand_strength(evaluator, pocket, board)
+            assert abs(index.hand_strength(pocket) - expected) < 1E-12
+
+
+def test_hand_strengths_match_hand_strength():
+    evaluator = get_evaluator('seven_card')
+    board = Random(1).sample(DECK.tolist(), 4)
+    index = BoardRankIndex(board, evaluator)
+    strengths = index.hand_strengths()
+    for position in np.flatnonzero(index.live)[::97]:
+        assert abs(strengths[position] - index.hand_strength(POCKETS[position].tolist())) < 1E-12
+    assert not strengths[~index.live].any()
@@ -0,0 +1,40 @@
+__author__ = 'montanawong'
+
+from itertools import permutations
+from deuces3x.deuces.card import Card
+from ..utils.equity_cache import EquityCache, canonical_key
+
+
+def _cards(cards):
+    return list(map(Card.new, cards))
+
+
+def test_key_ignores_suit_names():
+    pocket, board = ['As', 'Kd'], ['2c', '7s', '9s', 'Qh']
+    key = canonical_key(_cards(pocket), _cards(board))
+    for suits in permutations('shdc'):
+        rename = dict(zip('shdc', suits))
+        renamed = [card[0] + rename[card[1]] for card in pocket + board]
+        assert canonical_key(_cards(renamed[:2]), _cards(renamed[2:])) == key
+
+
+def test_key_ignores_card_order():
+    assert canonical_key(_cards(['As', 'Kd']), _cards(['2c', '7s', '9s'])) == \
+        canonical_key(_cards(['Kd', 'As']), _cards(['9s', '2c', '7s']))
+
+
+def test_key_tells_hands_apart():
+    # the same ranks, but only one of the boards has a flush draw for the pocket
+    assert canonical_key(_cards(['As', 'Ks']), _cards(['2s', '7s', '9d'])) != \
+        canonical_key(_cards(['As', 'Ks']), _cards(['2d', '7s', '9d']))
+
+
+def test_entries_persist(tmp_path):
+    filename = str(tmp_path / 'cache.sqlite')
+    cache = EquityCache(filename)
+    cache.put(_cards(['As', 'Kd']), _cards(['2c', '7s', '9s']), 0.5, 0.25, 0.125)
+    cache.close()
+
+    cache = EquityCache(filename)
+    assert cache.get(_cards(['Ah', 'Ks']), _cards(['2d', '7h', '9h'])) == (0.5, 0.25, 0.125)
+    cache.close()
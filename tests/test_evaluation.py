@@ -0,0 +1,66 @@
+__author__ = 'montanawong'
+
+from random import Random
+import numpy as np
+from deuces3x.deuces.evaluator import Evaluator
+from ..utils.cards import DECK
+from ..utils.evaluation import get_evaluator
+
+# hands checked against deuces by every test
+NUM_HANDS = 300
+
+_deuces = Evaluator()
+
+
+def _deals(num_cards, seed):
+    rng = Random(seed)
+    return [rng.sample(DECK.tolist(), num_cards) for _ in range(NUM_HANDS)]
+
+
+def test_evaluate_matches_deuces():
+    evaluator = get_evaluator('seven_card')
+    for num_cards in (5, 6, 7):
+        for cards in _deals(num_cards, num_cards):
+            assert evaluator.evaluate(cards[:2], cards[2:]) == _deuces.evaluate(cards[:2], cards[2:])
+
+
+def test_evaluate_finds_every_flush():
+    # a deal of random cards rarely holds a flush, deal them from two suits
+    evaluator = get_evaluator('seven_card')
+    rng = Random(0)
+    for _ in range(NUM_HANDS):
+        cards = rng.sample([card for index, card in enumerate(DECK.tolist()) if index % 4 < 2], 7)
+        assert evaluator.evaluate(cards[:2], cards[2:]) == _deuces.evaluate(cards[:2], cards[2:])
+
+
+def test_evaluate_batch_matches_deuces():
+    evaluator = get_evaluator('seven_card')
+    for num_board_cards in (3, 4, 5):
+        cards = Random(num_board_cards).sample(DECK.tolist(), num_board_cards + 2 * 20)
+        board, pockets = cards[:num_board_cards], np.array(cards[num_board_cards:]).reshape(-1, 2)
+        expected = [_deuces.evaluate(pocket.tolist(), board) for pocket in pockets]
+        assert evaluator.evaluate_batch(pockets, board).tolist() == expected
+
+
+def test_evaluate_boards_matches_deuces():
+    evaluator = get_evaluator('seven_card')
+    for num_board_cards in (3, 4, 5):
+        deals = _deals(num_board_cards + 2, num_board_cards)
+        pocket = deals[0][:2]
+        boards = np.array([[card for card in deal if card not in pocket][:num_board_cards] for deal in deals])
+        expected = [_deuces.evaluate(pocket, board.tolist()) for board in boards]
+        assert evaluator.evaluate_boards(pocket, boards).tolist() == expected
+
+
+def test_evaluate_hands_matches_deuces():
+    evaluator = get_evaluator('seven_card')
+    for num_cards in (5, 6, 7):
+        hands = np.array(_deals(num_cards, 10 + num_cards))
+        expected = [_deuces.evaluate(hand[:2].tolist(), hand[2:].tolist()) for hand in hands]
+        assert evaluator.evaluate_hands(hands).tolist() == expected
+
+
+def test_backends_agree():
+    seven_card, deuces = get_evaluator('seven_card'), get_evaluator('deuces')
+    hands = np.array(_deals(7, 20))
+    assert seven_card.evaluate_hands(hands).tolist() == deuces.evaluate_hands(hands).tolist()
@@ -0,0 +1,21 @@
+__author__ = 'montanawong'
+
+import numpy as np
+from ..utils.policy import FOLD, NUM_CELLS, NUM_OUTCOMES, PolicyTable, verify_policy, write_policy
+
+
+def test_every_street_is_checked(tmp_path):
+    # a table that always folds is far from the rules wherever they don't fold
+    counts = np.zeros((NUM_CELLS, NUM_OUTCOMES), dtype=np.int64)
+    counts[:, FOLD] = 1
+    filename = str(tmp_path / 'policy.bin')
+    write_policy(filename, counts, 1)
+    policy = PolicyTable(filename)
+    assert policy.samples.sum() == NUM_CELLS
+    assert np.allclose(policy.distribution(0), np.eye(NUM_OUTCOMES)[FOLD])
+
+    report = verify_policy(policy, situations=120, trials=20)
+    assert report['cells'] == NUM_CELLS
+    assert set(report['streets']) == {'pre-flop', 'flop', 'turn', 'river'}
+    assert not report['passed']
+    assert not any(street['passed'] for street in report['streets'].values())
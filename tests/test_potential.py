@@ -0,0 +1,47 @@
+__author__ = 'montanawong'
+
+from deuces3x.deuces.card import Card
+from ..strategy import HeadsUpStrategy
+from ..utils.contexts import deal
+from ..utils.prediction import EPSILON, generate_possible_boards, generate_possible_hands
+
+
+def _baseline_hand_potential(evaluator, board, pocket):
+    # the original loop over every opponent pocket and next card, see calculate_hand_potential()
+    AHEAD, TIED, BEHIND = 0, 1, 2
+    counts = [[0] * 3 for _ in range(3)]
+    totals = [0] * 3
+    pocket = list(map(Card.new, pocket))
+    board = list(map(Card.new, board))
+    rank = evaluator.evaluate(pocket, board)
+    for other in generate_possible_hands(pocket + board):
+        other_rank = evaluator.evaluate(other, board)
+        before = AHEAD if rank < other_rank else TIED if rank == other_rank else BEHIND
+        for possible_board in generate_possible_boards(board, pocket + other):
+            ours, theirs = evaluator.evaluate(pocket, possible_board), evaluator.evaluate(other, possible_board)
+            counts[before][AHEAD if ours < theirs else TIED if ours == theirs else BEHIND] += 1
+            totals[before] += 1
+    pos_potential = (counts[BEHIND][AHEAD] + counts[BEHIND][TIED] / 2.0 + counts[TIED][AHEAD] / 2.0) / (
+        totals[BEHIND] + totals[TIED] / 2.0 + EPSILON)
+    neg_potential = (counts[AHEAD][BEHIND] + counts[TIED][BEHIND] / 2.0 + counts[AHEAD][TIED] / 2.0) / (
+        totals[AHEAD] + totals[TIED] / 2.0 + EPSILON)
+    return pos_potential, neg_potential
+
+
+def test_exact_potential_matches_baseline():
+    strategy = HeadsUpStrategy(seed=0)
+    for num_board_cards, seed in ((3, 0), (3, 1), (4, 2)):
+        pocket, board = deal(num_board_cards, seed=seed)
+        expected = _baseline_hand_potential(strategy.evaluator, board, pocket)
+        potential = strategy.calculate_hand_potential(board, pocket)
+        assert abs(potential[0] - expected[0]) < 1E-4
+        assert abs(potential[1] - expected[1]) < 1E-4
+
+
+def test_sampled_potential_is_close_to_exact():
+    strategy = HeadsUpStrategy(seed=0)
+    pocket, board = deal(3, seed=3)
+    exact = strategy.calculate_hand_potential(board, pocket)
+    sampled = strategy.estimate_hand_potential(board, pocket, 50000)
+    assert abs(sampled[0] - exact[0]) < 0.02
+    assert abs(sampled[1] - exact[1]) < 0.02
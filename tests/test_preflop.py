@@ -0,0 +1,33 @@
+__author__ = 'montanawong'
+
+import numpy as np
+from deuces3x.deuces.card import Card
+from ..utils.preflop import CLASS_COMBOS, NUM_CLASSES, class_name, equity_vs_range, get_preflop_equities, \
+    hand_class, range_weights
+
+
+def _equity(pocket):
+    return equity_vs_range(list(map(Card.new, pocket)), np.ones(NUM_CLASSES))
+
+
+def test_equities_against_a_random_hand():
+    assert abs(_equity(['As', 'Ah']) - 0.852) < 0.005
+    assert abs(_equity(['7c', '2d']) - 0.346) < 0.005
+    assert abs(_equity(['Ks', 'Qs']) - 0.634) < 0.005
+
+
+def test_equities_of_both_sides_add_up():
+    equities = get_preflop_equities()
+    assert np.abs(equities + equities.T - 1).max() < 0.02
+
+
+def test_hand_classes():
+    assert class_name(hand_class(list(map(Card.new, ['As', 'Ah'])))) == 'AA'
+    assert class_name(hand_class(list(map(Card.new, ['Ks', 'Qs'])))) == 'KQs'
+    assert class_name(hand_class(list(map(Card.new, ['2d', '7c'])))) == '72o'
+    assert CLASS_COMBOS.sum() == 1326
+
+
+def test_range_weights_hold_the_fraction():
+    for fraction in (0.1, 0.35, 1.0):
+        assert abs(range_weights(fraction).dot(CLASS_COMBOS) - fraction * 1326) < 1E-6
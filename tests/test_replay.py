@@ -0,0 +1,52 @@
+__author__ = 'montanawong'
+
+import gzip
+import json
+from ..utils.contexts import deal, make_context
+from ..utils.loadtest import synthesize_contexts
+from ..utils.replay import action_diffs, replay, replay_decisions
+
+PACKAGE = __package__.rsplit('.', 1)[0]
+STRATEGY = PACKAGE + '.strategy:HeadsUpStrategy'
+
+
+def _corpus(tmp_path, count=60):
+    filename = str(tmp_path / 'corpus.jsonl.gz')
+    with gzip.open(filename, 'wt') as file:
+        for record in synthesize_contexts(count, seed=1):
+            file.write(json.dumps(record) + '\n')
+    return filename
+
+
+def test_same_seed_same_actions(tmp_path):
+    filename = _corpus(tmp_path)
+    baseline = replay(filename, STRATEGY, seed=3)
+    assert not action_diffs(baseline, replay(filename, STRATEGY, seed=3))
+    assert not action_diffs(baseline, replay(filename, STRATEGY, seed=3, processes=2, chunk_size=7))
+
+
+def test_decisions_dont_depend_on_earlier_ones():
+    records = list(enumerate(synthesize_contexts(30, seed=2)))
+    together = replay_decisions(records, STRATEGY, seed=3)
+    # every decision on its own, last first
+    alone = [replay_decisions([record], STRATEGY, seed=3)[0] for record in reversed(records)][::-1]
+    assert not action_diffs(together, alone)
+
+
+def test_ranges_dont_carry_over():
+    # the same pocket and board raised into, then checked to in an unrelated record
+    for seed in range(10):
+        pocket, board = deal(3, seed=seed)
+        state = {'name': 'bot', 'pocket': pocket, 'aggression_factor': 1, 'player_index': None,
+                 'num_bets': 0, 'num_checks': 0, 'num_raises': 0}
+        raised = {'bot': state, 'context': make_context(board, opponents_last_move='RAISE', amount_to_call=300)}
+        checked = {'bot': state, 'context': make_context(board, opponents_last_move='CHECK')}
+        after_raise = replay_decisions([(0, raised), (1, checked)], STRATEGY)[1]
+        assert after_raise[2:4] == replay_decisions([(1, checked)], STRATEGY)[0][2:4]
+
+
+def test_monte_carlo_replays_are_reproducible():
+    records = list(enumerate(synthesize_contexts(30, seed=4)))
+    first = replay_decisions(records, STRATEGY, seed=5, method='monte_carlo', samples=2000)
+    second = replay_decisions(records, STRATEGY, seed=5, method='monte_carlo', samples=2000)
+    assert not action_diffs(first, second)
@@ -0,0 +1,33 @@
+__author__ = 'montanawong'
+
+import numpy as np
+from ..utils.cards import DECK
+from ..utils.rng import StrategyRandom, derive_seed
+
+
+def test_same_seed_same_streams():
+    first, second = StrategyRandom(7), StrategyRandom(7)
+    assert [first.decision.random() for _ in range(5)] == [second.decision.random() for _ in range(5)]
+    assert (first.monte_carlo.random(5) == second.monte_carlo.random(5)).all()
+    assert (first.deal(DECK, 10, 5) == second.deal(DECK, 10, 5)).all()
+
+
+def test_substreams_are_independent():
+    rng = StrategyRandom(7)
+    assert derive_seed(7, 'decision') != derive_seed(7, 'monte_carlo')
+    # drawing decisions doesn't move the simulations
+    rng.decision.random()
+    assert (rng.monte_carlo.random(5) == StrategyRandom(7).monte_carlo.random(5)).all()
+
+
+def test_spawned_streams_differ():
+    rng = StrategyRandom(7)
+    children = rng.spawn(2) + rng.spawn(2)
+    assert len(set(child.seed for child in children)) == 4
+    assert [child.seed for child in StrategyRandom(7).spawn(4)] == [child.seed for child in children]
+
+
+def test_deals_are_distinct_cards():
+    deals = StrategyRandom(1).deal(DECK, 1000, 7)
+    assert all(len(set(cards)) == 7 for cards in deals.tolist())
+    assert np.isin(deals, DECK).all()
@@ -0,0 +1,37 @@
+__author__ = 'montanawong'
+
+import pytest
+from ..utils.trace import DecisionTracer, card_index, card_string, read_traces
+
+
+def test_round_trip(tmp_path):
+    tracer = DecisionTracer(str(tmp_path))
+    tracer.record(3, ['As', 'Kd'], ['2c', '7h', '9s'], 0.5, 0.25, 0.125, 0.75, 'bet', 40, 0.01)
+    tracer.record(5, ['Th', 'Tc'], ['2c', '7h', '9s', 'Qd', '3s'], 0.875, 0.0, 0.0, 0.5, 'raise', 120, 0.02)
+    tracer.close()
+
+    records = list(read_traces(str(tmp_path)))
+    assert len(records) == 2
+    assert [card_string(card) for card in records[0].pocket] == ['As', 'Kd']
+    assert [card_string(card) for card in records[0].board] == ['2c', '7h', '9s']
+    assert len(records[1].board) == 5
+    assert (records[0].street, records[0].action, records[0].amount) == (3, 'bet', 40)
+    assert (records[0].hand_strength, records[0].pos_potential, records[0].neg_potential) == (0.5, 0.25, 0.125)
+    assert records[1].action == 'raise' and records[1].amount == 120
+    assert tracer.dropped == 0
+
+
+def test_bad_records_are_dropped(tmp_path):
+    tracer = DecisionTracer(str(tmp_path))
+    tracer.record(3, ['As', 'Kd'], ['2c', '7h', '9s'], 0.5, 0.25, 0.125, 0.75, 'shove', 40, 0.01)
+    tracer.record(3, ['As', 'Kd'], ['2c', '7h', '9s'], 0.5, 0.25, 0.125, 0.75, 'bet', -1, 0.01)
+    tracer.record(3, ['As', 'Kd'], ['2c', '7h', '9s'], 0.5, 0.25, 0.125, 0.75, 'bet', 40, 0.01)
+    tracer.close()
+    assert tracer.dropped == 2
+    assert len(list(read_traces(str(tmp_path)))) == 1
+
+
+def test_card_indices():
+    assert [card_string(card_index(card)) for card in ('2s', 'Ah', 'Td', 'Kc')] == ['2s', 'Ah', 'Td', 'Kc']
+    with pytest.raises(ValueError):
+        DecisionTracer('unused', max_files=0)
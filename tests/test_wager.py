@@ -0,0 +1,51 @@
+__author__ = 'montanawong'
+
+from ..strategy import HeadsUpStrategy, MAX_WAGER_POTS
+from ..utils.contexts import deal, make_context
+from ..utils.replay import ReplayBot
+
+HAND_STRENGTHS = (0.1, 0.3, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99)
+# stacks of both players in pots
+STACK_TO_POT_RATIOS = (0.5, 1, 3, 10, 50)
+
+
+def _sizes(num_board_cards, stack_to_pot, amount_to_call=0, pot=100):
+    strategy = HeadsUpStrategy(seed=0)
+    pocket, board = deal(num_board_cards, seed=1)
+    bot = ReplayBot({'name': 'bot', 'pocket': pocket})
+    stack = int(stack_to_pot * pot)
+    context = make_context(board, pot=pot, stack_size=stack, opponents_stack_size=stack,
+                           opponents_last_move='BET' if amount_to_call else None, amount_to_call=amount_to_call)
+    min_amount = 2 * amount_to_call if amount_to_call else 2
+    return stack, [strategy.size_wager(context, bot, min_amount, stack, hand_strength, amount_to_call)
+                   for hand_strength in HAND_STRENGTHS]
+
+
+def test_bets_grow_with_equity_up_to_the_cap():
+    for stack_to_pot in STACK_TO_POT_RATIOS:
+        stack, sizes = _sizes(4, stack_to_pot)
+        assert sizes == sorted(sizes)
+        assert max(sizes) <= min(stack, MAX_WAGER_POTS * 100)
+        # hands that are behind the hands calling a bigger bet don't bet more than the minimum
+        assert sizes[:3] == [2, 2, 2]
+        # a near lock bets at least the pot, or all in
+        assert sizes[-1] >= min(stack, 100)
+
+
+def test_medium_hands_bet_less_than_the_pot():
+    for stack_to_pot in STACK_TO_POT_RATIOS:
+        stack, sizes = _sizes(3, stack_to_pot)
+        assert sizes[HAND_STRENGTHS.index(0.7)] < min(stack, 50)
+
+
+def test_raises_stay_within_the_cap():
+    for stack_to_pot in STACK_TO_POT_RATIOS:
+        stack, sizes = _sizes(4, stack_to_pot, amount_to_call=50, pot=150)
+        assert max(sizes) <= min(stack, MAX_WAGER_POTS * 150 + 50)
+        assert sizes == sorted(sizes)
+
+
+def test_river_bets_stay_within_the_cap():
+    for stack_to_pot in STACK_TO_POT_RATIOS:
+        stack, sizes = _sizes(5, stack_to_pot)
+        assert 2 <= min(sizes) and max(sizes) <= min(stack, MAX_WAGER_POTS * 100)
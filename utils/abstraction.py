@@ -0,0 +1,388 @@
+__author__ = 'montanawong'
+
+# Potential-aware card abstraction for the flop and the turn.
+#
+# A table of exact HS/EHS values for every (pocket, board) is too big to finish (see
+# prediction.create_ehs_table()). Instead, every hand is described by the histogram of the hand
+# strengths it can have once the next card is dealt, and hands with similar histograms are
+# clustered with k-means into a fixed number of buckets per street. Only the bucket id of every
+# hand is stored, one byte each, along with the mean HS and potentials of every bucket.
+#
+# Hands are only stored for one board out of every set of boards that are the same up to a
+# renaming of the suits, e.g. 2s 7h Kd and 2h 7c Ks. A board is looked up by mapping it to that
+# canonical board and renaming the suits of the pocket the same way.
+
+import os
+from itertools import combinations, permutations
+import numpy as np
+from .board_index import BoardRankIndex
+from .cards import DECK, NUM_CARDS, NUM_POCKETS, POCKET_INDEX, POCKET_INDICES, card_indices
+from .tables import get_table
+
+
+ABSTRACTION_FILES = {
+    3: os.path.join(os.path.dirname(os.path.abspath(__file__)), 'abstraction_flop.bin'),
+    4: os.path.join(os.path.dirname(os.path.abspath(__file__)), 'abstraction_turn.bin')
+}
+# buckets per street, ids are stored as uint8
+NUM_BUCKETS = 64
+# width of the hand strength histograms is 1 / HISTOGRAM_BINS
+HISTOGRAM_BINS = 10
+# bucket id of pockets that can't be dealt on a board
+NO_BUCKET = 255
+# number of hands the k-means centroids are fitted on, every hand is then assigned to its closest centroid
+KMEANS_SAMPLE_SIZE = 500000
+KMEANS_ITERATIONS = 30
+
+# number of boards, buckets and bins, and the street
+ABSTRACTION_HEADER = 16
+# rows and columns of the hand potential counts, as in HeadsUpStrategy.calculate_hand_potential()
+AHEAD = 0
+TIED = 1
+BEHIND = 2
+# every renaming of the 4 suits
+SUIT_PERMUTATIONS = np.array(list(permutations(range(4))), dtype=np.int64)
+
+_abstractions = dict()
+
+
+def canonical_boards(boards):
+    """
+    Finds the canonical form of boards: of all the ways to rename their suits, the one with the
+    smallest card mask.
+
+    :param boards: (ndarray) card indices, one board per row
+
+    :return:
+            (tuple) the card masks of the canonical boards, and for every board the index in
+            SUIT_PERMUTATIONS of the renaming that turns it into its canonical board.
+    """
+    boards = np.asarray(boards, dtype=np.int64)
+    # cards of every board under every renaming, shape (boards, renamings, cards)
+    renamed = (boards // 4 * 4)[:, None, :] + SUIT_PERMUTATIONS[:, boards % 4].transpose(1, 0, 2)
+    masks = (np.int64(1) << renamed).sum(axis=2)
+    renaming = masks.argmin(axis=1)
+    return masks[np.arange(len(boards)), renaming], renaming
+
+
+def mask_cards(mask):
+    """
+    :param mask: (int) a card mask
+
+    :return:
+            (list) the indices of the cards in the mask, in ascending order.
+    """
+    return [card for card in range(NUM_CARDS) if mask >> card & 1]
+
+
+def board_histograms(board, evaluator, num_bins=HISTOGRAM_BINS):
+    """
+    Computes, for every pocket on a board, the histogram of its hand strength over every card that
+    can be dealt next, and its current hand strength and potentials.
+
+    The potentials are the same positive and negative potential as
+    HeadsUpStrategy.calculate_hand_potential() calculates, so a bucket's mean can stand in for them: every
+    pocket is compared with every other pocket it can be dealt against, before and after every next card,
+    all pockets of the board at once.
+
+    :param board: (list) 3 or 4 card indices
+    :param evaluator: (Evaluator) evaluator with evaluate_batch()
+    :param num_bins: (int) number of histogram bins
+
+    :return:
+            (tuple) histograms (cards.NUM_POCKETS x num_bins uint8 counts), stats (cards.NUM_POCKETS x 3 floats:
+            hand strength, positive and negative potential) and the live pockets (cards.NUM_POCKETS booleans).
+    """
+    board = list(board)
+    index = BoardRankIndex(DECK[board], evaluator)
+    strengths = index.hand_strengths()
+
+    # 3 * whether the row's pocket is AHEAD, TIED or BEHIND the column's, 9 if the two can't be dealt together
+    pockets = np.flatnonzero(index.live)
+    cards = POCKET_INDICES[pockets]
+    disjoint = ((cards[:, None, 0] != cards[None, :, 0]) & (cards[:, None, 0] != cards[None, :, 1]) &
+                (cards[:, None, 1] != cards[None, :, 0]) & (cards[:, None, 1] != cards[None, :, 1]))
+    before = np.where(disjoint, 3 * _compare(index.pocket_ranks[pockets]), 9).astype(np.int16)
+
+    histograms = np.zeros((NUM_POCKETS, num_bins), dtype=np.uint8)
+    # 3 * 3 hand potential counts of every pocket, the last 3 columns count the pairs that can't be dealt
+    counts = np.zeros((len(pockets), 12), dtype=np.int64)
+    offsets = 12 * np.arange(len(pockets), dtype=np.int64)[:, None]
+    for card in sorted(set(range(NUM_CARDS)) - set(board)):
+        next_index = BoardRankIndex(DECK[board + [card]], evaluator)
+        # the pockets that are still live hold neither the board nor the new card
+        live = np.flatnonzero(next_index.live)
+        next_strengths = next_index.hand_strengths()[live]
+        histograms[live, np.minimum((next_strengths * num_bins).astype(np.int64), num_bins - 1)] += 1
+
+        rows = np.flatnonzero(next_index.live[pockets])
+        cells = before[np.ix_(rows, rows)] + _compare(next_index.pocket_ranks[pockets[rows]])
+        counts[rows] += np.bincount(
+            (cells + offsets[:len(rows)]).ravel(), minlength=12 * len(rows)).reshape(-1, 12)
+
+    stats = np.zeros((NUM_POCKETS, 3), dtype=np.float32)
+    stats[:, 0] = strengths
+    stats[pockets, 1], stats[pockets, 2] = _potentials(counts[:, :9].reshape(-1, 3, 3))
+    return histograms, stats, index.live
+
+
+def _compare(ranks):
+    # AHEAD, TIED or BEHIND of every pocket (rows) against every other (columns), lower ranks are stronger
+    ranks = ranks.astype(np.int16)
+    return np.sign(ranks[:, None] - ranks[None, :]) + np.int16(1)
+
+
+def _potentials(counts):
+    # HeadsUpStrategy.potential_from_matrix() of many 3 * 3 matrices at once, 0 where a hand can't be behind/ahead
+    totals = counts.sum(axis=2)
+    pos_potential = np.zeros(len(counts))
+    neg_potential = np.zeros(len(counts))
+    np.divide(counts[:, BEHIND, AHEAD] + counts[:, BEHIND, TIED] / 2.0 + counts[:, TIED, AHEAD] / 2.0,
+              totals[:, BEHIND] + totals[:, TIED] / 2.0, out=pos_potential,
+              where=totals[:, BEHIND] + totals[:, TIED] > 0)
+    np.divide(counts[:, AHEAD, BEHIND] + counts[:, TIED, BEHIND] / 2.0 + counts[:, AHEAD, TIED] / 2.0,
+              totals[:, AHEAD] + totals[:, TIED] / 2.0, out=neg_potential,
+              where=totals[:, AHEAD] + totals[:, TIED] > 0)
+    return pos_potential, neg_potential
+
+
+def _histograms_of_boards(masks, backend, num_bins):
+    from .evaluation import get_evaluator
+
+    evaluator = get_evaluator(backend)
+    results = [board_histograms(mask_cards(int(mask)), evaluator, num_bins) for mask in masks]
+    return [np.array([result[i] for result in results]) for i in range(3)]
+
+
+def _cumulative(histograms):
+    # distances between cumulative histograms, rather than histograms, grow with how far
+    # probability mass has to move, so hands drawing to similar strengths end up together
+    cumulative = np.cumsum(histograms, axis=1, dtype=np.float32)
+    return cumulative / cumulative[:, -1:]
+
+
+def _closest(points, centroids, chunk_size=65536):
+    labels = np.empty(len(points), dtype=np.int64)
+    squared_centroids = (centroids ** 2).sum(axis=1)
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        # |p - c|^2 without the |p|^2 term, which is the same for every centroid
+        labels[start:start + chunk_size] = (squared_centroids - 2 * chunk.dot(centroids.T)).argmin(axis=1)
+    return labels
+
+
+def kmeans(points, num_clusters, weights=None, iterations=KMEANS_ITERATIONS, seed=None):
+    """
+    Weighted k-means with k-means++ seeding, vectorized over the points.
+
+    :param points: (ndarray) one point per row
+    :param num_clusters: (int) number of clusters
+    :param weights: (ndarray) weight of every point, all 1 if omitted
+    :param iterations: (int) maximum number of iterations
+    :param seed: (int) seed for the seeding
+
+    :return:
+            (tuple) the centroids (num_clusters rows) and the cluster of every point.
+    """
+    rng = np.random.default_rng(seed)
+    points = np.asarray(points, dtype=np.float32)
+    if weights is None:
+        weights = np.ones(len(points))
+
+    # k-means++: every next centroid is drawn with probability proportional to its squared distance
+    centroids = [points[rng.choice(len(points), p=weights / weights.sum())]]
+    distances = ((points - centroids[0]) ** 2).sum(axis=1)
+    for i in range(1, num_clusters):
+        probabilities = weights * distances
+        if probabilities.sum() == 0:
+            probabilities = weights
+        centroids.append(points[rng.choice(len(points), p=probabilities / probabilities.sum())])
+        distances = np.minimum(distances, ((points - centroids[-1]) ** 2).sum(axis=1))
+    centroids = np.array(centroids)
+
+    labels = None
+    for i in range(iterations):
+        new_labels = _closest(points, centroids)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+
+        totals = np.bincount(labels, weights, num_clusters)
+        for dimension in range(points.shape[1]):
+            centroids[:, dimension] = np.bincount(labels, weights * points[:, dimension], num_clusters) / \
+                                      np.maximum(totals, 1E-12)
+        # move empty clusters onto the points furthest from their centroid
+        empty = np.flatnonzero(totals == 0)
+        if len(empty):
+            furthest = np.argsort(((points - centroids[labels]) ** 2).sum(axis=1))[-len(empty):]
+            centroids[empty] = points[furthest]
+    return centroids, labels
+
+
+def build_abstraction(num_board_cards, filename=None, num_buckets=NUM_BUCKETS, num_bins=HISTOGRAM_BINS,
+                      num_boards=None, backend='seven_card', processes=1, seed=None):
+    """
+    Buckets every hand of a street and saves the bucket ids to a file that HandAbstraction maps.
+    Computing the histograms and potentials is the expensive part: every canonical board needs a rank
+    index for each card that can come next, and every pocket is compared with every other after each
+    of them. The 1,755 canonical flops take about half an hour per process; the 16,432 canonical
+    turns take hours unless a sample of them is bucketed with num_boards.
+
+    :param num_board_cards: (int) 3 for the flop, 4 for the turn
+    :param filename: (str) where to save the abstraction, ABSTRACTION_FILES[num_board_cards] by default
+    :param num_buckets: (int) number of buckets, at most 255
+    :param num_bins: (int) number of bins of the hand strength histograms
+    :param num_boards: (int) number of canonical boards to bucket, chosen at random, all of them if None
+    :param backend: (str) evaluator backend, see evaluation.EVALUATOR_BACKENDS
+    :param processes: (int) number of processes computing the histograms
+    :param seed: (int) seed for the board sample and the clustering
+
+    :return: (void)
+    """
+    if filename is None:
+        filename = ABSTRACTION_FILES[num_board_cards]
+    rng = np.random.default_rng(seed)
+
+    # every board of the street, and how many boards each canonical board stands for
+    boards = np.array(list(combinations(range(NUM_CARDS), num_board_cards)), dtype=np.int64)
+    masks, counts = np.unique(canonical_boards(boards)[0], return_counts=True)
+    if num_boards is not None and num_boards < len(masks):
+        chosen = np.sort(rng.choice(len(masks), num_boards, replace=False))
+        masks, counts = masks[chosen], counts[chosen]
+
+    chunks = np.array_split(masks, max(1, min(len(masks), 8 * processes)))
+    if processes <= 1:
+        parts = [_histograms_of_boards(chunk, backend, num_bins) for chunk in chunks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(processes) as pool:
+            parts = list(pool.map(_histograms_of_boards, chunks, [backend] * len(chunks), [num_bins] * len(chunks)))
+    histograms, stats, live = [np.concatenate([part[i] for part in parts]) for i in range(3)]
+
+    # only the pockets that can be dealt are clustered, weighted by the number of boards they stand for
+    rows, pockets = np.nonzero(live)
+    weights = counts[rows].astype(np.float64)
+    points = _cumulative(histograms[rows, pockets])
+    sample = np.arange(len(points))
+    if len(points) > KMEANS_SAMPLE_SIZE:
+        sample = rng.choice(len(points), KMEANS_SAMPLE_SIZE, replace=False)
+    centroids, _ = kmeans(points[sample], num_buckets, weights[sample], seed=seed)
+    labels = _closest(points, centroids)
+
+    totals = np.maximum(np.bincount(labels, weights, num_buckets), 1E-12)
+    bucket_stats = np.array([
+        np.bincount(labels, weights * stats[rows, pockets, stat], num_buckets) / totals for stat in range(3)
+    ], dtype='<f4').T
+    bucket_ids = np.full((len(masks), NUM_POCKETS), NO_BUCKET, dtype=np.uint8)
+    bucket_ids[rows, pockets] = labels
+
+    # a process mapping the abstraction while it is rebuilt keeps reading the old file
+    from .evaluation import _write_atomically
+    _write_atomically(filename, [
+        np.array([len(masks), num_buckets, num_bins, num_board_cards], dtype='<u4').tobytes(),
+        masks.astype('<u8').tobytes(),
+        centroids.astype('<f4').tobytes(),
+        bucket_stats.tobytes(),
+        bucket_ids.tobytes()
+    ])
+
+
+class HandAbstraction(object):
+    """
+    The buckets of one street, mapped read-only from a file written by build_abstraction().
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    num_board_cards       int; the street, 3 for the flop and 4 for the turn
+    boards                ndarray; sorted card masks of the canonical boards
+    centroids             ndarray; cumulative hand strength histogram of every bucket
+    bucket_stats          ndarray; mean hand strength, positive and negative potential of every bucket
+    bucket_ids            ndarray; bucket of every pocket on every canonical board
+
+    FUNCTIONS:
+    bucket()              looks up the bucket of a hand
+    percepts()            looks up the hand strength and potentials of a hand's bucket
+    ====================  ====================================================
+    """
+
+    def __init__(self, filename):
+        num_boards, num_buckets, num_bins, self.num_board_cards = map(int, get_table(filename, '<u4', (4,)))
+        offset = ABSTRACTION_HEADER
+        self.boards = get_table(filename, '<u8', (num_boards,), offset)
+        offset += 8 * num_boards
+        self.centroids = get_table(filename, '<f4', (num_buckets, num_bins), offset)
+        offset += 4 * num_buckets * num_bins
+        self.bucket_stats = get_table(filename, '<f4', (num_buckets, 3), offset)
+        offset += 4 * num_buckets * 3
+        self.bucket_ids = get_table(filename, 'u1', (num_boards, NUM_POCKETS), offset)
+
+    def bucket(self, pocket, board):
+        """
+        :param pocket: (list) 2 card ints
+        :param board: (list) card ints, as many as the street has
+
+        :return:
+                (int) the bucket of the hand, None if its board wasn't bucketed.
+        """
+        masks, renamings = canonical_boards(card_indices(board)[None, :])
+        row = int(np.searchsorted(self.boards, masks[0]))
+        if row == len(self.boards) or self.boards[row] != masks[0]:
+            return None
+
+        # rename the pocket's suits the same way as the board's
+        pocket = card_indices(pocket)
+        first, second = pocket // 4 * 4 + SUIT_PERMUTATIONS[renamings[0]][pocket % 4]
+        bucket = int(self.bucket_ids[row, POCKET_INDEX[first, second]])
+        return None if bucket == NO_BUCKET else bucket
+
+    def percepts(self, pocket, board):
+        """
+        :param pocket: (list) 2 card ints
+        :param board: (list) card ints, as many as the street has
+
+        :return:
+                (tuple) the mean hand strength, positive potential and negative potential of the hand's bucket,
+                None if its board wasn't bucketed.
+        """
+        bucket = self.bucket(pocket, board)
+        if bucket is None:
+            return None
+        return tuple(float(stat) for stat in self.bucket_stats[bucket])
+
+
+def get_abstraction(num_board_cards):
+    """
+    Returns the abstraction of a street, mapped once per process.
+
+    :param num_board_cards: (int) number of cards on the board
+
+    :return:
+            (HandAbstraction) the street's abstraction, None if it hasn't been built.
+    """
+    abstraction = _abstractions.get(num_board_cards)
+    if abstraction is None:
+        filename = ABSTRACTION_FILES.get(num_board_cards)
+        if filename is None or not os.path.isfile(filename):
+            return None
+        abstraction = _abstractions.setdefault(num_board_cards, HandAbstraction(filename))
+    return abstraction
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Bucket the hands of the flop and/or the turn.')
+    parser.add_argument('streets', nargs='*', type=int, default=[3], help='3 for the flop, 4 for the turn')
+    parser.add_argument('--boards', type=int, help='number of canonical boards to sample, all of them by default')
+    parser.add_argument('--buckets', type=int, default=NUM_BUCKETS)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=2015)
+    args = parser.parse_args()
+
+    for street in args.streets:
+        build_abstraction(street, num_buckets=args.buckets, num_boards=args.boards,
+                          processes=args.processes, seed=args.seed)
+        print("saved %s" % ABSTRACTION_FILES[street])
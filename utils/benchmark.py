@@ -0,0 +1,284 @@
+__author__ = 'montanawong'
+
+import json
+import os
+from itertools import combinations
+from time import perf_counter
+import numpy as np
+from deuces3x.deuces.card import Card
+from .board_index import get_board_index
+from .cards import DECK, POCKETS, live_pockets
+
+
+PACKAGE = __package__.rsplit('.', 1)[0]
+# streets benchmarked, the river's hand strength is already exact and cheap
+STREETS = (0, 3, 4)
+STREET_NAMES = {0: 'pre-flop', 3: 'flop', 4: 'turn'}
+# spots dealt per street
+BENCHMARK_SPOTS = 40
+# sample counts tried for the Monte Carlo methods, between the scheduler's MIN_SAMPLES and MAX_SAMPLES
+SAMPLE_COUNTS = (500, 2000, 10000, 50000)
+# games of the stratified pre-flop reference, all of them can't be enumerated
+REFERENCE_SAMPLES = 500000
+# time budgets in milliseconds the per-street defaults are picked for
+BUDGETS_MS = (1, 10, 100)
+
+
+def runout_matrix(pocket, board, evaluator):
+    """
+    Enumerates every runout to the river (two cards on the flop, one on the turn) against every pocket the
+    opponent may hold, and counts how the showdowns compare with the hands as they stand.
+
+    :param pocket: (list) 2 card ints of our pocket
+    :param board: (list) 3 or 4 card ints
+    :param evaluator: (Evaluator) evaluator with evaluate_boards() and evaluate_runouts()
+
+    :return:
+            (ndarray) 3 * 3 counts, rows are AHEAD, TIED, BEHIND now and columns the same at showdown.
+    """
+    hand_rank = evaluator.evaluate(pocket, board)
+    live = np.flatnonzero(live_pockets(list(pocket) + list(board)))
+    other_ranks = get_board_index(board, evaluator).pocket_ranks[live]
+    deck = np.setdiff1d(DECK, list(pocket) + list(board))
+    runouts = np.array(list(combinations(deck.tolist(), 5 - len(board))), dtype=np.int64)
+    boards = np.column_stack([np.tile(np.asarray(board, dtype=np.int64), (len(runouts), 1)), runouts])
+
+    our_best = evaluator.evaluate_boards(pocket, boards)
+    # runout * opponent's pocket ranks, 0 where the runout is in the pocket
+    other_best = evaluator.evaluate_runouts(POCKETS[live], boards)
+
+    # lower rank means stronger hand
+    before = (hand_rank == other_ranks) + 2 * (hand_rank > other_ranks)
+    after = (our_best[:, None] == other_best) + 2 * (our_best[:, None] > other_best)
+    dealt = other_best > 0
+    return np.bincount((3 * before[None, :] + after)[dealt], minlength=9).reshape(3, 3)
+
+
+def matrix_equity(matrix):
+    """
+    :param matrix: (ndarray) 3 * 3 counts of runout_matrix()
+
+    :return:
+            (float) our share of the showdowns, ties counted half.
+    """
+    return float((matrix[:, 0].sum() + matrix[:, 1].sum() / 2.0) / matrix.sum())
+
+
+def postflop_methods(street, sample_counts=SAMPLE_COUNTS):
+    """
+    The ways HeadsUpStrategy can estimate our equity after the flop. Methods with a potential turn it into
+    equity as hand strength * (1 - negative potential) + (1 - hand strength) * positive potential, the
+    neutral form of calculate_effective_hand_strength(), which is exact given the exact potential over
+    every card still to come.
+
+    :param street: (int) 3 for the flop, 4 for the turn
+    :param sample_counts: (tuple) sample counts of the Monte Carlo potential
+
+    :return:
+            (list) (name, function of strategy, pocket and board strs -> equity or None) pairs.
+    """
+    def with_potential(potential):
+        def estimate(strategy, pocket, board):
+            percepts = potential(strategy, pocket, board)
+            if percepts is None:
+                return None
+            hand_strength = strategy.calculate_hand_strength(board, pocket)
+            return strategy.calculate_effective_hand_strength(hand_strength, percepts[0], percepts[1], False)
+        return estimate
+
+    def abstraction(strategy, pocket, board):
+        from .abstraction import get_abstraction
+        street_abstraction = get_abstraction(len(board))
+        if street_abstraction is None:
+            return None
+        percepts = street_abstraction.percepts(list(map(Card.new, pocket)), list(map(Card.new, board)))
+        if percepts is None:
+            return None
+        return strategy.calculate_effective_hand_strength(percepts[0], percepts[1], percepts[2], False)
+
+    methods = [
+        ('hand_strength', lambda strategy, pocket, board: strategy.calculate_hand_strength(board, pocket)),
+        ('abstraction', abstraction),
+        ('lookup', with_potential(lambda strategy, pocket, board: strategy.lookup_hand_potential(board, pocket)))
+    ]
+    for samples in sample_counts:
+        methods.append(('monte_carlo_%d' % samples, with_potential(
+            lambda strategy, pocket, board, samples=samples: strategy.estimate_hand_potential(board, pocket, samples))))
+    methods.append(('one_card', with_potential(
+        lambda strategy, pocket, board: strategy.calculate_hand_potential(board, pocket))))
+    if street == 3:
+        def two_card(strategy, pocket, board):
+            matrix = runout_matrix(list(map(Card.new, pocket)), list(map(Card.new, board)), strategy.evaluator)
+            return strategy.potential_from_matrix(matrix.tolist(), matrix.sum(axis=1).tolist())
+        methods.append(('two_card', with_potential(two_card)))
+    return methods
+
+
+def preflop_methods(sample_counts=SAMPLE_COUNTS):
+    """
+    The ways HeadsUpStrategy can estimate our equity before the flop: the Chen score the rules decide with
+    (a score on its own scale, so its error includes the scale's), the 169x169 class matrix, and
+    simulate_games() with every sampling method.
+
+    :param sample_counts: (tuple) games simulated
+
+    :return:
+            (list) (name, function of strategy, pocket and board strs -> equity) pairs.
+    """
+    from .preflop import NUM_CLASSES, equity_vs_range
+    from .sampling import SAMPLERS
+
+    methods = [
+        ('chen', lambda strategy, pocket, board: strategy.calculate_pre_flop_hand_strength(pocket)),
+        ('preflop_table', lambda strategy, pocket, board: equity_vs_range(list(map(Card.new, pocket)),
+                                                                          np.ones(NUM_CLASSES)))
+    ]
+    for method in sorted(SAMPLERS):
+        for samples in sample_counts:
+            methods.append(('simulate_%s_%d' % (method, samples),
+                            lambda strategy, pocket, board, method=method, samples=samples:
+                            strategy.simulate_games(pocket, {'board': board}, samples, method)))
+    return methods
+
+
+def pareto_front(methods):
+    """
+    :param methods: (dict) name -> stats with a 'mean_ms' and a 'mean_error'
+
+    :return:
+            (list) names of the methods no other method is both faster and more accurate than, from the fastest.
+    """
+    front = []
+    best = float('inf')
+    for name in sorted(methods, key=lambda name: (methods[name]['mean_ms'], methods[name]['mean_error'])):
+        if methods[name]['mean_error'] < best:
+            front.append(name)
+            best = methods[name]['mean_error']
+    return front
+
+
+def recommend(street_report, budget_ms):
+    """
+    :param street_report: (dict) a street of run_benchmark()'s report
+    :param budget_ms: (float) milliseconds a decision may spend on equity
+
+    :return:
+            (str) the most accurate method on the street's Pareto front within the budget, the fastest if none is.
+    """
+    methods = street_report['methods']
+    within = [name for name in street_report['pareto'] if methods[name]['mean_ms'] <= budget_ms]
+    return within[-1] if within else street_report['pareto'][0]
+
+
+def run_benchmark(spots=BENCHMARK_SPOTS, seed=0, backend='seven_card', sample_counts=SAMPLE_COUNTS,
+                  spec=PACKAGE + '.strategy:HeadsUpStrategy'):
+    """
+    Measures the error and the wall time of every equity method on a seeded corpus of spots, per street.
+    The ground truth is our exact equity against a random hand: every runout and every opponent pocket is
+    enumerated on the flop and the turn (see runout_matrix()). Pre-flop there are too many, so the truth is a
+    stratified simulation of REFERENCE_SAMPLES games, whose standard error is reported as the floor below which
+    errors can't be told apart.
+
+    Methods are timed with the board's rank index and the abstraction already loaded, as they are after the
+    first decision on a board, and after a first untimed call.
+
+    :param spots: (int) spots dealt per street
+    :param seed: (int) seed of the spots and of the strategy's random streams
+    :param backend: (str) evaluator backend of the strategy
+    :param sample_counts: (tuple) sample counts of the Monte Carlo methods
+    :param spec: (str) the strategy class, see utils.replay.load_strategy()
+
+    :return:
+            (dict) per street, the reference's standard error, the mean and maximum absolute error, the root mean
+            square error and the mean milliseconds of every method, and the Pareto front of time against mean
+            error.
+    """
+    from .contexts import deal
+    from .replay import load_strategy
+    from .rng import StrategyRandom, derive_seed
+    from .sampling import STRATIFIED
+
+    strategy = load_strategy(spec)(backend=backend)
+    strategy.rng = StrategyRandom(derive_seed(seed, 'benchmark'))
+
+    report = {'spots': spots, 'seed': seed, 'backend': backend, 'streets': dict()}
+    for street in STREETS:
+        methods = preflop_methods(sample_counts) if street == 0 else postflop_methods(street, sample_counts)
+        errors = dict((name, []) for name, _ in methods)
+        seconds = dict((name, []) for name, _ in methods)
+        reference_errors = []
+        for spot in range(spots):
+            pocket, board = deal(street, derive_seed(seed, 'benchmark %d %d' % (street, spot)))
+            if street == 0:
+                truth = strategy.simulate_games(pocket, {'board': board}, REFERENCE_SAMPLES, STRATIFIED)
+                reference_errors.append(strategy.percepts['simulation_error'])
+            else:
+                truth = matrix_equity(runout_matrix(list(map(Card.new, pocket)), list(map(Card.new, board)),
+                                                    strategy.evaluator))
+            for name, method in methods:
+                # the first call of a method may load tables or warm up the evaluator
+                if spot == 0:
+                    method(strategy, pocket, board)
+                start = perf_counter()
+                estimate = method(strategy, pocket, board)
+                elapsed = perf_counter() - start
+                # e.g. the street's abstraction hasn't been built
+                if estimate is not None:
+                    errors[name].append(abs(estimate - truth))
+                    seconds[name].append(elapsed)
+
+        stats = dict()
+        for name, _ in methods:
+            if errors[name]:
+                stats[name] = {
+                    'mean_error': float(np.mean(errors[name])),
+                    'rms_error': float(np.sqrt(np.mean(np.square(errors[name])))),
+                    'max_error': float(np.max(errors[name])),
+                    'mean_ms': 1000 * float(np.mean(seconds[name])),
+                    'spots': len(errors[name])
+                }
+        report['streets'][STREET_NAMES[street]] = {
+            'reference_error': float(np.sqrt(np.mean(np.square(reference_errors)))) if reference_errors else 0.0,
+            'methods': stats,
+            'pareto': pareto_front(stats)
+        }
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the accuracy and cost of every equity method.')
+    parser.add_argument('--spots', type=int, default=BENCHMARK_SPOTS, help='spots per street')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', default='seven_card')
+    parser.add_argument('--samples', default=','.join(map(str, SAMPLE_COUNTS)),
+                        help='comma separated sample counts of the Monte Carlo methods')
+    parser.add_argument('--strategy', default=PACKAGE + '.strategy:HeadsUpStrategy')
+    parser.add_argument('--output', help='JSON file to write the report to')
+    args = parser.parse_args(argv)
+
+    sample_counts = tuple(int(samples) for samples in args.samples.split(','))
+    start = perf_counter()
+    report = run_benchmark(args.spots, args.seed, args.backend, sample_counts, args.strategy)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1, sort_keys=True)
+
+    print('%d spots per street in %.1fs' % (args.spots, perf_counter() - start))
+    for street, street_report in report['streets'].items():
+        methods = street_report['methods']
+        print('%s (reference error %.4f)' % (street, street_report['reference_error']))
+        for name in sorted(methods, key=lambda name: methods[name]['mean_ms']):
+            stats = methods[name]
+            print('  %-26s %9.3fms  mean error %.4f  rms %.4f  max %.4f%s' % (
+                name, stats['mean_ms'], stats['mean_error'], stats['rms_error'], stats['max_error'],
+                '  *' if name in street_report['pareto'] else ''))
+        print('  defaults: %s' % ', '.join('%gms %s' % (budget, recommend(street_report, budget))
+                                           for budget in BUDGETS_MS))
+    if args.output:
+        print('written to %s' % os.path.abspath(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+__author__ = 'montanawong'
+
+import os
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+from .cards import NUM_CARDS, POCKETS, POCKET_INDICES, POCKETS_WITH_CARD, card_indices, live_pockets, pocket_index
+
+
+# number of boards whose index is kept in memory, each takes roughly 90KB (ranks and pockets per card of the
+# board's ~1,100 live pockets), so about 23MB per process. set MONTANA_BOARD_INDEX_CACHE to change it, e.g.
+# for a server playing more tables at once than there are cached boards
+BOARD_INDEX_CACHE_SIZE = int(os.environ.get('MONTANA_BOARD_INDEX_CACHE', 256))
+
+_board_indexes = OrderedDict()
+_board_index_lock = Lock()
+
+
+class BoardRankIndex(object):
+    """
+    Ranks every pocket that can still be dealt on a board once, and keeps the ranks sorted so
+    that the hand strength of any pocket is a couple of binary searches instead of
+    evaluating all ~1,081 opponent pockets.
+
+    The opponent can't hold either of our cards, so besides the sorted ranks of all live pockets
+    we keep, for every card, the sorted ranks of the live pockets containing it. Those are
+    subtracted from the totals for both of our cards (our own pocket is in both lists, so it
+    is added back once).
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    board                 tuple; the sorted card ints of the board
+    live                  ndarray; True for every pocket in cards.POCKETS that can be dealt on the board
+    pocket_ranks          ndarray; rank of every pocket in cards.POCKETS, 0 for pockets that can't be dealt
+    sorted_pockets        ndarray; positions in cards.POCKETS of all live pockets, strongest first
+    sorted_ranks          ndarray; ranks of all live pockets in ascending order
+    card_pockets          list; for every card index, the live pockets holding that card, strongest first
+    card_ranks            list; for every card index, sorted ranks of the live pockets holding that card
+
+    FUNCTIONS:
+    count()               counts the opponent pockets that beat, tie and lose to a rank
+    hand_strength()       calculates the hand strength of a pocket on this board
+    hand_strengths()      calculates the hand strength of every pocket on this board at once
+    range_equities()      calculates the equity of every pocket against weighted opponent ranges at once
+    ====================  ====================================================
+    """
+
+    def __init__(self, board, evaluator):
+        self.board = tuple(sorted(board))
+        self._hand_strengths = None
+
+        self.live = live = live_pockets(board)
+        self.pocket_ranks = np.zeros(len(POCKETS), dtype=np.int64)
+        self.pocket_ranks[live] = evaluator.evaluate_batch(POCKETS[live], list(self.board))
+        live_indices = np.flatnonzero(live)
+        self.sorted_pockets = live_indices[np.argsort(self.pocket_ranks[live_indices], kind='stable')]
+        self.sorted_ranks = self.pocket_ranks[self.sorted_pockets]
+
+        # filtering the sorted pockets keeps them sorted
+        self.card_ranks = [None] * NUM_CARDS
+        self.card_pockets = [None] * NUM_CARDS
+        sorted_indices = POCKET_INDICES[self.sorted_pockets]
+        for card in set(range(NUM_CARDS)) - set(card_indices(board).tolist()):
+            holding = (sorted_indices[:, 0] == card) | (sorted_indices[:, 1] == card)
+            self.card_pockets[card] = self.sorted_pockets[holding]
+            self.card_ranks[card] = self.sorted_ranks[holding]
+
+    def count(self, rank, pocket=None):
+        """
+        Counts the live opponent pockets that are stronger than, equal to and weaker than a rank.
+
+        :param rank: (int) the rank to compare against, lower is stronger
+        :param pocket: (list) 2 card ints held by us, pockets sharing a card with them are not counted
+
+        :return:
+                (tuple) the number of pockets the rank is behind, tied with and ahead of.
+        """
+        behind, tied, ahead = self._count(self.sorted_ranks, rank)
+        if pocket is not None:
+            for card in card_indices(pocket).tolist():
+                blocked = self._count(self.card_ranks[card], rank)
+                behind -= blocked[0]
+                tied -= blocked[1]
+                ahead -= blocked[2]
+
+            # our own pocket was removed once for each of its cards
+            own_rank = self.pocket_ranks[pocket_index(pocket)]
+            if own_rank < rank:
+                behind += 1
+            elif own_rank == rank:
+                tied += 1
+            else:
+                ahead += 1
+        return behind, tied, ahead
+
+    def hand_strength(self, pocket):
+        """
+        Calculates the same hand strength as HeadsUpStrategy.calculate_hand_strength()
+        using the sorted ranks.
+
+        :param pocket: (list) 2 card ints of the bot's pocket
+
+        :return:
+                hand_strength: (float) between 0 and 1
+        """
+        behind, tied, ahead = self.count(self.pocket_ranks[pocket_index(pocket)], pocket)
+        return (ahead + (tied / 2.0)) / (ahead + tied + behind)
+
+    def hand_strengths(self):
+        """
+        Calculates the hand strength of every live pocket at once, with the same card removal as count().
+        They are calculated on the first call and kept, so the array returned is shared and mustn't be modified.
+
+        :return:
+                (ndarray) cards.NUM_POCKETS floats between 0 and 1, 0 for pockets that can't be dealt.
+        """
+        if self._hand_strengths is None:
+            self._hand_strengths = self.range_equities(self.live)
+        return self._hand_strengths
+
+    def range_equities(self, weights):
+        """
+        Calculates the showdown equity of every live pocket against weighted opponent ranges, i.e. the
+        weighted share of the opponent's pockets it beats plus half the share it ties with. The pockets
+        sharing a card with ours are removed from the range.
+
+        The weights are summed in rank order once, after which the weight of the pockets stronger
+        than, or tied with, any pocket is a binary search into the prefix sums. Card removal subtracts
+        the prefix sums of the pockets holding each of our cards, in the same way count() does, so all
+        pockets against a range take O(n log n) rather than O(n^2).
+
+        :param weights: (ndarray) cards.NUM_POCKETS weights of the opponent's pockets, or one row of
+                        weights per range
+
+        :return:
+                (ndarray) equities between 0 and 1 of the same shape as weights, 0 for pockets that can't be
+                dealt or whose opponent range is empty.
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        ranks = self.pocket_ranks
+
+        def prefix_sums(pockets):
+            sums = np.zeros(weights.shape[:-1] + (len(pockets) + 1,))
+            np.cumsum(weights[..., pockets], axis=-1, out=sums[..., 1:])
+            return sums
+
+        sums = prefix_sums(self.sorted_pockets)
+        stronger = sums[..., np.searchsorted(self.sorted_ranks, ranks, 'left')]
+        not_weaker = sums[..., np.searchsorted(self.sorted_ranks, ranks, 'right')]
+        total = np.repeat(sums[..., -1:], len(ranks), axis=-1)
+        for card, card_ranks in enumerate(self.card_ranks):
+            if card_ranks is None:
+                continue
+            # every pocket holds two cards, so it has the pockets of both removed
+            holding = POCKETS_WITH_CARD[card]
+            card_sums = prefix_sums(self.card_pockets[card])
+            stronger[..., holding] -= card_sums[..., np.searchsorted(card_ranks, ranks[holding], 'left')]
+            not_weaker[..., holding] -= card_sums[..., np.searchsorted(card_ranks, ranks[holding], 'right')]
+            total[..., holding] -= card_sums[..., -1:]
+
+        # each pocket was removed once for each of its cards but only counted once, add it back as a tie
+        not_weaker += weights
+        total += weights
+        equities = np.zeros(total.shape)
+        np.divide(total - not_weaker + (not_weaker - stronger) / 2.0, total, out=equities, where=total > 1E-9)
+        equities[..., ~self.live] = 0.0
+        return equities
+
+    @staticmethod
+    def _count(sorted_ranks, rank):
+        stronger = int(np.searchsorted(sorted_ranks, rank, 'left'))
+        not_weaker = int(np.searchsorted(sorted_ranks, rank, 'right'))
+        return stronger, not_weaker - stronger, len(sorted_ranks) - not_weaker
+
+
+def get_board_index(board, evaluator):
+    """
+    Returns the rank index of a board, building it if it isn't cached. The cache is shared by every
+    strategy in the process and keeps the BOARD_INDEX_CACHE_SIZE most recently used boards.
+
+    :param board: (list) 3-5 card ints
+    :param evaluator: (Evaluator) evaluator used to build the index if needed
+
+    :return:
+            (BoardRankIndex) the board's index.
+    """
+    key = tuple(sorted(board))
+    with _board_index_lock:
+        index = _board_indexes.get(key)
+        if index is not None:
+            _board_indexes.move_to_end(key)
+            return index
+
+    # built outside the lock, two threads may race to build the same board which is harmless
+    index = BoardRankIndex(key, evaluator)
+    with _board_index_lock:
+        _board_indexes[key] = index
+        _board_indexes.move_to_end(key)
+        while len(_board_indexes) > BOARD_INDEX_CACHE_SIZE:
+            _board_indexes.popitem(last=False)
+    return index
@@ -0,0 +1,211 @@
+__author__ = 'montanawong'
+
+from collections import deque, namedtuple
+
+
+# seconds a decision may take, scaled between the two by the share of the effective stacks in the pot
+MIN_BUDGET = 0.002
+MAX_BUDGET = 0.5
+# share of the remaining time bank a single decision may take, when it is known
+TIME_BANK_SHARE = 0.05
+# bounds on the number of runouts sampled by the Monte Carlo potential
+MIN_SAMPLES = 500
+MAX_SAMPLES = 50000
+# weight of the latest measurement in the running cost estimates
+COST_SMOOTHING = 0.2
+# decisions of a street that skip the exact enumeration as too slow before it is measured again, so a few
+# slow first boards don't rule it out for good
+EXACT_PROBE_INTERVAL = 200
+# decisions kept in the log
+BUDGET_LOG_SIZE = 10000
+
+# equity methods from the cheapest to the most accurate
+LOOKUP = 'lookup'
+MONTE_CARLO = 'monte_carlo'
+EXACT = 'exact'
+
+# seconds per decision of the fixed cost methods, and per sample of Monte Carlo, until measured, as measured
+# for every evaluator backend on a single core
+DEFAULT_COSTS = {
+    'seven_card': {
+        (LOOKUP, 3): 0.0005,
+        (LOOKUP, 4): 0.0005,
+        (EXACT, 3): 0.005,
+        (EXACT, 4): 0.005,
+        (MONTE_CARLO, 3): 0.0000006,
+        (MONTE_CARLO, 4): 0.0000006
+    },
+    'deuces': {
+        (LOOKUP, 3): 0.0005,
+        (LOOKUP, 4): 0.0005,
+        (EXACT, 3): 0.23,
+        (EXACT, 4): 0.55,
+        (MONTE_CARLO, 3): 0.000005,
+        (MONTE_CARLO, 4): 0.000013
+    }
+}
+
+Budget = namedtuple('Budget', ['street', 'seconds', 'method', 'samples'])
+
+
+class ComputeScheduler(object):
+    """
+    Gives every decision a time budget and picks the way hand potential is estimated to fit it. Small pots
+    relative to the stacks get a table lookup or a few Monte Carlo samples; big pots get more samples or the
+    exact enumeration. The cost of every method is measured as decisions are made, so the choice follows
+    the speed of the machine and of the evaluator backend, starting from the backend's DEFAULT_COSTS. Monte Carlo
+    is only picked when its samples are expected to take less time than the exact enumeration. Once the exact
+    enumeration is estimated to take longer than a decision may, it is still run every EXACT_PROBE_INTERVAL
+    decisions of the street to measure it again.
+
+    Pre-flop decisions are always table lookups and river hand strength is always exact, both are cheap.
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    min_budget            float; seconds given to the least important decisions
+    max_budget            float; seconds given to all-in sized pots
+    time_bank             float or None; seconds left on the clock, spent down by record(), unlimited if None
+    costs                 dict; (method, street) -> measured seconds per decision, or per sample for Monte Carlo
+    skipped               dict; street -> decisions in a row that found the exact enumeration too slow
+    probing               set; streets whose exact enumeration is being measured again by the current decision
+    log                   deque; (street, method, samples, budget, actual seconds) of the latest decisions
+
+    FUNCTIONS:
+    plan()                assign a budget and an equity method to a decision
+    record()              log the time a decision actually took and update the cost estimates
+    summary()             compare budgets with actual times per street and method
+    ====================  ====================================================
+    """
+
+    def __init__(self, min_budget=MIN_BUDGET, max_budget=MAX_BUDGET, time_bank=None, backend='seven_card'):
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.time_bank = time_bank
+        self.costs = dict(DEFAULT_COSTS[backend])
+        self.skipped = dict()
+        self.probing = set()
+        self.log = deque(maxlen=BUDGET_LOG_SIZE)
+
+    def plan(self, context, stack_size, opponents_stack_size, lookup_available=False):
+        """
+        :param context: (dict) the game state of the decision
+        :param stack_size: (int) our stack
+        :param opponents_stack_size: (int) the opponent's stack
+        :param lookup_available: (boolean) whether the street's card abstraction has been built
+
+        :return:
+                (Budget) the street, the seconds the decision may take, the equity method and, for Monte Carlo,
+                the number of samples.
+        """
+        street = len(context['board'])
+        # how much of what can still be won or lost is already in the pot
+        pot = context['pot']
+        importance = pot / float(pot + max(min(stack_size, opponents_stack_size), 0)) if pot > 0 else 0.0
+        seconds = self.min_budget + (self.max_budget - self.min_budget) * importance
+        if self.time_bank is not None:
+            seconds = min(seconds, max(self.time_bank, 0.0) * TIME_BANK_SHARE)
+
+        if street == 0:
+            return Budget(street, seconds, LOOKUP, 0)
+        elif street == 5:
+            return Budget(street, seconds, EXACT, 0)
+
+        if seconds >= self.costs[(EXACT, street)]:
+            self.skipped[street] = 0
+            return Budget(street, seconds, EXACT, 0)
+        # every so often measure the exact enumeration again, as long as the clock can spare the longest decision
+        self.skipped[street] = self.skipped.get(street, 0) + 1
+        if self.skipped[street] >= EXACT_PROBE_INTERVAL and (
+                self.time_bank is None or self.time_bank * TIME_BANK_SHARE >= self.max_budget):
+            self.skipped[street] = 0
+            self.probing.add(street)
+            return Budget(street, seconds, EXACT, 0)
+        samples = int(seconds / self.costs[(MONTE_CARLO, street)])
+        if samples < MIN_SAMPLES and lookup_available:
+            return Budget(street, seconds, LOOKUP, 0)
+        samples = max(MIN_SAMPLES, min(samples, MAX_SAMPLES))
+        # sampling is less accurate than the enumeration, it has to be cheaper too
+        if samples * self.costs[(MONTE_CARLO, street)] >= self.costs[(EXACT, street)]:
+            self.skipped[street] = 0
+            return Budget(street, seconds, EXACT, 0)
+        return Budget(street, seconds, MONTE_CARLO, samples)
+
+    def record(self, budget, seconds, potential_seconds=None):
+        """
+        :param budget: (Budget) the plan of the decision
+        :param seconds: (float) the time the whole decision took
+        :param potential_seconds: (float) the time spent estimating the hand potential, if any
+
+        :return: (void)
+        """
+        self.log.append((budget.street, budget.method, budget.samples, budget.seconds, seconds))
+        if self.time_bank is not None:
+            self.time_bank -= seconds
+
+        key = (budget.method, budget.street)
+        probe = budget.method == EXACT and budget.street in self.probing
+        self.probing.discard(budget.street)
+        if potential_seconds is not None and key in self.costs:
+            cost = potential_seconds / budget.samples if budget.method == MONTE_CARLO else potential_seconds
+            # a probe replaces the estimate it was made to check
+            if probe:
+                self.costs[key] = cost
+            else:
+                self.costs[key] += COST_SMOOTHING * (cost - self.costs[key])
+
+    def summary(self):
+        """
+        :return:
+                (dict) (street, method) -> number of decisions, mean budget and mean actual time in seconds, and
+                the number of decisions that went over budget.
+        """
+        summary = dict()
+        for street, method, samples, budget, actual in self.log:
+            entry = summary.setdefault((street, method), {'count': 0, 'budget': 0.0, 'actual': 0.0, 'over': 0})
+            entry['count'] += 1
+            entry['budget'] += budget
+            entry['actual'] += actual
+            entry['over'] += actual > budget
+        for entry in summary.values():
+            entry['budget'] /= entry['count']
+            entry['actual'] /= entry['count']
+        return summary
+
+
+class FixedScheduler(ComputeScheduler):
+    """
+    A ComputeScheduler that estimates the hand potential of every flop and turn decision the same way, whatever
+    the pot and however long earlier decisions took, so that replaying a decision gives the same action every
+    time. Used by utils/replay.py.
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    method                str; EXACT, MONTE_CARLO or LOOKUP, the exact enumeration where LOOKUP isn't available
+    samples               int; runouts sampled by MONTE_CARLO
+    ====================  ====================================================
+    """
+
+    def __init__(self, method=EXACT, samples=MAX_SAMPLES):
+        super().__init__()
+        self.method = method
+        self.samples = samples
+
+    def plan(self, context, stack_size, opponents_stack_size, lookup_available=False):
+        budget = super().plan(context, stack_size, opponents_stack_size, lookup_available)
+        if budget.street in (0, 5):
+            return budget
+        if self.method == MONTE_CARLO:
+            return budget._replace(method=MONTE_CARLO, samples=self.samples)
+        elif self.method == LOOKUP and lookup_available:
+            return budget._replace(method=LOOKUP, samples=0)
+        return budget._replace(method=EXACT, samples=0)
+
+    def record(self, budget, seconds, potential_seconds=None):
+        # the plan doesn't follow the costs, only log the decision
+        self.log.append((budget.street, budget.method, budget.samples, budget.seconds, seconds))
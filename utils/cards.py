@@ -0,0 +1,67 @@
+__author__ = 'montanawong'
+
+from itertools import combinations
+import numpy as np
+from deuces3x.deuces.deck import Deck
+
+
+# every card int in a fixed order, sorting deuces ints orders them by rank then suit,
+# so card index = 4 * rank + suit
+DECK = np.array(sorted(Deck.GetFullDeck()), dtype=np.int64)
+NUM_CARDS = len(DECK)
+
+# all 1326 two card pockets as pairs of card indices (first < second) and as card ints
+POCKET_INDICES = np.array(list(combinations(range(NUM_CARDS), 2)), dtype=np.int64)
+POCKETS = DECK[POCKET_INDICES]
+NUM_POCKETS = len(POCKETS)
+
+# POCKET_INDEX[i][j] is the position in POCKETS of the pocket made of cards i and j
+POCKET_INDEX = np.full((NUM_CARDS, NUM_CARDS), -1, dtype=np.int64)
+POCKET_INDEX[POCKET_INDICES[:, 0], POCKET_INDICES[:, 1]] = np.arange(NUM_POCKETS)
+POCKET_INDEX[POCKET_INDICES[:, 1], POCKET_INDICES[:, 0]] = np.arange(NUM_POCKETS)
+
+# POCKETS_WITH_CARD[i] holds the positions in POCKETS of the 51 pockets containing card i
+POCKETS_WITH_CARD = np.array([np.flatnonzero((POCKET_INDICES == card).any(axis=1)) for card in range(NUM_CARDS)])
+
+# bits 8-15 of a card int hold its rank and suit, which is enough to find its index
+_INDEX_BY_BITS = np.full(256, -1, dtype=np.int64)
+_INDEX_BY_BITS[(DECK >> 8) & 0xFF] = np.arange(NUM_CARDS)
+
+
+def card_indices(cards):
+    """
+    Converts card ints to their index in DECK.
+
+    :param cards: (list or array) card ints of any shape
+
+    :return:
+            (ndarray) the card indices, same shape as the input.
+    """
+    return _INDEX_BY_BITS[(np.asarray(cards, dtype=np.int64) >> 8) & 0xFF]
+
+
+def pocket_index(pocket):
+    """
+    Finds the position of a pocket in POCKETS.
+
+    :param pocket: (list) 2 card ints
+
+    :return:
+            (int) the pocket's index, between 0 and 1325.
+    """
+    first, second = card_indices(pocket)
+    return int(POCKET_INDEX[first, second])
+
+
+def live_pockets(dead_cards):
+    """
+    Flags the pockets that share no card with the dead cards.
+
+    :param dead_cards: (list) card ints that are already in play
+
+    :return:
+            (ndarray) NUM_POCKETS booleans, True where the pocket can still be dealt.
+    """
+    dead = np.zeros(NUM_CARDS, dtype=bool)
+    dead[card_indices(dead_cards)] = True
+    return ~(dead[POCKET_INDICES[:, 0]] | dead[POCKET_INDICES[:, 1]])
@@ -0,0 +1,73 @@
+__author__ = 'montanawong'
+
+from random import Random
+from deuces3x.deuces.card import Card
+from deuces3x.deuces.deck import Deck
+
+
+def make_context(board, name='bot', opponent='opponent', opponents_last_move=None, pot=40,
+                 amount_to_call=0, stack_size=1000, opponents_stack_size=1000, min_bet=2):
+    """
+    Builds a context dictionary shaped like the ones the engine passes to MyBot.get_action().
+    Used to drive the strategy outside of the engine, e.g. for timing it.
+
+    :param board: (list) 0-5 card strs on the board
+    :param name: (str) name of our bot
+    :param opponent: (str) name of the opponent
+    :param opponents_last_move: (str) 'CHECK', 'BET' or 'RAISE', None if we are making the first move
+    :param pot: (int) chips in the pot
+    :param amount_to_call: (int) chips needed to call the opponent's bet/raise
+    :param stack_size: (int) our stack
+    :param opponents_stack_size: (int) the opponent's stack
+    :param min_bet: (int) the minimum bet
+
+    :return:
+            context (dict) the game state.
+    """
+    history = [
+        {'type': 'POST', 'actor': opponent, 'amount': 1},
+        {'type': 'POST', 'actor': name, 'amount': 2}
+    ]
+    if board:
+        history.append({'type': 'DEAL', 'actor': None, 'amount': 0})
+
+    if opponents_last_move in ('BET', 'RAISE'):
+        history.append({'type': opponents_last_move, 'actor': opponent, 'amount': amount_to_call})
+        legal_actions = {
+            'FOLD': {},
+            'CALL': {'amount': amount_to_call},
+            'RAISE': {'min': 2 * amount_to_call, 'max': stack_size}
+        }
+    else:
+        if opponents_last_move == 'CHECK':
+            history.append({'type': 'CHECK', 'actor': opponent, 'amount': 0})
+        legal_actions = {
+            'CHECK': {},
+            'BET': {'min': min_bet, 'max': stack_size}
+        }
+
+    return {
+        'history': history,
+        'players': [
+            {'name': name, 'stack': stack_size},
+            {'name': opponent, 'stack': opponents_stack_size}
+        ],
+        'board': list(board),
+        'legal_actions': legal_actions,
+        'pot': pot
+    }
+
+
+def deal(num_board_cards, seed=None):
+    """
+    Deals a random pocket and board.
+
+    :param num_board_cards: (int) 0, 3, 4 or 5
+    :param seed: (int) seed for the deal
+
+    :return:
+            (tuple) the pocket and the board as lists of card strs.
+    """
+    deck = [Card.int_to_str(card) for card in Deck.GetFullDeck()]
+    Random(seed).shuffle(deck)
+    return deck[:2], deck[2:2 + num_board_cards]
@@ -0,0 +1,43 @@
+__author__ = 'montanawong'
+
+import numpy as np
+from .board_index import get_board_index
+from .cards import DECK, POCKETS, live_pockets, pocket_index
+
+
+def all_in_equity(pocket, board, weights, evaluator):
+    """
+    Calculates the exact equity of a pocket against a weighted opponent range once every board card
+    has been dealt, i.e. the weighted share of showdowns it wins plus half the share it ties.
+
+    On the river this is a lookup into the board's cached rank index (see BoardRankIndex.range_equities()).
+    On the turn every river card is dealt to every pocket of the range in a single batch, about 45 * 990
+    seven card hands, which takes a few milliseconds with the seven_card evaluator and about half a
+    second with deuces.
+
+    :param pocket: (list) 2 card ints of our pocket
+    :param board: (list) 4 or 5 card ints
+    :param weights: (ndarray) weights of the opponent's pockets, one per pocket in cards.POCKETS
+    :param evaluator: (Evaluator) evaluator with evaluate_boards() and evaluate_runouts()
+
+    :return:
+            (float) the equity, between 0 and 1.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if len(board) == 5:
+        return float(get_board_index(board, evaluator).range_equities(weights)[pocket_index(pocket)])
+    elif len(board) != 4:
+        raise ValueError('exact all-in equity needs a turn or river board')
+
+    # the opponent's pockets can't hold our cards or the board's
+    live = np.flatnonzero(live_pockets(list(pocket) + list(board)) & (weights > 0))
+    rivers = np.setdiff1d(DECK, list(pocket) + list(board))
+    boards = np.column_stack([np.tile(np.asarray(board, dtype=np.int64), (len(rivers), 1)), rivers])
+
+    our_ranks = evaluator.evaluate_boards(pocket, boards)
+    their_ranks = evaluator.evaluate_runouts(POCKETS[live], boards)
+
+    # nor the river card, those are ranked 0. lower ranks are stronger hands
+    showdown_weights = weights[live] * (their_ranks > 0)
+    shares = (their_ranks > our_ranks[:, None]) + 0.5 * (their_ranks == our_ranks[:, None])
+    return float((showdown_weights * shares).sum() / showdown_weights.sum())
@@ -0,0 +1,282 @@
+__author__ = 'montanawong'
+
+import atexit
+import os
+import sqlite3
+from threading import Lock
+from time import time
+import numpy as np
+from .abstraction import SUIT_PERMUTATIONS
+from .cards import card_indices
+from .tables import data_path
+
+
+# sqlite database of exact flop and turn percepts, kept across restarts in the data directory (see
+# tables.data_path()) unless a cache is given a path of its own
+EQUITY_CACHE_FILE = 'equity_cache.sqlite'
+# most entries kept on disk, the least used are compacted away beyond it
+MAX_CACHE_ENTRIES = 2000000
+# entries read into memory when the cache is opened, the most used first
+HOT_ENTRIES = 50000
+# most entries kept in memory, the oldest are dropped beyond it
+MEMORY_ENTRIES = 200000
+# new entries and hit counts are written in batches of this many
+FLUSH_SIZE = 256
+# seconds a writer waits for another process to finish writing
+BUSY_TIMEOUT = 5.0
+
+_caches = dict()
+_caches_lock = Lock()
+
+
+def canonical_key(pocket, board):
+    """
+    Finds the key of a hand in the cache. Renaming the suits of a hand doesn't change its hand strength or
+    potential, so of all 24 renamings the key is the one with the smallest board mask, then pocket mask.
+    The order of the cards doesn't matter either.
+
+    :param pocket: (list) 2 card ints
+    :param board: (list) 3-4 card ints
+
+    :return:
+            (tuple) the board and pocket masks, 52 bit ints with one bit per card.
+    """
+    cards = card_indices(list(board) + list(pocket))
+    renamed = cards // 4 * 4 + SUIT_PERMUTATIONS[:, cards % 4]
+    masks = np.int64(1) << renamed
+    board_masks = masks[:, :len(board)].sum(axis=1)
+    pocket_masks = masks[:, len(board):].sum(axis=1)
+    renaming = np.lexsort((pocket_masks, board_masks))[0]
+    return int(board_masks[renaming]), int(pocket_masks[renaming])
+
+
+class EquityCache(object):
+    """
+    A persistent cache of the exact hand strength, positive potential and negative potential of flop and
+    turn hands, so a restarted bot doesn't enumerate the common boards all over again.
+
+    Entries live in a sqlite database in WAL mode: any number of processes read it while one at a time
+    writes, and writes are batched so a writer holds the lock briefly. The most used entries are preloaded
+    into memory when the cache is opened. Once the database holds more than max_entries, the least used
+    are deleted when the cache flushes.
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    filename              str; path of the database
+    max_entries           int; most entries kept on disk
+    memory                dict; canonical key -> (hs, ppot, npot) of the entries read or written so far
+    pending               dict; canonical key -> [percepts or None, hits] not yet written to disk
+    entries               int; entries on disk, counted when the cache is opened and compacted
+    stats                 dict; memory hits, disk hits and misses
+
+    FUNCTIONS:
+    get()                 look up the percepts of a hand
+    put()                 add the percepts of a hand
+    preload()             read the most used entries into memory
+    flush()               write pending entries and hit counts to disk
+    compact()             delete the least used entries beyond max_entries
+    close()               flush and close the database
+    ====================  ====================================================
+    """
+
+    def __init__(self, filename=None, max_entries=MAX_CACHE_ENTRIES, hot_entries=HOT_ENTRIES):
+        if filename is None:
+            filename = data_path(EQUITY_CACHE_FILE)
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self.filename = filename
+        self.max_entries = max_entries
+        self.memory = dict()
+        self.pending = dict()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        self.lock = Lock()
+        # one connection per cache, shared by the threads of the process under the lock
+        self.connection = sqlite3.connect(filename, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS percepts ('
+            'board INTEGER, pocket INTEGER, hs REAL, ppot REAL, npot REAL, hits INTEGER, used REAL, '
+            'PRIMARY KEY (board, pocket)) WITHOUT ROWID'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS percepts_hits ON percepts (hits, used)')
+        self.connection.commit()
+        self.entries = self.connection.execute('SELECT COUNT(*) FROM percepts').fetchone()[0]
+        self.preload(hot_entries)
+
+    def get(self, pocket, board):
+        """
+        :param pocket: (list) 2 card ints
+        :param board: (list) 3-4 card ints
+
+        :return:
+                (tuple) the hand's hand strength, positive potential and negative potential, None if it isn't cached.
+        """
+        key = canonical_key(pocket, board)
+        with self.lock:
+            percepts = self.memory.get(key)
+            if percepts is None:
+                row = self.connection.execute(
+                    'SELECT hs, ppot, npot FROM percepts WHERE board = ? AND pocket = ?', key).fetchone()
+                if row is None:
+                    self.stats['misses'] += 1
+                    return None
+                percepts = tuple(row)
+                self._remember(key, percepts)
+                self.stats['disk_hits'] += 1
+            else:
+                self.stats['memory_hits'] += 1
+            self._pend(key, None)
+        return percepts
+
+    def put(self, pocket, board, hand_strength, pos_potential, neg_potential):
+        """
+        :param pocket: (list) 2 card ints
+        :param board: (list) 3-4 card ints
+        :param hand_strength: (float) the hand's exact hand strength
+        :param pos_potential: (float) its exact positive potential
+        :param neg_potential: (float) its exact negative potential
+
+        :return: (void)
+        """
+        key = canonical_key(pocket, board)
+        percepts = (float(hand_strength), float(pos_potential), float(neg_potential))
+        with self.lock:
+            self._remember(key, percepts)
+            self._pend(key, percepts)
+
+    def _remember(self, key, percepts):
+        # called with the lock held. dicts keep insertion order, so the first key is the oldest
+        self.memory[key] = percepts
+        if len(self.memory) > MEMORY_ENTRIES:
+            del self.memory[next(iter(self.memory))]
+
+    def _pend(self, key, percepts):
+        # called with the lock held. counts a use of the entry and flushes a full batch
+        entry = self.pending.setdefault(key, [None, 0])
+        if percepts is not None:
+            entry[0] = percepts
+        entry[1] += 1
+        if len(self.pending) >= FLUSH_SIZE:
+            self._flush()
+
+    def preload(self, limit=HOT_ENTRIES):
+        """
+        :param limit: (int) most entries to read
+
+        :return:
+                (int) the number of entries read into memory.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT board, pocket, hs, ppot, npot FROM percepts ORDER BY hits DESC LIMIT ?', (limit,)).fetchall()
+            for board, pocket, hs, ppot, npot in rows:
+                self._remember((board, pocket), (hs, ppot, npot))
+        return len(rows)
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        # called with the lock held
+        if not self.pending:
+            return
+        now = time()
+        new = [key + percepts + (hits, now) for key, (percepts, hits) in self.pending.items() if percepts is not None]
+        used = [(hits, now) + key for key, (percepts, hits) in self.pending.items() if percepts is None]
+        self.pending.clear()
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT INTO percepts VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (board, pocket) DO UPDATE SET '
+                    'hits = hits + excluded.hits, used = excluded.used', new)
+                self.connection.executemany(
+                    'UPDATE percepts SET hits = hits + ?, used = ? WHERE board = ? AND pocket = ?', used)
+        except sqlite3.OperationalError:
+            # another process held the database for longer than BUSY_TIMEOUT, the batch is only a cache
+            return
+        self.entries += len(new)
+        if self.entries > self.max_entries:
+            self._compact(self.max_entries)
+
+    def compact(self, max_entries=None):
+        """
+        Deletes the least used, then least recently used, entries beyond max_entries and shrinks the write-ahead log.
+
+        :param max_entries: (int) entries to keep, the cache's max_entries if None
+
+        :return:
+                (int) the number of entries deleted.
+        """
+        with self.lock:
+            self._flush()
+            deleted = self._compact(self.max_entries if max_entries is None else max_entries)
+            try:
+                self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            except sqlite3.OperationalError:
+                # the log is shrunk by the next checkpoint instead
+                pass
+        return deleted
+
+    def _compact(self, max_entries):
+        # called with the lock held. new entries may have replaced existing ones, so count them again
+        try:
+            self.entries = self.connection.execute('SELECT COUNT(*) FROM percepts').fetchone()[0]
+            excess = self.entries - max_entries
+            if excess <= 0:
+                return 0
+            with self.connection:
+                self.connection.execute(
+                    'DELETE FROM percepts WHERE (board, pocket) IN '
+                    '(SELECT board, pocket FROM percepts ORDER BY hits, used LIMIT ?)', (excess,))
+        except sqlite3.OperationalError:
+            # another process held the database for longer than BUSY_TIMEOUT, a later flush compacts instead
+            return 0
+        self.entries = max_entries
+        return excess
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.connection.close()
+
+
+def get_equity_cache(filename=None):
+    """
+    Returns the process wide cache of a database file, opening it the first time it is requested, so every
+    strategy of the process shares its memory and its connection.
+
+    :param filename: (str) path of the database, EQUITY_CACHE_FILE in the data directory if omitted
+
+    :return:
+            (EquityCache) the cache.
+    """
+    filename = data_path(EQUITY_CACHE_FILE) if filename is None else os.path.abspath(filename)
+    cache = _caches.get(filename)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(filename)
+            if cache is None:
+                if not _caches:
+                    atexit.register(close_equity_caches)
+                cache = _caches[filename] = EquityCache(filename)
+    return cache
+
+
+def close_equity_caches():
+    """
+    Flushes and closes every cache the process opened. Registered to run at exit by get_equity_cache(), so
+    the last batch of entries isn't lost.
+
+    :return: (void)
+    """
+    with _caches_lock:
+        for cache in _caches.values():
+            try:
+                cache.close()
+            except sqlite3.Error:
+                pass
+        _caches.clear()
@@ -0,0 +1,506 @@
+__author__ = 'montanawong'
+
+import os
+import mmap
+import struct
+from bisect import bisect_left
+from threading import Lock
+import numpy as np
+from deuces3x.deuces.card import Card
+from deuces3x.deuces.deck import Deck
+from deuces3x.deuces.evaluator import Evaluator
+from deuces3x.deuces.lookup import LookupTable
+from .tables import data_path, map_file
+
+
+# prebuilt deuces lookup table, written by save_lookup_table()
+LOOKUP_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lookup_table.bin')
+LOOKUP_TABLE_MAGIC = b'DLUT'
+# magic, number of flush entries, number of unsuited entries
+LOOKUP_TABLE_HEADER = struct.Struct('<4sII')
+
+# seven card table shipped with the bot, written by save_seven_card_table()
+SEVEN_CARD_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seven_card_table.bin')
+SEVEN_CARD_TABLE_MAGIC = b'S7LT'
+# magic, number of rank count keys
+SEVEN_CARD_TABLE_HEADER = struct.Struct('<4sI')
+# one flush rank for every 13 bit rank mask
+NUM_FLUSH_MASKS = 1 << 13
+
+_evaluators = dict()
+_evaluator_lock = Lock()
+
+
+class SharedEvaluator(Evaluator):
+    """
+    A deuces Evaluator that is handed a ready made LookupTable instead of generating
+    its own. Generating the table is the expensive part of constructing an Evaluator,
+    so the table is either built once per process or read from a prebuilt file.
+
+    Behaves exactly like a regular Evaluator once constructed. The batch functions
+    simply evaluate one hand at a time and exist so that the deuces backend can be used
+    wherever a SevenCardEvaluator is, e.g. to check its results. vectorized is False so that
+    callers can skip the work only a vectorized backend does in time.
+    """
+
+    # the batch functions loop over evaluate()
+    vectorized = False
+
+    def __init__(self, table):
+        self.table = table
+        self.hand_size_map = {
+            5: self._five,
+            6: self._six,
+            7: self._seven
+        }
+
+    def evaluate_batch(self, pockets, board):
+        """
+        Ranks many pockets against one board.
+
+        :param pockets: (array) N * 2 card ints
+        :param board: (list) 3-5 card ints shared by every pocket
+
+        :return:
+                ranks (ndarray) N ranks between 1 and 7462, lower ranks are stronger hands.
+        """
+        board = np.asarray(board).tolist()
+        return np.array([self.evaluate(pocket, board) for pocket in np.asarray(pockets).tolist()], dtype=np.int64)
+
+    def evaluate_boards(self, pocket, boards):
+        """
+        Ranks one pocket against many boards.
+
+        :param pocket: (list) 2 card ints
+        :param boards: (array) N * 3-5 card ints
+
+        :return:
+                ranks (ndarray) N ranks between 1 and 7462, lower ranks are stronger hands.
+        """
+        pocket = np.asarray(pocket).tolist()
+        return np.array([self.evaluate(pocket, board) for board in np.asarray(boards).tolist()], dtype=np.int64)
+
+    def evaluate_hands(self, hands):
+        """
+        Ranks many complete hands.
+
+        :param hands: (array) N * 5-7 card ints
+
+        :return:
+                ranks (ndarray) N ranks between 1 and 7462, lower ranks are stronger hands.
+        """
+        return np.array([self.evaluate(hand, []) for hand in np.asarray(hands).tolist()], dtype=np.int64)
+
+    def evaluate_runouts(self, pockets, boards):
+        """
+        Ranks many pockets against many boards.
+
+        :param pockets: (array) N * 2 card ints
+        :param boards: (array) M * 3-5 card ints
+
+        :return:
+                ranks (ndarray) M * N ranks between 1 and 7462, lower ranks are stronger hands;
+                0 where a pocket shares a card with the board.
+        """
+        pockets = np.asarray(pockets).tolist()
+        ranks = np.zeros((len(boards), len(pockets)), dtype=np.int64)
+        for row, board in enumerate(np.asarray(boards).tolist()):
+            dealt = set(board)
+            ranks[row] = [0 if dealt.intersection(pocket) else self.evaluate(pocket, board) for pocket in pockets]
+        return ranks
+
+
+class PrebuiltLookupTable(LookupTable):
+    """
+    A deuces LookupTable read from a file written by save_lookup_table() rather than
+    computed from scratch. The file is mapped into memory with mmap and both lookup
+    dictionaries are filled straight from the mapped pages.
+    """
+
+    def __init__(self, filename):
+        self.flush_lookup = {}
+        self.unsuited_lookup = {}
+
+        with open(filename, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                magic, num_flush, num_unsuited = LOOKUP_TABLE_HEADER.unpack_from(buffer, 0)
+                if magic != LOOKUP_TABLE_MAGIC:
+                    raise IOError("%s is not a lookup table file" % filename)
+
+                # body is laid out as flush keys, unsuited keys, flush ranks, unsuited ranks
+                offset = LOOKUP_TABLE_HEADER.size
+                num_entries = num_flush + num_unsuited
+                view = memoryview(buffer)
+                keys = view[offset:offset + 4 * num_entries].cast('I')
+                ranks = view[offset + 4 * num_entries:offset + 6 * num_entries].cast('H')
+                try:
+                    self.flush_lookup = dict(zip(keys[:num_flush], ranks[:num_flush]))
+                    self.unsuited_lookup = dict(zip(keys[num_flush:], ranks[num_flush:]))
+                finally:
+                    # every view must be released before the map can be closed
+                    keys.release()
+                    ranks.release()
+                    view.release()
+
+
+def save_lookup_table(filename=LOOKUP_TABLE_FILE, table=None):
+    """
+    Writes the deuces lookup tables to a compact binary file so that later processes can
+    load them with mmap instead of regenerating them.
+
+    :param filename: (str) path of the file to write.
+    :param table: (LookupTable) the table to save, a freshly generated one is used if omitted.
+
+    :return: (void)
+    """
+    from array import array
+
+    if table is None:
+        table = LookupTable()
+
+    flush = sorted(table.flush_lookup.items())
+    unsuited = sorted(table.unsuited_lookup.items())
+    keys = array('I', [key for key, rank in flush + unsuited])
+    ranks = array('H', [rank for key, rank in flush + unsuited])
+
+    _write_atomically(filename, [LOOKUP_TABLE_HEADER.pack(LOOKUP_TABLE_MAGIC, len(flush), len(unsuited)),
+                                 keys.tobytes(), ranks.tobytes()])
+
+
+def load_evaluator(filename=LOOKUP_TABLE_FILE):
+    """
+    Builds an evaluator from a prebuilt lookup table file if one exists, otherwise the deuces
+    tables are generated as usual.
+
+    :param filename: (str) path of a file written by save_lookup_table().
+
+    :return:
+            evaluator (SharedEvaluator) an evaluator backed by the loaded/generated tables.
+    """
+    if os.path.isfile(filename):
+        table = PrebuiltLookupTable(filename)
+    else:
+        table = LookupTable()
+    return SharedEvaluator(table)
+
+
+class SevenCardEvaluator(object):
+    """
+    Alternative to the deuces Evaluator that ranks 5, 6 or 7 card hands with a couple of table
+    lookups instead of scoring every 5 card subset. Ranks are identical to the ones deuces
+    returns (1 is a royal flush, 7462 is 7-5-4-3-2 offsuit), so the two can be swapped freely.
+
+    Every card is packed into a single integer holding three fields that can simply be added up:
+        bits 0-31   5 ** rank, the sum is the hand's rank counts written in base 5
+        bits 32-47  one nibble per suit, the sum counts the cards of each suit
+        bits 48-99  the card's bit in a 52 bit mask, 13 bits per suit
+    If some suit holds 5 or more cards the hand is a flush and its rank is read from a table
+    indexed by that suit's 13 bit rank mask. With 7 cards a flush always beats whatever the
+    remaining 2 cards could make. Otherwise the rank is found by a binary search of the sorted
+    base 5 rank count keys.
+
+    The batch functions do the same with NumPy over whole arrays of hands. NumPy cannot hold
+    the 100 bit packed integer, so each field gets its own array indexed by bits 8-15 of the
+    deuces card int (its rank and suit). Because the fields add up, the board's share is
+    summed once and added to every pocket.
+
+    The tables are mapped from the file shipped with the bot (see find_seven_card_table()). Without it they
+    are built, which takes over a second, and saved to the data directory for the next process.
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    packed                dict; maps a deuces card int to its packed integer
+    flush_ranks           sequence; best flush rank for every 13 bit rank mask
+    keys                  sequence; sorted base 5 rank count keys of every non flush hand
+    ranks                 sequence; rank of the hand at the same position in keys
+    vectorized            boolean; True, the batch functions work on whole arrays at once
+
+    FUNCTIONS:
+    evaluate()            rank a hand, same signature as Evaluator.evaluate()
+    evaluate_batch()      rank an array of pockets against one board
+    evaluate_boards()     rank one pocket against an array of boards
+    evaluate_hands()      rank an array of complete hands
+    evaluate_runouts()    rank an array of pockets against an array of boards
+    ====================  ====================================================
+    """
+
+    vectorized = True
+
+    def __init__(self, filename=None):
+        self.packed = dict()
+        for card in Deck.GetFullDeck():
+            rank = Card.get_rank_int(card)
+            suit = Card.get_suit_int(card).bit_length() - 1
+            self.packed[card] = (5 ** rank) | (1 << (4 * suit + 32)) | (1 << (13 * suit + rank + 48))
+
+        if filename is None:
+            filename = find_seven_card_table()
+        if not os.path.isfile(filename):
+            buffer = build_seven_card_table()
+            # keep the table for the next process, it is fine if we are not allowed to
+            try:
+                save_seven_card_table(filename, buffer)
+            except OSError:
+                pass
+        # once the table is on disk every process maps the same pages (see utils/tables.py)
+        if os.path.isfile(filename):
+            buffer = map_file(filename)
+
+        magic, num_keys = SEVEN_CARD_TABLE_HEADER.unpack_from(buffer, 0)
+        if magic != SEVEN_CARD_TABLE_MAGIC:
+            raise IOError("%s is not a seven card table file" % filename)
+
+        # body is laid out as flush ranks, keys, ranks. The views below keep the map open
+        offset = SEVEN_CARD_TABLE_HEADER.size
+        view = memoryview(buffer)
+        self.flush_ranks = view[offset:offset + 2 * NUM_FLUSH_MASKS].cast('H')
+        offset += 2 * NUM_FLUSH_MASKS
+        self.keys = view[offset:offset + 4 * num_keys].cast('I')
+        offset += 4 * num_keys
+        self.ranks = view[offset:offset + 2 * num_keys].cast('H')
+
+        # NumPy views of the same tables for the batch functions
+        self.batch_flush_ranks = np.frombuffer(self.flush_ranks, dtype=np.uint16)
+        self.batch_keys = np.frombuffer(self.keys, dtype=np.uint32)
+        self.batch_ranks = np.frombuffer(self.ranks, dtype=np.uint16)
+        self.card_keys = np.zeros(256, dtype=np.int64)
+        self.card_suits = np.zeros(256, dtype=np.int64)
+        self.card_masks = np.zeros(256, dtype=np.int64)
+        for card, packed in self.packed.items():
+            index = (card >> 8) & 0xFF
+            self.card_keys[index] = packed & 0xFFFFFFFF
+            self.card_suits[index] = (packed >> 32) & 0xFFFF
+            self.card_masks[index] = packed >> 48
+
+    def evaluate(self, cards, board):
+        """
+        Ranks the best 5 card hand that can be made from the cards and the board.
+
+        :param cards: (list) card ints in the player's pocket
+        :param board: (list) card ints on the board, 5 to 7 cards in total with the pocket
+
+        :return:
+                rank (int) a rank between 1 and 7462, lower ranks are stronger hands.
+        """
+        packed = self.packed
+        hand = 0
+        for card in cards:
+            hand += packed[card]
+        for card in board:
+            hand += packed[card]
+
+        # adding 3 to every suit count sets the nibble's high bit only when 5+ cards share the suit
+        flush = ((hand >> 32) + 0x3333) & 0x8888
+        if flush:
+            suit = (flush.bit_length() - 1) >> 2
+            return self.flush_ranks[(hand >> (13 * suit + 48)) & 0x1FFF]
+        return self.ranks[bisect_left(self.keys, hand & 0xFFFFFFFF)]
+
+    def evaluate_batch(self, pockets, board):
+        """
+        Ranks many pockets against one board.
+
+        :param pockets: (array) N * 2 card ints
+        :param board: (list) 3-5 card ints shared by every pocket
+
+        :return:
+                ranks (ndarray) N ranks between 1 and 7462, lower ranks are stronger hands.
+        """
+        pockets = (np.asarray(pockets, dtype=np.int64) >> 8) & 0xFF
+        board = (np.asarray(board, dtype=np.int64) >> 8) & 0xFF
+        return self._rank(
+            self.card_keys[pockets].sum(axis=-1) + self.card_keys[board].sum(),
+            self.card_suits[pockets].sum(axis=-1) + self.card_suits[board].sum(),
+            self.card_masks[pockets].sum(axis=-1) + self.card_masks[board].sum()
+        )
+
+    def evaluate_boards(self, pocket, boards):
+        """
+        Ranks one pocket against many boards.
+
+        :param pocket: (list) 2 card ints
+        :param boards: (array) N * 3-5 card ints
+
+        :return:
+                ranks (ndarray) N ranks between 1 and 7462, lower ranks are stronger hands.
+        """
+        return self.evaluate_batch(boards, pocket)
+
+    def evaluate_hands(self, hands):
+        """
+        Ranks many complete hands.
+
+        :param hands: (array) N * 5-7 card ints
+
+        :return:
+                ranks (ndarray) N ranks between 1 and 7462, lower ranks are stronger hands.
+        """
+        return self.evaluate_batch(hands, [])
+
+    def evaluate_runouts(self, pockets, boards):
+        """
+        Ranks many pockets against many boards. The fields of the pockets and of the boards are
+        summed separately, and every pairing of the two is a single addition.
+
+        :param pockets: (array) N * 2 card ints
+        :param boards: (array) M * 3-5 card ints
+
+        :return:
+                ranks (ndarray) M * N ranks between 1 and 7462, lower ranks are stronger hands;
+                0 where a pocket shares a card with the board.
+        """
+        pockets = (np.asarray(pockets, dtype=np.int64) >> 8) & 0xFF
+        boards = (np.asarray(boards, dtype=np.int64) >> 8) & 0xFF
+        pocket_masks = self.card_masks[pockets].sum(axis=-1)
+        board_masks = self.card_masks[boards].sum(axis=-1)[:, None]
+
+        ranks = self._rank(
+            (self.card_keys[pockets].sum(axis=-1) + self.card_keys[boards].sum(axis=-1)[:, None]).ravel(),
+            (self.card_suits[pockets].sum(axis=-1) + self.card_suits[boards].sum(axis=-1)[:, None]).ravel(),
+            (pocket_masks + board_masks).ravel()
+        ).reshape(len(boards), len(pockets))
+        ranks[(pocket_masks & board_masks) != 0] = 0
+        return ranks
+
+    def _rank(self, keys, suits, masks):
+        """
+        Looks up the ranks of hands given their summed fields.
+
+        :param keys: (ndarray) summed base 5 rank count keys
+        :param suits: (ndarray) summed suit count nibbles
+        :param masks: (ndarray) summed 52 bit card masks
+
+        :return:
+                ranks (ndarray) the rank of every hand.
+        """
+        # hands with a repeated card, which evaluate_runouts() masks out afterwards, may sum past the last key
+        ranks = self.batch_ranks[np.minimum(np.searchsorted(self.batch_keys, keys), len(self.batch_keys) - 1)]
+
+        flush = (suits + 0x3333) & 0x8888
+        flushes = np.flatnonzero(flush)
+        if len(flushes):
+            flush = flush[flushes]
+            # only one suit's high bit can be set, turn it into the suit's index
+            suit = (flush > 0x8).astype(np.int64) + (flush > 0x80) + (flush > 0x800)
+            ranks[flushes] = self.batch_flush_ranks[(masks[flushes] >> (13 * suit)) & 0x1FFF]
+        return ranks
+
+
+def build_seven_card_table():
+    """
+    Generates the tables used by SevenCardEvaluator from the deuces lookup tables, so both
+    evaluators agree on every rank. Takes a couple of seconds, which is why the result is
+    normally saved to disk.
+
+    :return:
+            (bytes) the table file contents.
+    """
+    from array import array
+    from itertools import combinations, combinations_with_replacement
+
+    table = LookupTable()
+
+    # best flush that can be made from every rank mask of 5 to 7 suited cards
+    flush_ranks = array('H', [0]) * NUM_FLUSH_MASKS
+    for mask in range(NUM_FLUSH_MASKS):
+        rank_bits = [1 << rank for rank in range(13) if mask & (1 << rank)]
+        if 5 <= len(rank_bits) <= 7:
+            flush_ranks[mask] = min(
+                table.flush_lookup[Card.prime_product_from_rankbits(sum(five))]
+                for five in combinations(rank_bits, 5)
+            )
+
+    # best hand for every multiset of 5 to 7 ranks with at most 4 cards of one rank
+    entries = []
+    for num_cards in range(5, 8):
+        for hand in combinations_with_replacement(range(13), num_cards):
+            if any(hand[i] == hand[i + 4] for i in range(num_cards - 4)):
+                continue
+            best = LookupTable.MAX_HIGH_CARD
+            for five in set(combinations(hand, 5)):
+                product = 1
+                for rank in five:
+                    product *= Card.PRIMES[rank]
+                best = min(best, table.unsuited_lookup[product])
+            entries.append((sum(5 ** rank for rank in hand), best))
+    entries.sort()
+
+    keys = array('I', [key for key, rank in entries])
+    ranks = array('H', [rank for key, rank in entries])
+    return (SEVEN_CARD_TABLE_HEADER.pack(SEVEN_CARD_TABLE_MAGIC, len(entries)) +
+            flush_ranks.tobytes() + keys.tobytes() + ranks.tobytes())
+
+
+def find_seven_card_table():
+    """
+    :return:
+            (str) path of the seven card table: the one shipped with the bot, or else the one built into the data
+            directory (see tables.data_path()), which may not exist yet.
+    """
+    if os.path.isfile(SEVEN_CARD_TABLE_FILE):
+        return SEVEN_CARD_TABLE_FILE
+    return data_path(os.path.basename(SEVEN_CARD_TABLE_FILE))
+
+
+def _write_atomically(filename, chunks):
+    # written next to the destination and renamed over it, so a process starting at the same time never maps
+    # half a table. the temporary name is per process, as several may be building the table at once
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    temporary = '%s.%d.tmp' % (filename, os.getpid())
+    try:
+        with open(temporary, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+        os.replace(temporary, filename)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def save_seven_card_table(filename=SEVEN_CARD_TABLE_FILE, buffer=None):
+    """
+    Writes the SevenCardEvaluator tables to disk so they can be mapped with mmap at startup.
+
+    :param filename: (str) path of the file to write, the one shipped with the bot by default.
+    :param buffer: (bytes) the tables, freshly built if omitted.
+
+    :return: (void)
+    """
+    _write_atomically(filename, [build_seven_card_table() if buffer is None else buffer])
+
+
+# evaluator implementations a strategy can choose between
+EVALUATOR_BACKENDS = {
+    'deuces': load_evaluator,
+    'seven_card': SevenCardEvaluator
+}
+
+
+def get_evaluator(backend='seven_card'):
+    """
+    Returns the process wide evaluator of a backend, building it the first time it is requested.
+    All strategies using a backend share this single instance, so its lookup tables are
+    only constructed once per process no matter how many bots are created.
+
+    :param backend: (str) a key of EVALUATOR_BACKENDS, 'deuces' or 'seven_card'.
+
+    :return:
+            evaluator (SharedEvaluator or SevenCardEvaluator) the shared evaluator.
+    """
+    evaluator = _evaluators.get(backend)
+    if evaluator is None:
+        with _evaluator_lock:
+            # another thread may have finished building it while we waited
+            evaluator = _evaluators.get(backend)
+            if evaluator is None:
+                evaluator = EVALUATOR_BACKENDS[backend]()
+                _evaluators[backend] = evaluator
+    return evaluator
+
+
+if __name__ == "__main__":
+    save_lookup_table()
+    save_seven_card_table()
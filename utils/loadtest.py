@@ -0,0 +1,264 @@
+__author__ = 'montanawong'
+
+import json
+import os
+import resource
+from functools import partial
+from random import Random
+from time import perf_counter, sleep
+from .replay import ReplayBot, latency_report, load_strategy, read_corpus
+
+
+PACKAGE = __package__.rsplit('.', 1)[0]
+# share of the decisions made on each street, many hands end before the flop
+STREET_MIX = {0: 0.4, 3: 0.25, 4: 0.2, 5: 0.15}
+# seconds the engine allows for an action, a host whose p99 latency is above it is over capacity
+ACTION_CLOCK = 0.5
+# decisions played at every arrival rate of a capacity curve
+LEVEL_DECISIONS = 500
+
+
+def synthesize_contexts(count, seed=0):
+    """
+    Generates random decisions spread over the streets by STREET_MIX, with random stacks, pot sizes and
+    opponent moves. They have the shape of the records of read_corpus(), so a recorded corpus can be
+    played instead.
+
+    :param count: (int) number of decisions
+    :param seed: (int) seed of the decisions
+
+    :return:
+            (generator) dicts with the 'bot' state and the 'context' of every decision.
+    """
+    from .contexts import deal, make_context
+
+    rng = Random(seed)
+    streets = sorted(STREET_MIX)
+    for _ in range(count):
+        street = rng.choices(streets, [STREET_MIX[street] for street in streets])[0]
+        pocket, board = deal(street, seed=rng.getrandbits(32))
+        stack_size = rng.randint(50, 1000)
+        pot = rng.randint(3, 40) if street == 0 else rng.randint(10, 400)
+        context = make_context(
+            board, opponents_last_move=rng.choice((None, 'CHECK', 'BET', 'RAISE')), pot=pot,
+            amount_to_call=rng.randint(2, pot), stack_size=stack_size,
+            opponents_stack_size=rng.randint(50, 1000)
+        )
+        state = {
+            'name': 'bot', 'pocket': pocket, 'aggression_factor': rng.randint(1, 2), 'player_index': None,
+            'num_bets': rng.randint(0, 3), 'num_checks': rng.randint(0, 3), 'num_raises': rng.randint(0, 2)
+        }
+        yield {'bot': state, 'context': context}
+
+
+def decide(spec, backend, seed, position, record):
+    """
+    Makes one decision on a strategy of its own, with random streams derived from its position as in
+    replay_decisions(), so that no range or cost estimate carries over from an unrelated decision.
+
+    :return:
+            (tuple) the action's type and amount and the seconds determine_action() took.
+    """
+    from .rng import derive_seed
+
+    strategy = load_strategy(spec)(backend=backend, seed=derive_seed(seed, 'load:%d' % position))
+
+    start = perf_counter()
+    action = strategy.determine_action(record['context'], ReplayBot(record['bot']))
+    return action.get('type'), action.get('amount'), perf_counter() - start
+
+
+def _ready(backend):
+    # warms a worker up and holds it a moment, so every worker of the pool gets one
+    from .startup import warm_up
+    warm_up((backend,))
+    sleep(0.1)
+
+
+def _finish(results, position, street, scheduled, future):
+    # a decision that raised is reported as an ERROR action rather than dropped
+    if future.exception() is not None:
+        action, amount = 'ERROR', None
+    else:
+        action, amount, _ = future.result()
+    results[position] = (position, street, action, amount, perf_counter() - scheduled)
+
+
+def run_load(records, spec, backend='seven_card', rate=None, concurrency=1, mode='thread', seed=0):
+    """
+    Plays decisions against a pool of workers. Decisions arrive at random (Poisson) times at the given
+    rate whether or not earlier ones are done, as the actions of many tables would, and their latency
+    runs from arrival to the action, time spent waiting for a worker included.
+
+    :param records: (list) decisions from synthesize_contexts() or read_corpus()
+    :param spec: (str) the strategy class, see load_strategy()
+    :param backend: (str) evaluator backend of the strategy
+    :param rate: (float) decisions arriving per second, all at once if None
+    :param concurrency: (int) worker threads or processes
+    :param mode: (str) 'thread' to decide in this process, 'process' on a pool of processes
+    :param seed: (int) master seed of the arrivals and decisions
+
+    :return:
+            (dict) the load, the throughput in decisions per second, the CPU time used and its share of
+            the pool's capacity, peak RSS in MB, latency percentiles overall and per street (see
+            latency_report()).
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    executor_class = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+    arrivals = Random(seed)
+    results = [None] * len(records)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    with executor_class(concurrency) as pool:
+        list(pool.map(_ready, [backend] * concurrency))
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = scheduled = perf_counter()
+        for position, record in enumerate(records):
+            if rate:
+                scheduled += arrivals.expovariate(rate)
+                delay = scheduled - perf_counter()
+                if delay > 0:
+                    sleep(delay)
+            else:
+                scheduled = perf_counter()
+            future = pool.submit(decide, spec, backend, seed, position, record)
+            future.add_done_callback(partial(_finish, results, position, len(record['context']['board']), scheduled))
+    wall_seconds = perf_counter() - start
+
+    # workers' usage is only counted once they have exited
+    cpu_seconds = 0.0
+    for before, after in ((usage, resource.getrusage(resource.RUSAGE_SELF)),
+                          (children, resource.getrusage(resource.RUSAGE_CHILDREN))):
+        cpu_seconds += (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+
+    report = {
+        'mode': mode,
+        'concurrency': concurrency,
+        'rate': rate,
+        'decisions': len(records),
+        'throughput': len(records) / wall_seconds,
+        'cpu_seconds': cpu_seconds,
+        'cpu_utilization': cpu_seconds / (wall_seconds * min(concurrency, os.cpu_count() or 1)),
+        # ru_maxrss is in KB on Linux, the largest worker process in process mode
+        'max_rss_mb': resource.getrusage(
+            resource.RUSAGE_CHILDREN if mode == 'process' else resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        'latency': latency_report([(result[0], 'all') + result[2:] for result in results])['all'],
+        'streets': latency_report(results)
+    }
+    return report
+
+
+def capacity_curve(records, spec, backend='seven_card', rates=(5, 10, 20, 50, 100), concurrency=1, mode='thread',
+                   seed=0, clock=ACTION_CLOCK):
+    """
+    Plays LEVEL_DECISIONS decisions at every arrival rate, from the lowest, until the host falls behind:
+    p99 latency over the clock and throughput short of the rate.
+
+    :param records: (list) decisions from synthesize_contexts() or read_corpus(), cycled if too few
+    :param spec: (str) the strategy class, see load_strategy()
+    :param backend: (str) evaluator backend of the strategy
+    :param rates: (tuple) arrival rates in decisions per second
+    :param concurrency: (int) worker threads or processes
+    :param mode: (str) 'thread' or 'process', see run_load()
+    :param seed: (int) master seed
+    :param clock: (float) seconds allowed per action
+
+    :return:
+            (list) the run_load() report of every rate played.
+    """
+    level = [records[i % len(records)] for i in range(LEVEL_DECISIONS)]
+    curve = []
+    for rate in sorted(rates):
+        curve.append(run_load(level, spec, backend, rate, concurrency, mode, seed))
+        if curve[-1]['latency']['p99'] > 1000 * clock and curve[-1]['throughput'] < 0.9 * rate:
+            break
+    return curve
+
+
+def sustainable_rate(curve, clock=ACTION_CLOCK):
+    """
+    :param curve: (list) reports of capacity_curve()
+    :param clock: (float) seconds allowed per action
+
+    :return:
+            (float) the highest arrival rate played whose p99 latency is within the clock, 0 if none.
+    """
+    return max([report['rate'] for report in curve if report['latency']['p99'] <= 1000 * clock] or [0])
+
+
+def save_curve(filename, label, curve):
+    """
+    Adds a capacity curve to a JSON file of curves, e.g. one per version of the bot, replacing any curve
+    saved with the same label.
+
+    :param filename: (str) path of the file
+    :param label: (str) the curve's name, e.g. a version or commit
+    :param curve: (list) reports of capacity_curve()
+
+    :return: (void)
+    """
+    curves = load_curves(filename)
+    curves[label] = curve
+    with open(filename, 'w') as file:
+        json.dump(curves, file, indent=1, sort_keys=True)
+
+
+def load_curves(filename):
+    """
+    :param filename: (str) path of a file written by save_curve()
+
+    :return:
+            (dict) label -> curve, empty if the file doesn't exist.
+    """
+    if not os.path.isfile(filename):
+        return dict()
+    with open(filename) as file:
+        return json.load(file)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load test a strategy and save its capacity curve.')
+    parser.add_argument('--strategy', default=PACKAGE + '.strategy:HeadsUpStrategy')
+    parser.add_argument('--backend', default='seven_card')
+    parser.add_argument('--corpus', help='play a corpus written by ContextRecorder instead of random decisions')
+    parser.add_argument('--mode', choices=('thread', 'process'), default='thread')
+    parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--rates', default='5,10,20,50,100,200', help='comma separated decisions per second')
+    parser.add_argument('--clock', type=float, default=ACTION_CLOCK)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='JSON file to add the curve to')
+    parser.add_argument('--label', default='latest', help='name of the curve in the file')
+    parser.add_argument('--compare', action='store_true', help='print every curve saved in --save and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        if not args.save:
+            parser.error('--compare needs --save')
+        curves = load_curves(args.save)
+    else:
+        if args.corpus:
+            records = list(read_corpus(args.corpus))
+        else:
+            records = list(synthesize_contexts(LEVEL_DECISIONS, args.seed))
+        rates = [float(rate) for rate in args.rates.split(',')]
+        curve = capacity_curve(records, args.strategy, args.backend, rates, args.concurrency, args.mode,
+                               args.seed, args.clock)
+        if args.save:
+            save_curve(args.save, args.label, curve)
+        curves = {args.label: curve}
+
+    for label, curve in sorted(curves.items()):
+        print('%s: sustains %g decisions/s within a %gs clock' % (label, sustainable_rate(curve, args.clock), args.clock))
+        for report in curve:
+            print('  rate %-7g %6.1f/s  p50 %7.2fms  p99 %8.2fms  cpu %3.0f%%  rss %.0fMB' % (
+                report['rate'], report['throughput'], report['latency']['p50'], report['latency']['p99'],
+                100 * report['cpu_utilization'], report['max_rss_mb']))
+            for street, stats in report['streets'].items():
+                print('    %-9s p50 %7.2fms  p90 %7.2fms  p99 %8.2fms' % (street, stats['p50'], stats['p90'], stats['p99']))
+
+
+if __name__ == "__main__":
+    main()
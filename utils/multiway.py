@@ -0,0 +1,83 @@
+__author__ = 'montanawong'
+
+import numpy as np
+from .cards import DECK
+
+
+# most opponents at a full ring table
+MAX_OPPONENTS = 8
+# deals of a multi-way simulation, fewer when there are many opponents (see multiway_samples())
+MULTIWAY_SAMPLES = 4000
+# seven card hands ranked per estimate, ours and every opponent's in every deal. Bounds the time
+# an estimate takes however many seats are still in the hand
+MAX_EVALUATIONS = 20000
+
+
+def approximate_equity(hand_strength, num_opponents):
+    """
+    Approximates the equity against several opponents as HS^N, the chance of beating each of them in turn
+    if their hands were independent of each other. It ignores the cards they take from each other and how
+    ties split the pot, but costs nothing on top of the heads-up hand strength.
+
+    :param hand_strength: (float or ndarray) equity against a single random hand
+    :param num_opponents: (int) opponents still in the hand
+
+    :return:
+            (float or ndarray) the approximate equity.
+    """
+    return hand_strength ** num_opponents
+
+
+def multiway_samples(num_opponents, samples=MULTIWAY_SAMPLES, max_evaluations=MAX_EVALUATIONS):
+    """
+    :param num_opponents: (int) opponents still in the hand
+    :param samples: (int) deals wanted
+    :param max_evaluations: (int) most hands that may be ranked
+
+    :return:
+            (int) the deals that fit in max_evaluations, at most samples.
+    """
+    return max(1, min(samples, max_evaluations // (num_opponents + 1)))
+
+
+def simulate_equity(pocket, board, num_opponents, samples, evaluator, rng):
+    """
+    Estimates the equity of a pocket against several random opponents with Monte Carlo. Each deal gives
+    every opponent a pocket and completes the board from one draw without replacement, so the opponents'
+    hands are correlated through the cards they take from each other just like at the table. The hands
+    of all deals are ranked in a single batch.
+
+    The same deals are read for every number of opponents up to num_opponents, the first k pockets of a
+    deal being the hands of k opponents, so the estimates are consistent with each other.
+
+    :param pocket: (list) 2 card ints of our pocket
+    :param board: (list) 0-5 card ints
+    :param num_opponents: (int) opponents still in the hand, at most MAX_OPPONENTS
+    :param samples: (int) number of deals, see multiway_samples()
+    :param evaluator: (Evaluator) evaluator with evaluate_boards() and evaluate_hands()
+    :param rng: (StrategyRandom) random streams to deal from
+
+    :return:
+            (ndarray) num_opponents equities, against 1, 2, ... num_opponents opponents. A pot won outright
+            counts 1, a pot split k ways 1 / k.
+    """
+    if not 1 <= num_opponents <= MAX_OPPONENTS:
+        raise ValueError('between 1 and %d opponents are supported' % MAX_OPPONENTS)
+
+    pocket = list(pocket)
+    board = list(board)
+    deck = np.setdiff1d(DECK, pocket + board)
+    deals = rng.deal(deck, samples, 2 * num_opponents + 5 - len(board))
+
+    boards = np.column_stack([np.tile(np.asarray(board, dtype=np.int64), (samples, 1)), deals[:, 2 * num_opponents:]])
+    our_ranks = evaluator.evaluate_boards(pocket, boards)
+    pockets = deals[:, :2 * num_opponents].reshape(samples, num_opponents, 2)
+    hands = np.concatenate([pockets, np.repeat(boards[:, None, :], num_opponents, axis=1)], axis=2)
+    their_ranks = evaluator.evaluate_hands(hands.reshape(-1, 7)).reshape(samples, num_opponents)
+
+    # lower ranks are stronger hands. we win or split against the first k opponents when none of them
+    # is stronger, sharing the pot with the ones that tie us
+    best = np.minimum.accumulate(their_ranks, axis=1)
+    ties = np.cumsum(their_ranks == our_ranks[:, None], axis=1)
+    shares = np.where(our_ranks[:, None] <= best, 1.0 / (1 + ties), 0.0)
+    return shares.mean(axis=0)
@@ -0,0 +1,628 @@
+__author__ = 'montanawong'
+
+import os
+from bisect import bisect_left, bisect_right
+from random import Random
+from time import perf_counter
+import numpy as np
+from .tables import get_table
+
+
+PACKAGE = __package__.rsplit('.', 1)[0]
+# the compiled policy, written by compile_policy()
+POLICY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'policy_table.bin')
+POLICY_VERSION = 1
+# bytes before the tables: version, number of cells, outcomes per cell and samples per cell as uint32s
+POLICY_HEADER = 16
+
+# the dimensions of a situation
+STREETS = (0, 3, 4, 5)
+EQUITY_BUCKETS = 20
+RISK_BUCKETS = 8
+LAST_MOVES = (None, 'CHECK', 'BET', 'RAISE')
+# edges of the buckets of our stack to pot ratio, and the ratios compiled decisions are drawn between
+STACK_RATIO_EDGES = (1.0, 2.5, 6.0, 15.0)
+STACK_RATIO_RANGE = (0.25, 100.0)
+# facing a wager of our whole stack or not, we can only call all-in or fold then
+PRESSURE_STATES = 2
+# our aggression so far below the bot's aggression factor, or not (see do_bet())
+AGGRESSION_STATES = 2
+SHAPE = (len(STREETS), EQUITY_BUCKETS, RISK_BUCKETS, len(LAST_MOVES), len(STACK_RATIO_EDGES) + 1, PRESSURE_STATES,
+         AGGRESSION_STATES)
+NUM_CELLS = int(np.prod(SHAPE))
+
+# the outcomes of a decision: fold, check, call, a bet/raise of one of the sizes (shares of the pot) or all-in
+FOLD, CHECK, CALL = 0, 1, 2
+WAGER_SIZES = (0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 4.0)
+LOG_WAGER_SIZES = np.log(WAGER_SIZES)
+ALL_IN = 3 + len(WAGER_SIZES)
+NUM_OUTCOMES = ALL_IN + 1
+OUTCOMES = ('fold', 'check', 'call') + tuple('wager %gx' % size for size in WAGER_SIZES) + ('all-in',)
+# alias probabilities are stored as uint16s
+PROBABILITY_SCALE = 65535
+
+# decisions the rules make per cell when compiling
+COMPILE_SAMPLES = 100
+# random boards per street the cards of the compiled decisions are picked from
+POOL_BOARDS = 8
+# stacks of the compiled decisions, risk and stack ratio are shares so the size doesn't matter
+COMPILE_STACK = 1000
+# random situations checked by verify_policy(), and decisions of the rules per situation
+VERIFY_SITUATIONS = 300
+VERIFY_TRIALS = 400
+# how far the policy's actions may be from the rules' beyond sampling noise, in total variation distance,
+# overall and on every street
+VERIFY_TOLERANCE = 0.05
+# situations of every street the table must cover for the street to be checked
+VERIFY_MIN_SITUATIONS = 20
+# how far off the policy's wager sizes may be from the rules', as a factor of the pot share: about a third of
+# the step between neighbouring WAGER_SIZES
+VERIFY_SIZE_FACTOR = 1.2
+
+_policies = dict()
+
+
+def _bucket(value, buckets):
+    return min(max(int(value * buckets), 0), buckets - 1)
+
+
+def _actions(distribution):
+    # the chances of folding, checking, calling, wagering any of the sizes and going all-in
+    return np.concatenate((distribution[:3], [distribution[3:ALL_IN].sum(), distribution[ALL_IN]]))
+
+
+def _size_error(rules, table):
+    # mean distance between the log pot shares of the rules' wagers and the table's, given both wager
+    rules, table = rules[3:ALL_IN], table[3:ALL_IN]
+    if not rules.sum() or not table.sum():
+        return None
+    gaps = np.abs(LOG_WAGER_SIZES[:, None] - LOG_WAGER_SIZES[None, :])
+    return float((rules / rules.sum()).dot(gaps).dot(table / table.sum()))
+
+
+def situation(strategy, context, bot, opponents_last_move, stack_size, hand_strength):
+    """
+    Finds the cell of the table a decision falls in: its street, hand strength, the risk of the wager we face
+    (or the smallest we may open with), the opponent's last move, our stack to pot ratio, whether the wager
+    we face is our whole stack and whether our aggression is below the bot's aggression factor.
+
+    :param strategy: (HeadsUpStrategy) the strategy deciding
+    :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                    including but not limited to move history, pot size, and players.
+    :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
+    :param opponents_last_move: (string) the opponent's last move, None if we move first
+    :param stack_size: (int) the bot's stack size
+    :param hand_strength: (float) the hand strength the rules would decide with
+
+    :return:
+            (int) the cell, None if the decision doesn't fit in the table.
+    """
+    if len(context['board']) not in STREETS or opponents_last_move not in LAST_MOVES or stack_size <= 0 or \
+            context['pot'] <= 0:
+        return None
+    legal_actions = context['legal_actions']
+    if opponents_last_move in ('BET', 'RAISE'):
+        wager = legal_actions['CALL']['amount']
+    elif 'BET' in legal_actions:
+        wager = legal_actions['BET']['min']
+    else:
+        return None
+
+    risk = strategy.calculate_risk(context, bot, wager, stack_size)
+    aggressive = strategy.calculate_aggression(bot.num_bets, bot.num_raises, bot.num_checks) >= bot.aggression_factor
+    return int(np.ravel_multi_index((
+        STREETS.index(len(context['board'])),
+        _bucket(hand_strength, EQUITY_BUCKETS),
+        _bucket(risk, RISK_BUCKETS),
+        LAST_MOVES.index(opponents_last_move),
+        bisect_right(STACK_RATIO_EDGES, stack_size / float(context['pot'])),
+        int(opponents_last_move in ('BET', 'RAISE') and wager >= stack_size),
+        int(aggressive)
+    ), SHAPE))
+
+
+def classify(do, pot, stack_size):
+    """
+    :param do: (dict) the action the rules wrote to a strategy's "do" dictionary
+    :param pot: (int) the pot
+    :param stack_size: (int) the bot's stack size
+
+    :return:
+            (int) the outcome of the action, bets and raises go to the nearest of WAGER_SIZES.
+    """
+    action = do.get('action')
+    if action in ('bet', 'raise'):
+        if do['amount'] >= stack_size:
+            return ALL_IN
+        return 3 + int(np.argmin(np.abs(np.log(do['amount'] / float(pot)) - LOG_WAGER_SIZES)))
+    return OUTCOMES.index(action)
+
+
+def write_action(do, outcome, context, stack_size):
+    """
+    Writes an outcome to a strategy's "do" dictionary the way the rules would.
+
+    :param do: (dict) the strategy's "do" dictionary
+    :param outcome: (int) the outcome
+    :param context: (dict) the game state
+    :param stack_size: (int) the bot's stack size
+
+    :return:
+            (boolean) False if the outcome isn't a legal action, nothing is written then.
+    """
+    legal_actions = context['legal_actions']
+    if outcome == FOLD:
+        do['action'] = 'fold'
+    elif outcome == CHECK:
+        if 'CHECK' not in legal_actions:
+            return False
+        do['action'] = 'check'
+    elif outcome == CALL:
+        if 'CALL' not in legal_actions:
+            return False
+        do['action'] = 'call'
+        do['amount'] = legal_actions['CALL']['amount']
+    else:
+        kind = 'BET' if 'BET' in legal_actions else 'RAISE'
+        if kind not in legal_actions:
+            return False
+        minimum = legal_actions[kind]['min']
+        amount = stack_size if outcome == ALL_IN else int(round(WAGER_SIZES[outcome - 3] * context['pot']))
+        do['action'] = kind.lower()
+        do['amount'] = max(minimum, min(amount, stack_size))
+        do['min'] = minimum
+        do['max'] = stack_size
+    return True
+
+
+def alias_tables(counts):
+    """
+    Builds Walker's alias tables of the outcome distributions, so an outcome is sampled with one random
+    number and one comparison however many outcomes there are.
+
+    :param counts: (ndarray) cells * NUM_OUTCOMES counts of outcomes
+
+    :return:
+            (tuple) cells * NUM_OUTCOMES uint16 probabilities (scaled by PROBABILITY_SCALE) of keeping a column's
+            outcome, and uint8 outcomes taken instead.
+    """
+    counts = np.asarray(counts, dtype=np.float64).reshape(-1, NUM_OUTCOMES)
+    probabilities = np.full(counts.shape, PROBABILITY_SCALE, dtype='<u2')
+    aliases = np.tile(np.arange(NUM_OUTCOMES, dtype=np.uint8), (len(counts), 1))
+    for cell in np.flatnonzero(counts.sum(axis=1)):
+        scaled = counts[cell] * NUM_OUTCOMES / counts[cell].sum()
+        small = [outcome for outcome in range(NUM_OUTCOMES) if scaled[outcome] < 1.0]
+        large = [outcome for outcome in range(NUM_OUTCOMES) if scaled[outcome] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            probabilities[cell, less] = int(round(scaled[less] * PROBABILITY_SCALE))
+            aliases[cell, less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+    return probabilities, aliases
+
+
+class PolicyTable(object):
+    """
+    The rules of HeadsUpStrategy.apply_rules() compiled into a table: for every cell of SHAPE (see situation())
+    the distribution of the outcomes the rules chose there, stored as alias tables so an action is sampled in
+    O(1). The tables are mapped read-only from a file written by compile_policy().
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    samples               ndarray; decisions compiled in every cell, 0 where the table has no entry
+    probabilities         ndarray; cells * NUM_OUTCOMES chances, scaled by PROBABILITY_SCALE, of keeping a column
+    aliases               ndarray; cells * NUM_OUTCOMES outcomes taken when a column isn't kept
+
+    FUNCTIONS:
+    sample()              samples the outcome of a cell
+    distribution()        the outcome distribution of a cell
+    act()                 writes a sampled action to a strategy's "do" dictionary
+    ====================  ====================================================
+    """
+
+    def __init__(self, filename):
+        version, num_cells, num_outcomes, _ = map(int, get_table(filename, '<u4', (4,)))
+        if version != POLICY_VERSION or num_cells != NUM_CELLS or num_outcomes != NUM_OUTCOMES:
+            raise ValueError('%s was compiled for another table layout' % filename)
+        offset = POLICY_HEADER
+        self.samples = get_table(filename, '<u4', (num_cells,), offset)
+        offset += 4 * num_cells
+        self.probabilities = get_table(filename, '<u2', (num_cells, num_outcomes), offset)
+        offset += 2 * num_cells * num_outcomes
+        self.aliases = get_table(filename, 'u1', (num_cells, num_outcomes), offset)
+
+    def sample(self, cell, uniform):
+        """
+        :param cell: (int) the cell, see situation()
+        :param uniform: (float) a random number in [0, 1)
+
+        :return:
+                (int) the outcome.
+        """
+        column, fraction = divmod(uniform * NUM_OUTCOMES, 1.0)
+        column = int(column)
+        if fraction * PROBABILITY_SCALE < self.probabilities[cell, column]:
+            return column
+        return int(self.aliases[cell, column])
+
+    def distribution(self, cell):
+        """
+        :param cell: (int) the cell, see situation()
+
+        :return:
+                (ndarray) NUM_OUTCOMES probabilities of the outcomes.
+        """
+        kept = self.probabilities[cell] / float(PROBABILITY_SCALE)
+        return (kept + np.bincount(self.aliases[cell], 1.0 - kept, NUM_OUTCOMES)) / NUM_OUTCOMES
+
+    def act(self, strategy, context, bot, opponents_last_move, stack_size, hand_strength):
+        """
+        Samples an action for a decision from its cell with the strategy's decision stream and writes it to the
+        strategy's "do" dictionary.
+
+        :param strategy: (HeadsUpStrategy) the strategy deciding
+        :param context: (dict) the game state
+        :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
+        :param opponents_last_move: (string) the opponent's last move, None if we move first
+        :param stack_size: (int) the bot's stack size
+        :param hand_strength: (float) the hand strength the rules would decide with
+
+        :return:
+                (boolean) False if the table has no entry for the decision, the rules should decide then.
+        """
+        cell = situation(strategy, context, bot, opponents_last_move, stack_size, hand_strength)
+        if cell is None or not self.samples[cell]:
+            return False
+        return write_action(strategy.do, self.sample(cell, strategy.rng.decision.random()), context, stack_size)
+
+
+def _hand_pool(street, strategy, rng):
+    # hands to take the cards of a compiled decision from, sorted by hand strength: all pockets by their
+    # pre-flop strength, or every pocket on POOL_BOARDS random boards
+    from deuces3x.deuces.card import Card
+    from .board_index import get_board_index
+    from .cards import DECK, NUM_CARDS, POCKET_INDICES
+
+    names = [Card.int_to_str(card) for card in DECK]
+    if street == 0:
+        pockets = [[names[first], names[second]] for first, second in POCKET_INDICES]
+        hands = [(strategy.calculate_pre_flop_hand_strength(pocket), pocket, []) for pocket in pockets]
+    else:
+        hands = []
+        for _ in range(POOL_BOARDS):
+            board = sorted(rng.sample(range(NUM_CARDS), street))
+            index = get_board_index(DECK[board], strategy.evaluator)
+            strengths = index.hand_strengths()
+            for pocket in np.flatnonzero(index.live):
+                first, second = POCKET_INDICES[pocket]
+                hands.append((float(strengths[pocket]), [names[first], names[second]], [names[card] for card in board]))
+    hands.sort(key=lambda hand: hand[0])
+    return hands
+
+
+def _draw_wager(strategy, bot, risk_bucket, ratio_bucket, pressure, rng, attempts=20):
+    # draws a pot and a wager that fall in the buckets, None if none was found in a few attempts
+    from .contexts import make_context
+
+    low = STACK_RATIO_EDGES[ratio_bucket - 1] if ratio_bucket else STACK_RATIO_RANGE[0]
+    high = STACK_RATIO_EDGES[ratio_bucket] if ratio_bucket < len(STACK_RATIO_EDGES) else STACK_RATIO_RANGE[1]
+    context = make_context([], stack_size=COMPILE_STACK, opponents_stack_size=COMPILE_STACK)
+    wagers = np.array([COMPILE_STACK]) if pressure else np.arange(1, COMPILE_STACK)
+    for _ in range(attempts):
+        context['pot'] = pot = max(1, int(round(COMPILE_STACK / np.exp(rng.uniform(np.log(low), np.log(high))))))
+        risks = strategy.calculate_risk(context, bot, wagers, COMPILE_STACK)
+        fits = np.flatnonzero(np.minimum((risks * RISK_BUCKETS).astype(np.int64), RISK_BUCKETS - 1) == risk_bucket)
+        if len(fits):
+            return pot, int(wagers[fits[rng.randrange(len(fits))]])
+    return None
+
+
+def compile_street(street, samples=COMPILE_SAMPLES, seed=0, backend='seven_card',
+                   spec=PACKAGE + '.strategy:HeadsUpStrategy'):
+    """
+    Runs the rules samples times in every cell of a street and counts the outcomes. Every decision draws its
+    hand strength at random within the cell's bucket and takes its cards from a hand of about that strength,
+    for the rules that look at the cards (all-in calls and wager sizes on the river). Its pot and wager are
+    drawn at random too, among those that fall in the cell's stack to pot ratio and risk buckets. Cells no
+    decision can fall in are left empty.
+
+    The opponent's range is taken as uniform: the table doesn't know the history of the hand.
+
+    :param street: (int) number of cards on the board
+    :param samples: (int) decisions per cell
+    :param seed: (int) seed of the decisions
+    :param backend: (str) evaluator backend of the strategy
+    :param spec: (str) the strategy class, see utils.replay.load_strategy()
+
+    :return:
+            (ndarray) SHAPE[1:] + (NUM_OUTCOMES,) counts of the street's outcomes.
+    """
+    from .contexts import make_context
+    from .replay import ReplayBot, load_strategy
+    from .rng import StrategyRandom, derive_seed
+
+    strategy = load_strategy(spec)(backend=backend)
+    strategy.rng = StrategyRandom(derive_seed(seed, 'policy:%d' % street))
+    strategy.track_ranges = False
+    rng = Random(derive_seed(seed, 'policy cards:%d' % street))
+    hands = _hand_pool(street, strategy, rng)
+    strengths = [hand[0] for hand in hands]
+
+    # all-in equities only depend on the cards, many decisions share them
+    all_in_equities = dict()
+    all_in_equity = strategy.calculate_all_in_equity
+
+    def cached_all_in_equity(context, bot):
+        key = (tuple(bot.pocket), tuple(context['board']))
+        if key not in all_in_equities:
+            all_in_equities[key] = all_in_equity(context, bot)
+        return all_in_equities[key]
+    strategy.calculate_all_in_equity = cached_all_in_equity
+
+    counts = np.zeros(SHAPE[1:] + (NUM_OUTCOMES,), dtype=np.int64)
+    for aggression in range(AGGRESSION_STATES):
+        state = {'name': 'bot', 'aggression_factor': 1, 'player_index': None,
+                 'num_bets': 3 * aggression, 'num_checks': 0, 'num_raises': 0}
+        bot = ReplayBot(state)
+        for move_index, move in enumerate(LAST_MOVES):
+            facing = move in ('BET', 'RAISE')
+            for pressure in range(PRESSURE_STATES if facing else 1):
+                for ratio_bucket in range(len(STACK_RATIO_EDGES) + 1):
+                    for risk_bucket in range(RISK_BUCKETS):
+                        if _draw_wager(strategy, bot, risk_bucket, ratio_bucket, pressure, rng) is None:
+                            continue
+                        for equity_bucket in range(EQUITY_BUCKETS):
+                            low, high = equity_bucket / float(EQUITY_BUCKETS), (equity_bucket + 1) / float(EQUITY_BUCKETS)
+                            first, last = bisect_left(strengths, low), bisect_left(strengths, high)
+                            # pre-flop hand strength comes from the cards, some buckets have none
+                            if street == 0 and first == last:
+                                continue
+                            cell = counts[equity_bucket, risk_bucket, move_index, ratio_bucket, pressure, aggression]
+                            for _ in range(samples):
+                                drawn = _draw_wager(strategy, bot, risk_bucket, ratio_bucket, pressure, rng)
+                                if drawn is None:
+                                    continue
+                                pot, wager = drawn
+                                if first < last:
+                                    hand_strength, pocket, board = hands[rng.randrange(first, last)]
+                                else:
+                                    hand_strength, pocket, board = hands[min(first, len(hands) - 1)]
+                                if street:
+                                    hand_strength = rng.uniform(low, high)
+                                context = make_context(board, opponents_last_move=move, pot=pot, amount_to_call=wager,
+                                                       stack_size=COMPILE_STACK, opponents_stack_size=COMPILE_STACK,
+                                                       min_bet=2 if facing else wager)
+                                bot.pocket = pocket
+                                strategy.do.clear()
+                                strategy.apply_rules(context, bot, move is None, move, COMPILE_STACK, COMPILE_STACK,
+                                                     hand_strength)
+                                cell[classify(strategy.do, pot, COMPILE_STACK)] += 1
+    return counts
+
+
+def compile_policy(filename=POLICY_FILE, samples=COMPILE_SAMPLES, seed=0, backend='seven_card', processes=1):
+    """
+    Compiles the rules of every street (see compile_street()), one street per process, and writes the table.
+
+    :param filename: (str) path of the table file
+    :param samples: (int) decisions per cell
+    :param seed: (int) seed of the decisions
+    :param backend: (str) evaluator backend of the strategy
+    :param processes: (int) number of worker processes, 1 compiles in this process
+
+    :return:
+            (ndarray) the counts of every cell, SHAPE + (NUM_OUTCOMES,).
+    """
+    arguments = (STREETS, [samples] * len(STREETS), [seed] * len(STREETS), [backend] * len(STREETS))
+    if processes <= 1:
+        counts = list(map(compile_street, *arguments))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(processes) as pool:
+            counts = list(pool.map(compile_street, *arguments))
+    counts = np.stack(counts)
+    write_policy(filename, counts, samples)
+    return counts
+
+
+def write_policy(filename, counts, samples):
+    """
+    Writes the alias tables of outcome counts to a table file, replacing it whole so a bot mapping it never
+    sees half a table.
+
+    :param filename: (str) path of the table file
+    :param counts: (ndarray) the counts of every cell, SHAPE + (NUM_OUTCOMES,)
+    :param samples: (int) decisions per cell the counts were compiled from
+
+    :return: (void)
+    """
+    from .evaluation import _write_atomically
+
+    counts = np.asarray(counts).reshape(NUM_CELLS, NUM_OUTCOMES)
+    probabilities, aliases = alias_tables(counts)
+    _write_atomically(filename, [
+        np.array([POLICY_VERSION, NUM_CELLS, NUM_OUTCOMES, samples], dtype='<u4').tobytes(),
+        counts.sum(axis=1).astype('<u4').tobytes(), probabilities.tobytes(), aliases.tobytes()
+    ])
+    _policies.pop(os.path.abspath(filename), None)
+
+
+def get_policy_table(filename=POLICY_FILE):
+    """
+    Returns the compiled policy, mapped once per process.
+
+    :param filename: (str) path of the table file
+
+    :return:
+            (PolicyTable) the policy, None if it hasn't been compiled.
+    """
+    filename = os.path.abspath(filename)
+    policy = _policies.get(filename)
+    if policy is None:
+        if not os.path.isfile(filename):
+            return None
+        policy = _policies.setdefault(filename, PolicyTable(filename))
+    return policy
+
+
+def verify_policy(policy, situations=VERIFY_SITUATIONS, trials=VERIFY_TRIALS, seed=1, backend='seven_card',
+                  spec=PACKAGE + '.strategy:HeadsUpStrategy'):
+    """
+    Checks that the compiled policy decides like the rules. Random situations are dealt (random cards, stacks,
+    pot, wager, opponent move and aggression) and the rules decide each trials times. How often they fold,
+    check, call, wager or go all-in is compared with the table's distribution of the situation's cell by total
+    variation distance. Part of the distance is just the sampling noise of the trials, which is measured by
+    comparing the rules with a second run of themselves. Every street must be within VERIFY_TOLERANCE of its
+    noise, over at least VERIFY_MIN_SITUATIONS covered situations, so a street the table gets wrong isn't
+    averaged away by the others.
+
+    The size of a wager is left to a cell's distribution over WAGER_SIZES, while the rules size it from the
+    exact pot, stacks and hand strength, so sizes are measured apart: the mean factor between the table's
+    wagers and the rules', where both wager. It must be within VERIFY_SIZE_FACTOR for the policy to pass.
+
+    :param policy: (PolicyTable) the compiled policy
+    :param situations: (int) number of random situations
+    :param trials: (int) decisions of the rules per situation
+    :param seed: (int) seed of the situations, best different from the compiling seed
+    :param backend: (str) evaluator backend of the strategy
+    :param spec: (str) the strategy class, see utils.replay.load_strategy()
+
+    :return:
+            (dict) the cells of the table filled, the share of situations it covers, the mean distance of the
+            policy's actions from the rules' and of the rules' from themselves and the mean factor between their
+            wager sizes, overall and per street, the microseconds per decision of the rules and of the table, and
+            whether the policy and every street passed.
+    """
+    from .contexts import deal, make_context
+    from .replay import ReplayBot, STREETS as STREET_NAMES, load_strategy
+    from .rng import StrategyRandom, derive_seed
+
+    strategy = load_strategy(spec)(backend=backend)
+    strategy.rng = StrategyRandom(derive_seed(seed, 'verify'))
+    strategy.track_ranges = False
+    rng = Random(seed)
+
+    distances = dict((street, []) for street in STREETS)
+    noise = dict((street, []) for street in STREETS)
+    size_errors = dict((street, []) for street in STREETS)
+    covered = 0
+    rules_seconds = table_seconds = 0.0
+    for _ in range(situations):
+        street = rng.choice(STREETS)
+        pocket, board = deal(street, seed=rng.getrandbits(32))
+        move = rng.choice(LAST_MOVES)
+        stack_size = rng.randint(50, 1000)
+        wager = rng.randint(1, int(1.2 * stack_size)) if move in ('BET', 'RAISE') else rng.randint(2, max(2, stack_size // 4))
+        context = make_context(board, opponents_last_move=move, pot=rng.randint(3, 400), amount_to_call=wager,
+                               stack_size=stack_size, opponents_stack_size=rng.randint(50, 1000),
+                               min_bet=2 if move in ('BET', 'RAISE') else wager)
+        bot = ReplayBot({'name': 'bot', 'pocket': pocket, 'aggression_factor': rng.randint(1, 2), 'player_index': None,
+                         'num_bets': rng.randint(0, 3), 'num_checks': rng.randint(0, 3), 'num_raises': rng.randint(0, 2)})
+        if street == 0:
+            hand_strength = strategy.calculate_pre_flop_hand_strength(pocket)
+        else:
+            hand_strength = strategy.calculate_hand_strength(board, pocket)
+
+        cell = situation(strategy, context, bot, move, stack_size, hand_strength)
+        if cell is None or not policy.samples[cell]:
+            continue
+        covered += 1
+
+        runs = []
+        for _ in range(2):
+            outcomes = np.zeros(NUM_OUTCOMES)
+            start = perf_counter()
+            for _ in range(trials):
+                strategy.do.clear()
+                strategy.apply_rules(context, bot, move is None, move, stack_size, stack_size, hand_strength)
+                outcomes[classify(strategy.do, context['pot'], stack_size)] += 1
+            rules_seconds += perf_counter() - start
+            runs.append(outcomes / trials)
+        start = perf_counter()
+        for _ in range(trials):
+            strategy.do.clear()
+            policy.act(strategy, context, bot, move, stack_size, hand_strength)
+        table_seconds += perf_counter() - start
+
+        distances[street].append(0.5 * np.abs(_actions(runs[0]) - _actions(policy.distribution(cell))).sum())
+        # two noisy runs are about sqrt(2) times as far apart as one is from the truth
+        noise[street].append(0.5 * np.abs(_actions(runs[0]) - _actions(runs[1])).sum() / 2 ** 0.5)
+        size_error = _size_error(runs[0], policy.distribution(cell))
+        if size_error is not None:
+            size_errors[street].append(size_error)
+
+    def summary(streets):
+        # the mean distance, noise and wager size factor of some streets' situations, and whether they pass
+        street_distances = [distance for street in streets for distance in distances[street]]
+        street_noise = [distance for street in streets for distance in noise[street]]
+        street_size_errors = [error for street in streets for error in size_errors[street]]
+        distance = float(np.mean(street_distances)) if street_distances else 0.0
+        baseline = float(np.mean(street_noise)) if street_noise else 0.0
+        size_factor = float(np.exp(np.mean(street_size_errors))) if street_size_errors else 1.0
+        return {
+            'situations': len(street_distances),
+            'distance': distance,
+            'noise': baseline,
+            'size_factor': size_factor,
+            'passed': len(street_distances) >= VERIFY_MIN_SITUATIONS * len(streets) and
+                      distance <= baseline + VERIFY_TOLERANCE
+        }
+
+    report = summary(STREETS)
+    report['streets'] = dict((STREET_NAMES[street], summary((street,))) for street in STREETS)
+    report.update({
+        'cells': int(np.count_nonzero(policy.samples)),
+        'coverage': covered / float(situations),
+        'rules_us': 1E6 * rules_seconds / max(2 * covered * trials, 1),
+        'table_us': 1E6 * table_seconds / max(covered * trials, 1),
+        'passed': report['passed'] and report['size_factor'] <= VERIFY_SIZE_FACTOR and
+                  all(street['passed'] for street in report['streets'].values())
+    })
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compile the rules of the strategy into a policy table, or verify it.')
+    parser.add_argument('command', choices=('compile', 'verify'))
+    parser.add_argument('--output', default=POLICY_FILE, help='the table file')
+    parser.add_argument('--backend', default='seven_card')
+    parser.add_argument('--samples', type=int, default=COMPILE_SAMPLES, help='decisions per cell when compiling')
+    parser.add_argument('--processes', type=int, default=min(len(STREETS), os.cpu_count() or 1))
+    parser.add_argument('--situations', type=int, default=VERIFY_SITUATIONS)
+    parser.add_argument('--trials', type=int, default=VERIFY_TRIALS)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == 'compile':
+        start = perf_counter()
+        counts = compile_policy(args.output, args.samples, args.seed, args.backend, args.processes)
+        filled = np.count_nonzero(counts.sum(axis=-1))
+        print('compiled %d of %d cells in %.1fs, written to %s (%d bytes)' % (
+            filled, NUM_CELLS, perf_counter() - start, args.output, os.path.getsize(args.output)))
+        return
+
+    policy = get_policy_table(args.output)
+    if policy is None:
+        parser.error('%s has not been compiled' % args.output)
+    report = verify_policy(policy, args.situations, args.trials, args.seed + 1, args.backend)
+    print('%s: %d of %d cells filled, covering %.0f%% of situations' % (
+        'PASSED' if report['passed'] else 'FAILED', report['cells'], NUM_CELLS, 100 * report['coverage']))
+    print('  actions\' distance from the rules %.3f (noise %.3f, allowed %.3f)' % (
+        report['distance'], report['noise'], report['noise'] + VERIFY_TOLERANCE))
+    for street, stats in report['streets'].items():
+        print('  %-9s %s  n=%-4d distance %.3f  noise %.3f  allowed %.3f  sizes off %.2fx' % (
+            street, 'passed' if stats['passed'] else 'FAILED', stats['situations'], stats['distance'], stats['noise'],
+            stats['noise'] + VERIFY_TOLERANCE, stats['size_factor']))
+    print('  wager sizes off from the rules\' by a factor of %.2f on average (allowed %.2f)' % (
+        report['size_factor'], VERIFY_SIZE_FACTOR))
+    print('  %.1fus per decision by the rules, %.1fus by the table' % (report['rules_us'], report['table_us']))
+
+
+if __name__ == "__main__":
+    main()
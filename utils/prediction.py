@@ -1,10 +1,26 @@
 __author__ = 'montanawong'
 
-from montana.strategy import *
+from deuces3x.deuces.deck import Deck
 
-FULL_DECK = set(Deck().GetFullDeck())
 EPSILON = float(1E-5)
 EXT = '.txt'
+BINARY_EXT = '.bin'
+
+_full_deck = None
+
+
+def get_full_deck():
+    """
+    Returns the set of all 52 card ints, built the first time it is needed.
+
+    :return:
+            (set) every card in the deck.
+    """
+    global _full_deck
+
+    if _full_deck is None:
+        _full_deck = frozenset(Deck.GetFullDeck())
+    return _full_deck
 
 
 def generate_possible_hands(cards_in_play):
@@ -19,7 +35,7 @@ def generate_possible_hands(cards_in_play):
     cards_in_play = set(cards_in_play)
 
     #deck only contains cards not visible by our player
-    deck = list(FULL_DECK - cards_in_play)
+    deck = list(get_full_deck() - cards_in_play)
     combinations = []
 
     #generate all 2 pair combinations of cards that the other player may have
@@ -45,7 +61,7 @@ def generate_possible_boards(curr_board, player_hands):
         raise Exception('invalid board length')
 
     cards_in_play = set(curr_board + player_hands)
-    deck = list(FULL_DECK - cards_in_play)
+    deck = list(get_full_deck() - cards_in_play)
 
     # generate boards with only one additional card (e.g. if at flop simulate turn, if at turn simulate river)
     return [([deck[i]] + curr_board[:]) for i in range(len(deck))]
@@ -76,12 +92,14 @@ def create_hand_strength_table():
     (e.g.) {(23123, 4343, 21343, 43111, 5353) : 0.75 }
     :return: (void)
     """
+    from montana.strategy import HeadsUpStrategy
+
     strategy = HeadsUpStrategy()
 
     #generate all possible boards
     #board size = 3 first
     table = dict()
-    deck = list(FULL_DECK)
+    deck = list(get_full_deck())
     for first_card in range(len(deck)-2):
         for second_card in range(first_card+1, len(deck)-1):
             for third_card in range(second_card+1, len(deck)):
@@ -116,10 +134,12 @@ def create_ehs_table():
     This precomputed cache would trim down on calculations during gameplay however! Runs in roughly O(n^6) where n = 52
     :return: (void)
     """
+    from montana.strategy import HeadsUpStrategy
+
     strategy = HeadsUpStrategy()
     #generate all possible boards
     table = dict()
-    deck = list(FULL_DECK)
+    deck = list(get_full_deck())
     i=0
     for first_card in range(len(deck)-2):
         for second_card in range(first_card+1, len(deck)-1):
@@ -147,10 +167,74 @@ def create_ehs_table():
         raise IOError("Error closing file")
 
 
+def card_mask(cards):
+    """
+    Encodes a set of cards as a 52 bit integer with one bit per card, used as the key of binary tables.
+
+    :param cards: (list) card ints
+
+    :return:
+            (int) the mask.
+    """
+    from .cards import card_indices
+
+    mask = 0
+    for index in card_indices(cards).tolist():
+        mask |= 1 << index
+    return mask
+
+
+def save_cache_table(table, table_name):
+    """
+    Converts a table built by create_hand_strength_table() or create_ehs_table() to a binary file
+    that load_cache() maps read-only, so all bot processes on a host share one copy of it.
+    The file holds the number of entries, the sorted card masks of the keys and the values.
+
+    :param table: (dict) maps a sorted tuple of card ints to a float
+    :param table_name: (str) path of the file to write, without extension
+
+    :return: (void)
+    """
+    import numpy as np
+
+    keys = np.array([card_mask(key) for key in table], dtype='<u8')
+    values = np.array(list(table.values()), dtype='<f8')
+    order = np.argsort(keys)
+
+    with open(table_name + BINARY_EXT, 'wb') as file:
+        np.array([len(keys)], dtype='<u8').tofile(file)
+        keys[order].tofile(file)
+        values[order].tofile(file)
+
+
 def load_cache(key, table_name):
+    """
+    Looks up a precomputed value. Binary tables written by save_cache_table() are preferred: they
+    are mapped once and shared between processes, while text tables are parsed on every call.
+
+    :param key: (tuple) sorted card ints
+    :param table_name: (str) path of the table, without extension
+
+    :return:
+            (float) the value stored at the key.
+    """
     import os.path
     import ast
 
+    filename = table_name + BINARY_EXT
+    if os.path.isfile(filename):
+        import numpy as np
+        from .tables import get_table
+
+        size = int(get_table(filename, '<u8', (1,))[0])
+        keys = get_table(filename, '<u8', (size,), 8)
+        values = get_table(filename, '<f8', (size,), 8 + 8 * size)
+        mask = card_mask(key)
+        index = int(np.searchsorted(keys, mask))
+        if index == size or keys[index] != mask:
+            raise KeyError(key)
+        return float(values[index])
+
     filename = table_name + EXT
     value = None
     if os.path.isfile(filename):
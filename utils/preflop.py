@@ -0,0 +1,193 @@
+__author__ = 'montanawong'
+
+import os
+import numpy as np
+from .cards import DECK, NUM_CARDS, POCKET_INDICES, NUM_POCKETS, card_indices, live_pockets
+from .tables import get_table
+
+
+# 169x169 matrix of preflop all-in equities, written by save_preflop_equities()
+PREFLOP_EQUITY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preflop_equity.bin')
+# equities are stored as uint16 fractions of EQUITY_SCALE
+EQUITY_SCALE = 65535
+# deals simulated for every pair of hand classes when generating the matrix
+PREFLOP_SAMPLES = 10000
+
+RANKS = '23456789TJQKA'
+NUM_CLASSES = 169
+
+# a pocket's class sits in a 13x13 grid: pairs on the diagonal, suited hands at
+# [high rank][low rank] and offsuit hands at [low rank][high rank]
+_high = np.maximum(POCKET_INDICES[:, 0], POCKET_INDICES[:, 1]) // 4
+_low = np.minimum(POCKET_INDICES[:, 0], POCKET_INDICES[:, 1]) // 4
+_suited = POCKET_INDICES[:, 0] % 4 == POCKET_INDICES[:, 1] % 4
+POCKET_CLASSES = np.where(_suited, _high * 13 + _low, _low * 13 + _high)
+# number of pockets in each class: 6 for pairs, 4 for suited and 12 for offsuit hands
+CLASS_COMBOS = np.bincount(POCKET_CLASSES, minlength=NUM_CLASSES)
+
+
+def hand_class(pocket):
+    """
+    Finds the class (e.g. AKs, T9o, 77) of a pocket.
+
+    :param pocket: (list) 2 card ints
+
+    :return:
+            (int) the class index, between 0 and 168.
+    """
+    first, second = card_indices(pocket)
+    high, low = max(first, second) // 4, min(first, second) // 4
+    if first % 4 == second % 4:
+        return int(high * 13 + low)
+    return int(low * 13 + high)
+
+
+def class_name(index):
+    """
+    :param index: (int) a class index
+
+    :return:
+            (str) the class written the usual way, e.g. 'AKs', 'T9o' or '77'.
+    """
+    row, column = divmod(index, 13)
+    if row == column:
+        return RANKS[row] * 2
+    elif row > column:
+        return RANKS[row] + RANKS[column] + 's'
+    return RANKS[column] + RANKS[row] + 'o'
+
+
+def generate_preflop_equities(samples=PREFLOP_SAMPLES, evaluator=None, seed=None):
+    """
+    Computes the all-in equity of every hand class against every other by dealing random boards.
+    Each sample picks a pocket from both classes uniformly among the pairs that don't share a card,
+    so every matchup of specific pockets is equally likely. Takes several minutes, which is why the
+    result is saved to disk and loaded at runtime.
+
+    :param samples: (int) number of deals per pair of classes, the standard error is about 0.5 / sqrt(samples)
+    :param evaluator: (Evaluator) evaluator with batch functions, the shared seven card evaluator by default
+    :param seed: (int) seed for the random deals
+
+    :return:
+            equities (ndarray) 169x169 floats, equities[i][j] is the equity of class i against class j.
+    """
+    if evaluator is None:
+        from .evaluation import get_evaluator
+        evaluator = get_evaluator('seven_card')
+    rng = np.random.default_rng(seed)
+
+    class_pockets = [np.flatnonzero(POCKET_CLASSES == i) for i in range(NUM_CLASSES)]
+    equities = np.full((NUM_CLASSES, NUM_CLASSES), 0.5)
+    rows = np.arange(samples)[:, None]
+
+    for hero in range(NUM_CLASSES):
+        for villain in range(hero + 1, NUM_CLASSES):
+            hero_pockets = POCKET_INDICES[rng.choice(class_pockets[hero], samples)]
+            villain_pockets = POCKET_INDICES[rng.choice(class_pockets[villain], samples)]
+
+            # redeal both pockets whenever they share a card
+            while True:
+                clash = ((hero_pockets[:, :, None] == villain_pockets[:, None, :]).any(axis=(1, 2)))
+                if not clash.any():
+                    break
+                count = int(clash.sum())
+                hero_pockets[clash] = POCKET_INDICES[rng.choice(class_pockets[hero], count)]
+                villain_pockets[clash] = POCKET_INDICES[rng.choice(class_pockets[villain], count)]
+
+            # the board is the 5 cards with the lowest random keys, dealt cards get keys that can't be picked
+            keys = rng.random((samples, NUM_CARDS))
+            keys[rows, hero_pockets] = 2.0
+            keys[rows, villain_pockets] = 2.0
+            boards = np.argpartition(keys, 5, axis=1)[:, :5]
+
+            hero_ranks = evaluator.evaluate_hands(DECK[np.hstack((hero_pockets, boards))])
+            villain_ranks = evaluator.evaluate_hands(DECK[np.hstack((villain_pockets, boards))])
+            equity = (np.count_nonzero(hero_ranks < villain_ranks) +
+                      np.count_nonzero(hero_ranks == villain_ranks) / 2.0) / samples
+            equities[hero][villain] = equity
+            equities[villain][hero] = 1 - equity
+
+    return equities
+
+
+def save_preflop_equities(filename=PREFLOP_EQUITY_FILE, samples=PREFLOP_SAMPLES, seed=None):
+    """
+    Generates the preflop equity matrix and writes it to disk as 169x169 uint16s.
+
+    :param filename: (str) path of the file to write.
+    :param samples: (int) number of deals per pair of classes.
+    :param seed: (int) seed for the random deals
+
+    :return: (void)
+    """
+    equities = generate_preflop_equities(samples, seed=seed)
+    np.round(equities * EQUITY_SCALE).astype('<u2').tofile(filename)
+
+
+def get_preflop_table():
+    """
+    Returns the preflop equity matrix as stored on disk, mapped read-only and shared by every
+    process on the host.
+
+    :return:
+            table (ndarray) 169x169 uint16s, table[i][j] / EQUITY_SCALE is the equity of class i against class j.
+
+    :exception:
+            (FileNotFoundError) if the matrix hasn't been generated.
+    """
+    return get_table(PREFLOP_EQUITY_FILE, '<u2', (NUM_CLASSES, NUM_CLASSES))
+
+
+def get_preflop_equities():
+    """
+    Returns a private copy of the preflop equity matrix as floats.
+
+    :return:
+            equities (ndarray) 169x169 floats, equities[i][j] is the equity of class i against class j.
+    """
+    return get_preflop_table() / float(EQUITY_SCALE)
+
+
+def range_weights(fraction):
+    """
+    Estimates a range as the strongest fraction of all pockets, strength being a class's equity
+    against a random hand. The class on the boundary is partially included.
+
+    :param fraction: (float) share of the 1326 pockets in the range, between 0 and 1
+
+    :return:
+            weights (ndarray) 169 floats between 0 and 1, how much of each class is in the range.
+    """
+    strength = get_preflop_table().dot(CLASS_COMBOS)
+
+    weights = np.zeros(NUM_CLASSES)
+    remaining = fraction * NUM_POCKETS
+    for index in np.argsort(-strength):
+        if remaining <= 0:
+            break
+        weights[index] = min(1.0, remaining / CLASS_COMBOS[index])
+        remaining -= CLASS_COMBOS[index]
+    return weights
+
+
+def equity_vs_range(pocket, weights):
+    """
+    Looks up the all-in equity of a pocket against a weighted range of hand classes. Pockets of
+    the range that share a card with ours are removed before weighting.
+
+    :param pocket: (list) 2 card ints
+    :param weights: (ndarray) 169 weights, e.g. from range_weights()
+
+    :return:
+            equity (float) between 0 and 1
+    """
+    live = live_pockets(pocket)
+    combos = np.bincount(POCKET_CLASSES[live], minlength=NUM_CLASSES) * weights
+    total = combos.sum()
+    if total == 0:
+        return 0.5
+    return float(get_preflop_table()[hand_class(pocket)].dot(combos) / (total * EQUITY_SCALE))
+
+
+if __name__ == "__main__":
+    save_preflop_equities()
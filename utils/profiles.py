@@ -0,0 +1,258 @@
+__author__ = 'montanawong'
+
+import bz2
+import gzip
+import json
+import lzma
+import os
+
+
+# opponent profiles built offline from past matches, read by MyBot.set_memory()
+PROFILE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opponent_profiles.json')
+PROFILE_VERSION = 1
+# moves counted per street, CHECK and BET when nothing is to call, FOLD, CALL and RAISE when facing a wager
+MOVES = ('CHECK', 'BET', 'FOLD', 'CALL', 'RAISE')
+NUM_STREETS = 4
+# fewest moves on a street before its rates are trusted over the defaults of utils/ranges.py
+MIN_OBSERVATIONS = 30
+# compressed files are recognised by their extension
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+def read_hand_histories(filename):
+    """
+    Streams the records of a match log line by line, so archives of any size are read in constant memory.
+    Each line is a JSON record written by ContextRecorder ({'bot': ..., 'context': ...}) or a bare context
+    with a 'history'. The file may be plain, gzip, bz2 or xz compressed.
+
+    :param filename: (str) path of the log
+
+    :return:
+            (generator) dicts, one per line.
+    """
+    opener = OPENERS.get(os.path.splitext(filename)[1], open)
+    with opener(filename, 'rt') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ProfileAccumulator(object):
+    """
+    Counts the moves of every player on every street, and the hands they played. Counts add up, so
+    the accumulators of separate logs, or separate processes, merge into the accumulator of all of them.
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    hands                 dict; player name -> hands they made a move in
+    moves                 dict; player name -> NUM_STREETS lists of counts, one per move in MOVES
+
+    FUNCTIONS:
+    add()                 counts a move
+    merge()               adds the counts of another accumulator
+    profiles()            the counts as a dict, as saved by save_profiles()
+    ====================  ====================================================
+    """
+
+    def __init__(self, profiles=None):
+        self.hands = dict()
+        self.moves = dict()
+        for name, profile in (profiles or dict()).items():
+            self.hands[name] = profile['hands']
+            self.moves[name] = [list(counts) for counts in profile['moves']]
+
+    def add(self, name, street, move, new_hand=False):
+        """
+        :param name: (str) the player
+        :param street: (int) 0 pre-flop, 1 flop, 2 turn, 3 river
+        :param move: (str) one of MOVES
+        :param new_hand: (boolean) True for the player's first move of a hand
+
+        :return: (void)
+        """
+        counts = self.moves.get(name)
+        if counts is None:
+            counts = self.moves[name] = [[0] * len(MOVES) for _ in range(NUM_STREETS)]
+            self.hands[name] = 0
+        counts[street][MOVES.index(move)] += 1
+        if new_hand:
+            self.hands[name] += 1
+
+    def merge(self, other):
+        """
+        :param other: (ProfileAccumulator) counts to add to these
+
+        :return:
+                (ProfileAccumulator) self, so accumulators can be reduced.
+        """
+        for name, other_counts in other.moves.items():
+            if name not in self.moves:
+                self.moves[name] = [[0] * len(MOVES) for _ in range(NUM_STREETS)]
+                self.hands[name] = 0
+            self.hands[name] += other.hands[name]
+            for counts, street_counts in zip(self.moves[name], other_counts):
+                for move, count in enumerate(street_counts):
+                    counts[move] += count
+        return self
+
+    def profiles(self):
+        return dict((name, {'hands': self.hands[name], 'moves': self.moves[name]}) for name in self.moves)
+
+
+def ingest_file(filename, hero=None):
+    """
+    Counts the moves in one match log. A ContextRecorder log holds a record for every decision of our bot,
+    each with the hand's history so far, so a record whose history extends the previous record's is the
+    same hand and only its new entries are counted. Our own bot's moves, named by the records or by hero,
+    are left out.
+
+    Moves made after our bot's last decision of a hand aren't in any record, so they aren't counted.
+
+    :param filename: (str) path of the log, see read_hand_histories()
+    :param hero: (str) name of our bot in logs of bare contexts, None to count every player
+
+    :return:
+            (ProfileAccumulator) the log's counts.
+    """
+    accumulator = ProfileAccumulator()
+    previous_key = previous_history = None
+    seen = set()
+    deals = 0
+    for record in read_hand_histories(filename):
+        context = record.get('context', record)
+        bot = record.get('bot') or dict()
+        name = bot.get('name', hero)
+        history = context.get('history') or []
+        key = (name, tuple(bot.get('pocket') or ()))
+
+        start = 0
+        if key == previous_key and len(previous_history) <= len(history) and \
+                history[:len(previous_history)] == previous_history:
+            start = len(previous_history)
+        else:
+            seen = set()
+            deals = 0
+
+        for action_info in history[start:]:
+            move = action_info['type']
+            if move == 'DEAL':
+                deals += 1
+            elif move in MOVES and action_info['actor'] not in (name, None):
+                accumulator.add(action_info['actor'], min(deals, NUM_STREETS - 1), move,
+                                action_info['actor'] not in seen)
+                seen.add(action_info['actor'])
+        previous_key, previous_history = key, history
+    return accumulator
+
+
+def ingest(filenames, hero=None, processes=1):
+    """
+    Counts the moves in many match logs, one log per task of a pool of processes, and merges their counts.
+
+    :param filenames: (list) paths of the logs
+    :param hero: (str) name of our bot in logs of bare contexts, see ingest_file()
+    :param processes: (int) number of worker processes, 1 reads the logs in this process
+
+    :return:
+            (ProfileAccumulator) the counts of all logs.
+    """
+    accumulator = ProfileAccumulator()
+    if processes <= 1:
+        for filename in filenames:
+            accumulator.merge(ingest_file(filename, hero))
+        return accumulator
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(processes) as pool:
+        for counts in pool.map(ingest_file, filenames, [hero] * len(filenames)):
+            accumulator.merge(counts)
+    return accumulator
+
+
+def save_profiles(accumulator, filename=PROFILE_FILE):
+    """
+    Writes the counts as compact JSON. The file is written next to its destination and renamed over it,
+    so a bot starting a match never reads half a file.
+
+    :param accumulator: (ProfileAccumulator) the counts
+    :param filename: (str) path of the profile file
+
+    :return: (void)
+    """
+    temporary = filename + '.tmp'
+    with open(temporary, 'w') as file:
+        json.dump({'version': PROFILE_VERSION, 'profiles': accumulator.profiles()}, file, separators=(',', ':'))
+    os.replace(temporary, filename)
+
+
+def load_profiles(filename=PROFILE_FILE):
+    """
+    :param filename: (str) path of a file written by save_profiles()
+
+    :return:
+            (dict) player name -> profile with the 'hands' they played and their 'moves' per street, empty if
+            the file doesn't exist or is of another version.
+    """
+    if not os.path.isfile(filename):
+        return dict()
+    with open(filename) as file:
+        saved = json.load(file)
+    if saved.get('version') != PROFILE_VERSION:
+        return dict()
+    return saved['profiles']
+
+
+def move_rates(profile, street):
+    """
+    Calculates how often a player bets when nothing is to call, and raises or calls when facing a wager,
+    on a street. Rates seen fewer than MIN_OBSERVATIONS times are left out.
+
+    :param profile: (dict) the player's profile, see load_profiles()
+    :param street: (int) 0 pre-flop, 1 flop, 2 turn, 3 river
+
+    :return:
+            (dict) move -> share of the player's moves, for 'BET', 'RAISE' and 'CALL'.
+    """
+    check, bet, fold, call, _raise = profile['moves'][street]
+    rates = dict()
+    if check + bet >= MIN_OBSERVATIONS:
+        rates['BET'] = bet / float(check + bet)
+    if fold + call + _raise >= MIN_OBSERVATIONS:
+        rates['RAISE'] = _raise / float(fold + call + _raise)
+        rates['CALL'] = call / float(fold + call + _raise)
+    return rates
+
+
+def main(argv=None):
+    import argparse
+    from time import perf_counter
+
+    parser = argparse.ArgumentParser(description='Build opponent profiles from match logs.')
+    parser.add_argument('logs', nargs='+', help='match logs, plain or gzip, bz2 or xz compressed')
+    parser.add_argument('--output', default=PROFILE_FILE)
+    parser.add_argument('--hero', help='name of our bot in logs of bare contexts')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--update', action='store_true', help='add the counts to the profiles already in --output')
+    args = parser.parse_args(argv)
+
+    start = perf_counter()
+    accumulator = ingest(args.logs, args.hero, min(args.processes, len(args.logs)))
+    if args.update:
+        accumulator.merge(ProfileAccumulator(load_profiles(args.output)))
+    save_profiles(accumulator, args.output)
+
+    print('%d players from %d logs in %.2fs, written to %s' % (
+        len(accumulator.moves), len(args.logs), perf_counter() - start, args.output))
+    for name, profile in sorted(accumulator.profiles().items()):
+        print('  %s: %d hands' % (name, profile['hands']))
+        for street, label in enumerate(('pre-flop', 'flop', 'turn', 'river')):
+            rates = move_rates(profile, street)
+            if rates:
+                print('    %-9s %s' % (label, '  '.join('%s %.2f' % (move, rates[move]) for move in sorted(rates))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+__author__ = 'montanawong'
+
+import numpy as np
+from deuces3x.deuces.card import Card
+from .board_index import get_board_index
+from .cards import NUM_POCKETS
+from .preflop import CLASS_COMBOS, EQUITY_SCALE, POCKET_CLASSES, get_preflop_table
+from .profiles import move_rates
+
+
+# cards on the board after 0, 1, 2 and 3 DEALs of a hand's history
+BOARD_SIZES = (0, 3, 4, 5)
+# moves that put chips in the pot, their amount is added to it
+WAGERS = ('POST', 'BET', 'CALL', 'RAISE')
+# how the opponent's hand strength shapes the chance of each move, by move:
+#   threshold   the hand strength they make the move with half the time, for a wager of nothing
+#   size_slope  how far the threshold rises with the wager's share of the pot after it, a pot sized bet is half
+#   floor       the chance a hand far from the threshold makes the move anyway (a bluff, a slow play or a
+#               mistake), so no pocket is ever ruled out
+#   stronger    True if stronger hands make the move more often, False if weaker hands do
+ACTION_MODELS = {
+    'BET': (0.55, 0.25, 0.1, True),
+    'RAISE': (0.65, 0.25, 0.1, True),
+    'CALL': (0.35, 0.4, 0.1, True),
+    'CHECK': (0.55, 0.0, 0.3, False),
+}
+# spread of hand strengths over which a move goes from unlikely to likely
+STRENGTH_WIDTH = 0.08
+
+_preflop_strengths = None
+
+
+def preflop_strengths():
+    """
+    Ranks every pocket before the flop by its class's equity against a random hand, as the share of all
+    pockets it is stronger than (ties counted half), so it is spread over [0, 1] like hand strength after
+    the flop. Calculated once per process.
+
+    :return:
+            (ndarray) cards.NUM_POCKETS floats between 0 and 1.
+    """
+    global _preflop_strengths
+    if _preflop_strengths is None:
+        equities = get_preflop_table().dot(CLASS_COMBOS) / float(EQUITY_SCALE * CLASS_COMBOS.sum())
+        pocket_equities = equities[POCKET_CLASSES]
+        ordered = np.sort(pocket_equities)
+        weaker = np.searchsorted(ordered, pocket_equities, 'left')
+        not_stronger = np.searchsorted(ordered, pocket_equities, 'right')
+        _preflop_strengths = (weaker + not_stronger) / (2.0 * NUM_POCKETS)
+    return _preflop_strengths
+
+
+def profile_thresholds(profile, street):
+    """
+    Calibrates the thresholds of ACTION_MODELS to a player's profile. Hand strength is spread evenly over
+    [0, 1], so a player who bets a share r of the time when nothing is to call bets roughly the hands above
+    1 - r and checks the others. Facing a wager they raise the top share they raise with, call the share
+    below it and fold the rest.
+
+    :param profile: (dict) the player's profile, see utils/profiles.py
+    :param street: (int) 0 pre-flop, 1 flop, 2 turn, 3 river
+
+    :return:
+            (dict) move -> threshold, for the moves seen often enough on the street.
+    """
+    rates = move_rates(profile, street)
+    thresholds = dict()
+    if 'BET' in rates:
+        thresholds['BET'] = thresholds['CHECK'] = 1.0 - rates['BET']
+    if 'RAISE' in rates:
+        thresholds['RAISE'] = 1.0 - rates['RAISE']
+        thresholds['CALL'] = 1.0 - rates['RAISE'] - rates['CALL']
+    return thresholds
+
+
+def action_likelihoods(action, strengths, size=0.0, threshold=None):
+    """
+    Calculates how likely the opponent is to make a move with every pocket, from the pockets' hand
+    strengths, with the logistic model of the move in ACTION_MODELS.
+
+    :param action: (str) 'BET', 'RAISE', 'CALL' or 'CHECK'
+    :param strengths: (ndarray) hand strength of every pocket, see preflop_strengths() and
+                      BoardRankIndex.hand_strengths()
+    :param size: (float) the chips the move put in as a share of the pot after it, 0 for a check
+    :param threshold: (float) the move's threshold for this opponent, see profile_thresholds(); the default of
+                      ACTION_MODELS if None
+
+    :return:
+            (ndarray) a likelihood between the move's floor and 1 for every pocket.
+    """
+    default_threshold, size_slope, floor, stronger = ACTION_MODELS[action]
+    if threshold is None:
+        threshold = default_threshold
+    curve = np.tanh((strengths - threshold - size_slope * size) / (2 * STRENGTH_WIDTH))
+    if not stronger:
+        curve = -curve
+    # tanh(x / 2) is a logistic curve rescaled to [-1, 1]
+    return floor + (1.0 - floor) * 0.5 * (1.0 + curve)
+
+
+class RangeTracker(object):
+    """
+    Narrows the range of pockets the opponent may hold by what their moves in the hand's history reveal.
+    The range is a weight for every pocket, starting out uniform. Each of their moves multiplies it by how
+    likely every pocket is to make that move (see action_likelihoods()), given its hand strength on the
+    board at the time, which is Bayes' rule with the weights as the prior. The weights are rescaled so the
+    largest is 1.
+
+    Only the moves added to the history since the last update are read, so every update costs a few
+    vector operations over the 1326 pockets. A new pocket or a shorter history means a new hand, and the
+    range starts over. Opponents with a profile built from past matches have the thresholds of their moves
+    calibrated to it (see profile_thresholds()).
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    profiles              dict; player name -> profile, see utils/profiles.py
+    thresholds            dict; (player name, street) -> the thresholds of their moves, calculated once
+    weights               ndarray; a weight for each of the 1326 pockets in utils.cards.POCKETS
+    actions               int; moves of the opponent the range has been narrowed by
+    position              int; entries of the hand's history read so far
+    pocket                tuple; our pocket in the hand being tracked
+    deals                 int; DEALs read so far, the street the next move is made on
+    pot                   int; chips put in the pot so far
+
+    FUNCTIONS:
+    reset()               starts the range of a new hand over
+    update()              narrows the range by the opponent's moves since the last update
+    threshold()           the threshold of a player's move calibrated to their profile
+    ====================  ====================================================
+    """
+
+    def __init__(self, profiles=None):
+        self.profiles = profiles or dict()
+        self.thresholds = dict()
+        self.reset()
+
+    def reset(self, pocket=None):
+        """
+        :param pocket: (tuple) our pocket in the new hand
+
+        :return: (void)
+        """
+        self.weights = np.ones(NUM_POCKETS)
+        self.actions = 0
+        self.position = 0
+        self.pocket = pocket
+        self.deals = 0
+        self.pot = 0
+
+    def update(self, context, bot, evaluator):
+        """
+        :param context: (dict) A python dictionary containing an exhaustive table of everything related to the game,
+                        including but not limited to move history, pot size, and players.
+        :param bot: (MyBot) A MyBot object of the agent in the current HeadsUp poker game.
+        :param evaluator: (Evaluator) evaluator the board's rank index is built with if it isn't cached
+
+        :return:
+                (ndarray) the narrowed weights, shared with the tracker.
+        """
+        history = context['history']
+        pocket = tuple(bot.pocket)
+        if pocket != self.pocket or len(history) < self.position:
+            self.reset(pocket)
+
+        for action_info in history[self.position:]:
+            action = action_info['type']
+            amount = action_info.get('amount') or 0
+            if action == 'DEAL':
+                self.deals += 1
+            elif action in ACTION_MODELS and action_info['actor'] not in (bot.name, None):
+                board = context['board'][:BOARD_SIZES[min(self.deals, len(BOARD_SIZES) - 1)]]
+                if len(board) >= 3:
+                    strengths = get_board_index(list(map(Card.new, board)), evaluator).hand_strengths()
+                else:
+                    strengths = preflop_strengths()
+                size = amount / float(self.pot + amount) if amount else 0.0
+                self.weights *= action_likelihoods(
+                    action, strengths, size, self.threshold(action_info['actor'], action))
+                self.weights /= self.weights.max()
+                self.actions += 1
+            if action in WAGERS:
+                self.pot += amount
+        self.position = len(history)
+        return self.weights
+
+    def threshold(self, name, action):
+        """
+        :param name: (str) the player making the move
+        :param action: (str) the move
+
+        :return:
+                (float) the move's threshold on the current street calibrated to the player's profile, None if
+                they have none.
+        """
+        profile = self.profiles.get(name)
+        if profile is None:
+            return None
+        street = min(self.deals, len(BOARD_SIZES) - 1)
+        thresholds = self.thresholds.get((name, street))
+        if thresholds is None:
+            thresholds = self.thresholds[(name, street)] = profile_thresholds(profile, street)
+        return thresholds.get(action)
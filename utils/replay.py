@@ -0,0 +1,234 @@
+__author__ = 'montanawong'
+
+import gzip
+import json
+from importlib import import_module
+from time import perf_counter
+from .budget import EXACT, LOOKUP, MAX_SAMPLES, MONTE_CARLO, FixedScheduler
+
+
+# bot attributes the strategy reads while deciding, saved with every context
+BOT_STATE = ('name', 'pocket', 'aggression_factor', 'player_index', 'num_bets', 'num_checks', 'num_raises')
+STREETS = {0: 'pre-flop', 3: 'flop', 4: 'turn', 5: 'river'}
+
+
+def _plain(value):
+    # the engine's context is a dict sub-class, store it as plain JSON types
+    if isinstance(value, dict):
+        return dict((key, _plain(item)) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    elif value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+class ContextRecorder(object):
+    """
+    Records the contexts passed to MyBot.get_action(), together with the bot's state, to a gzipped
+    file of JSON lines. Attach one to a bot's recorder attribute to capture a corpus from real games.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = gzip.open(filename, 'at')
+
+    def record(self, context, bot):
+        """
+        :param context: (dict) the context the bot was asked to act in
+        :param bot: (MyBot) the bot, before it acts
+
+        :return: (void)
+        """
+        state = dict((attribute, _plain(getattr(bot, attribute, None))) for attribute in BOT_STATE)
+        self.file.write(json.dumps({'bot': state, 'context': _plain(context)}, separators=(',', ':')))
+        self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+def read_corpus(filename):
+    """
+    Streams the decisions out of a corpus written by ContextRecorder.
+
+    :param filename: (str) path of the corpus
+
+    :return:
+            (generator) dicts with the 'bot' state and the 'context' of every decision.
+    """
+    with gzip.open(filename, 'rt') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ReplayBot(object):
+    """
+    Stands in for MyBot when a recorded decision is replayed, holding the recorded bot state.
+    """
+
+    def __init__(self, state):
+        for attribute in BOT_STATE:
+            setattr(self, attribute, state.get(attribute))
+
+
+def load_strategy(spec):
+    """
+    :param spec: (str) a strategy class written as 'package.module:Class', e.g. 'montana.strategy:HeadsUpStrategy'
+
+    :return:
+            (class) the strategy class.
+    """
+    module, name = spec.split(':')
+    return getattr(import_module(module), name)
+
+
+def replay_decisions(records, spec, seed=0, backend='seven_card', method=EXACT, samples=MAX_SAMPLES):
+    """
+    Re-drives recorded decisions through a strategy's determine_action(). Every decision gets a strategy
+    of its own, with random streams derived from the seed and its position in the corpus, so nothing an
+    earlier decision left behind (the opponent's range, the scheduler's cost estimates) carries over and
+    results don't depend on the order decisions are replayed in or how they are split between processes.
+    The hand potential is always estimated with the given method, rather than the one a timed budget
+    would pick, so the same seed gives the same actions.
+
+    :param records: (list) (position, record) pairs from read_corpus()
+    :param spec: (str) the strategy class, see load_strategy()
+    :param seed: (int) master seed for the decisions
+    :param backend: (str) evaluator backend for the strategy
+    :param method: (str) equity method of flop and turn decisions, see utils/budget.py
+    :param samples: (int) runouts sampled when the method is Monte Carlo
+
+    :return:
+            (list) (position, street, action type, amount, latency in seconds) for every decision.
+    """
+    from .rng import derive_seed
+
+    strategy_class = load_strategy(spec)
+    results = []
+    for position, record in records:
+        bot = ReplayBot(record['bot'])
+        context = record['context']
+        strategy = strategy_class(backend=backend, seed=derive_seed(seed, 'replay:%d' % position))
+        strategy.scheduler = FixedScheduler(method, samples)
+
+        start = perf_counter()
+        action = strategy.determine_action(context, bot)
+        latency = perf_counter() - start
+        results.append((position, len(context['board']), action.get('type'), action.get('amount'), latency))
+    return results
+
+
+def replay(filename, spec, seed=0, backend='seven_card', processes=1, chunk_size=64, method=EXACT,
+           samples=MAX_SAMPLES):
+    """
+    Replays a whole corpus, optionally split across a pool of processes.
+
+    :param filename: (str) path of the corpus
+    :param spec: (str) the strategy class, see load_strategy()
+    :param seed: (int) master seed for the decisions
+    :param backend: (str) evaluator backend for the strategy
+    :param processes: (int) number of worker processes, 1 replays in this process
+    :param chunk_size: (int) decisions sent to a worker at a time
+    :param method: (str) equity method of flop and turn decisions, see replay_decisions()
+    :param samples: (int) runouts sampled when the method is Monte Carlo
+
+    :return:
+            (list) (position, street, action type, amount, latency in seconds) for every decision, in corpus order.
+    """
+    records = list(enumerate(read_corpus(filename)))
+    if processes <= 1:
+        return replay_decisions(records, spec, seed, backend, method, samples)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    results = []
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(replay_decisions, chunk, spec, seed, backend, method, samples) for chunk in chunks]
+        for future in futures:
+            results.extend(future.result())
+    return results
+
+
+def latency_report(results):
+    """
+    Summarises replay latencies per street.
+
+    :param results: (list) results of replay()
+
+    :return:
+            (dict) street -> count, mean, p50, p90, p99 and max latency in milliseconds.
+    """
+    report = dict()
+    for street in sorted(set(result[1] for result in results)):
+        latencies = sorted(1000 * result[4] for result in results if result[1] == street)
+        count = len(latencies)
+        report[STREETS.get(street, street)] = {
+            'count': count,
+            'mean': sum(latencies) / count,
+            'p50': latencies[int(0.5 * (count - 1))],
+            'p90': latencies[int(0.9 * (count - 1))],
+            'p99': latencies[int(0.99 * (count - 1))],
+            'max': latencies[-1]
+        }
+    return report
+
+
+def action_diffs(baseline, candidate):
+    """
+    Finds the decisions where two replays of the same corpus chose different actions.
+
+    :param baseline: (list) results of replay()
+    :param candidate: (list) results of replay() on the same corpus
+
+    :return:
+            (list) (position, street, baseline action, baseline amount, candidate action, candidate amount) tuples.
+    """
+    return [
+        (old[0], old[1], old[2], old[3], new[2], new[3])
+        for old, new in zip(baseline, candidate)
+        if old[2] != new[2] or old[3] != new[3]
+    ]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay recorded contexts through a strategy.')
+    parser.add_argument('corpus', help='corpus written by ContextRecorder')
+    parser.add_argument('--strategy', default=__package__.rsplit('.', 1)[0] + '.strategy:HeadsUpStrategy')
+    parser.add_argument('--compare', help='second strategy to diff the actions of')
+    parser.add_argument('--backend', default='seven_card')
+    parser.add_argument('--compare-backend', help='backend of the second strategy, same as --backend if omitted')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--method', choices=(EXACT, MONTE_CARLO, LOOKUP), default=EXACT,
+                        help='how flop and turn decisions estimate hand potential')
+    parser.add_argument('--samples', type=int, default=MAX_SAMPLES, help='runouts sampled by monte_carlo')
+    args = parser.parse_args(argv)
+
+    runs = [(args.strategy, args.backend)]
+    if args.compare or args.compare_backend:
+        runs.append((args.compare or args.strategy, args.compare_backend or args.backend))
+
+    results = []
+    for spec, backend in runs:
+        results.append(replay(args.corpus, spec, args.seed, backend, args.processes, method=args.method,
+                              samples=args.samples))
+        print('%s (%s)' % (spec, backend))
+        for street, stats in latency_report(results[-1]).items():
+            print('  %-9s n=%-6d mean %.2fms  p50 %.2fms  p90 %.2fms  p99 %.2fms  max %.2fms' % (
+                street, stats['count'], stats['mean'], stats['p50'], stats['p90'], stats['p99'], stats['max']))
+
+    if len(results) == 2:
+        diffs = action_diffs(*results)
+        print('%d of %d actions differ' % (len(diffs), len(results[0])))
+        for position, street, old_action, old_amount, new_action, new_amount in diffs:
+            print('  #%d %s: %s %s -> %s %s' % (
+                position, STREETS.get(street, street), old_action, old_amount, new_action, new_amount))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+__author__ = 'montanawong'
+
+import hashlib
+from random import Random, SystemRandom
+
+
+def derive_seed(seed, name):
+    """
+    Derives the seed of a named substream from a master seed. Hashing keeps the substreams
+    statistically independent of each other and of the master seed.
+
+    :param seed: (int) the master seed
+    :param name: (str) the substream's name
+
+    :return:
+            (int) a 128 bit seed.
+    """
+    digest = hashlib.sha256(('%d:%s' % (seed, name)).encode()).digest()
+    return int.from_bytes(digest[:16], 'little')
+
+
+class StrategyRandom(object):
+    """
+    The random number generators of a strategy. Every source of randomness gets its own stream derived
+    from one master seed, so a strategy created with the same seed makes the same decisions and
+    simulations, and strategies created with spawn() never share a stream.
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    seed                  int; the master seed, drawn from the OS if none was given so it can be recorded
+    decision              Random; stream for the noise in bet/call/raise decisions
+    monte_carlo           numpy Generator; stream for simulations, created on first use
+    spawned               int; children created so far, so that every call to spawn() gives new streams
+
+    FUNCTIONS:
+    spawn()               create independent child generators, e.g. one per worker process
+    deal()                deal many sets of distinct cards at once
+    ====================  ====================================================
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = SystemRandom().getrandbits(128)
+        self.seed = seed
+        self.decision = Random(derive_seed(seed, 'decision'))
+        self._monte_carlo = None
+        self.spawned = 0
+
+    @property
+    def monte_carlo(self):
+        if self._monte_carlo is None:
+            import numpy as np
+            self._monte_carlo = np.random.default_rng(derive_seed(self.seed, 'monte_carlo'))
+        return self._monte_carlo
+
+    def spawn(self, count):
+        """
+        Creates child generators whose streams are independent of this one and of each other, including the
+        children of earlier calls.
+
+        :param count: (int) number of children
+
+        :return:
+                (list) count StrategyRandom objects.
+        """
+        children = [StrategyRandom(derive_seed(self.seed, 'spawn:%d' % i))
+                    for i in range(self.spawned, self.spawned + count)]
+        self.spawned += count
+        return children
+
+    def deal(self, deck, num_deals, num_cards):
+        """
+        Deals num_cards distinct cards from the deck, num_deals times over, in random order.
+
+        :param deck: (ndarray) cards to deal from
+        :param num_deals: (int) number of deals
+        :param num_cards: (int) cards per deal
+
+        :return:
+                (ndarray) num_deals * num_cards cards.
+        """
+        import numpy as np
+
+        # each deal takes the cards with the smallest random keys, ordered by key
+        keys = self.monte_carlo.random((num_deals, len(deck)))
+        chosen = np.argpartition(keys, num_cards - 1, axis=1)[:, :num_cards]
+        order = np.argsort(np.take_along_axis(keys, chosen, axis=1), axis=1)
+        return deck[np.take_along_axis(chosen, order, axis=1)]
@@ -0,0 +1,188 @@
+__author__ = 'montanawong'
+
+import numpy as np
+from .cards import DECK, NUM_CARDS, POCKET_INDICES, card_indices, live_pockets
+from .preflop import NUM_CLASSES, POCKET_CLASSES
+
+
+# ways simulate_games() can sample pre-flop showdowns
+IID = 'iid'
+STRATIFIED = 'stratified'
+QUASI_RANDOM = 'quasi_random'
+# number of games dealt and evaluated per batch
+SIMULATION_CHUNK_SIZE = 10000
+# independently shifted copies of the quasi-random points, the spread of their means gives the standard error
+QMC_REPLICATES = 8
+# binomial coefficients C(n, k) for n < NUM_CARDS and k <= 5, to unrank boards
+BINOMIALS = np.array([[np.prod(np.arange(n - k + 1, n + 1)) // np.prod(np.arange(1, k + 1)) if k <= n else 0
+                       for k in range(6)] for n in range(NUM_CARDS)], dtype=np.int64)
+
+
+def showdowns(pocket, opponents, boards, evaluator):
+    """
+    :param pocket: (list) 2 card ints of our pocket
+    :param opponents: (ndarray) N * 2 card indices of the opponent's pockets
+    :param boards: (ndarray) N * 5 card indices of the boards
+    :param evaluator: (Evaluator) evaluator with evaluate_boards() and evaluate_hands()
+
+    :return:
+            (ndarray) N outcomes, 1 for a win, 0.5 for a tie and 0 for a loss.
+    """
+    ours = evaluator.evaluate_boards(list(pocket), DECK[boards])
+    theirs = evaluator.evaluate_hands(DECK[np.hstack((opponents, boards))])
+    # lower ranks are stronger hands
+    return (theirs > ours) + 0.5 * (theirs == ours)
+
+
+def iid_equity(pocket, samples, evaluator, rng):
+    """
+    Plain Monte Carlo: every game deals the opponent's pocket and the board at random.
+
+    :param pocket: (list) 2 card ints of our pocket
+    :param samples: (int) number of games
+    :param evaluator: (Evaluator) evaluator with evaluate_boards() and evaluate_hands()
+    :param rng: (StrategyRandom) random streams to deal from
+
+    :return:
+            (tuple) the equity and its standard error.
+    """
+    deck = np.setdiff1d(np.arange(NUM_CARDS), card_indices(pocket))
+    total = squares = 0.0
+    # deal the games in chunks to keep memory bounded
+    for start in range(0, samples, SIMULATION_CHUNK_SIZE):
+        deals = rng.deal(deck, min(SIMULATION_CHUNK_SIZE, samples - start), 7)
+        outcomes = showdowns(pocket, deals[:, :2], deals[:, 2:], evaluator)
+        total += outcomes.sum()
+        squares += np.square(outcomes).sum()
+    equity = total / samples
+    return equity, (max(squares / samples - equity ** 2, 0.0) / max(samples - 1, 1)) ** 0.5
+
+
+def deal_boards(dead, rng):
+    """
+    :param dead: (ndarray) N * k card indices already dealt in every game
+    :param rng: (StrategyRandom) random streams to deal from
+
+    :return:
+            (ndarray) N * 5 card indices, a random board for every game that avoids its dead cards.
+    """
+    keys = rng.monte_carlo.random((len(dead), NUM_CARDS))
+    keys[np.arange(len(dead))[:, None], dead] = 2.0
+    return np.argpartition(keys, 5, axis=1)[:, :5]
+
+
+def stratified_equity(pocket, samples, evaluator, rng):
+    """
+    Stratifies the games by the opponent's hand class (AKs, T9o, 77, ...). Every class gets its share of
+    the games in proportion to its live pockets, so the mix of opponent hands is exact rather than random
+    and only the variance within each class is left.
+
+    :param pocket: (list) 2 card ints of our pocket
+    :param samples: (int) number of games, about; every class gets at least 2
+    :param evaluator: (Evaluator) evaluator with evaluate_boards() and evaluate_hands()
+    :param rng: (StrategyRandom) random streams to deal from
+
+    :return:
+            (tuple) the equity and its standard error.
+    """
+    live = np.flatnonzero(live_pockets(pocket))
+    classes = POCKET_CLASSES[live]
+    combos = np.bincount(classes, minlength=NUM_CLASSES)
+    weights = combos / float(len(live))
+    allocation = np.where(combos > 0, np.maximum(2, np.round(samples * weights)), 0).astype(np.int64)
+
+    # the live pockets grouped by class, a game of class k picks one of its group at random
+    grouped = live[np.argsort(classes, kind='stable')]
+    starts = np.cumsum(combos) - combos
+    strata = np.repeat(np.arange(NUM_CLASSES), allocation)
+    picks = starts[strata] + (rng.monte_carlo.random(len(strata)) * combos[strata]).astype(np.int64)
+    opponents = POCKET_INDICES[grouped[picks]]
+    boards = deal_boards(np.hstack((np.tile(card_indices(pocket), (len(strata), 1)), opponents)), rng)
+    outcomes = showdowns(pocket, opponents, boards, evaluator)
+
+    counts = np.maximum(allocation, 1)
+    means = np.bincount(strata, outcomes, NUM_CLASSES) / counts
+    variances = (np.bincount(strata, np.square(outcomes), NUM_CLASSES) / counts - np.square(means)) * \
+        counts / np.maximum(counts - 1, 1)
+    equity = float(weights.dot(means))
+    return equity, float(np.square(weights).dot(np.maximum(variances, 0.0) / counts) ** 0.5)
+
+
+def halton(count, base):
+    """
+    :param count: (int) number of points
+    :param base: (int) a prime
+
+    :return:
+            (ndarray) the first count points of the base's van der Corput sequence, evenly spread over [0, 1).
+    """
+    indices = np.arange(1, count + 1)
+    points = np.zeros(count)
+    scale = 1.0
+    while indices.any():
+        scale /= base
+        points += scale * (indices % base)
+        indices //= base
+    return points
+
+
+def unrank_boards(ranks, deck):
+    """
+    Turns board numbers into boards with the combinatorial number system, so evenly spread numbers give
+    boards evenly spread over every combination of the deck.
+
+    :param ranks: (ndarray) N board numbers, each below C(48, 5)
+    :param deck: (ndarray) N * 48 card indices left in each game's deck, ascending
+
+    :return:
+            (ndarray) N * 5 card indices.
+    """
+    ranks = ranks.copy()
+    positions = np.empty((len(ranks), 5), dtype=np.int64)
+    for k in range(5, 0, -1):
+        # the largest position whose binomial fits in what is left of the rank
+        position = np.searchsorted(BINOMIALS[:, k], ranks, 'right') - 1
+        positions[:, k - 1] = position
+        ranks -= BINOMIALS[position, k]
+    return np.take_along_axis(deck, positions, axis=1)
+
+
+def quasi_random_equity(pocket, samples, evaluator, rng):
+    """
+    Randomised quasi-Monte Carlo: the opponent's pocket and the board are picked by numbering all of them
+    and reading the numbers off a 2-D Halton sequence, which covers the pockets and boards far more evenly
+    than random picks. QMC_REPLICATES copies of the points are shifted at random (a Cranley-Patterson
+    rotation), every copy is an unbiased estimate and their spread gives the standard error.
+
+    :param pocket: (list) 2 card ints of our pocket
+    :param samples: (int) number of games, split between the copies
+    :param evaluator: (Evaluator) evaluator with evaluate_boards() and evaluate_hands()
+    :param rng: (StrategyRandom) random streams to shift the points with
+
+    :return:
+            (tuple) the equity and its standard error.
+    """
+    live = np.flatnonzero(live_pockets(pocket))
+    size = max(samples // QMC_REPLICATES, 1)
+    points = np.column_stack((halton(size, 2), halton(size, 3)))
+    rows = np.arange(size)[:, None]
+
+    means = []
+    for _ in range(QMC_REPLICATES):
+        shifted = (points + rng.monte_carlo.random(2)) % 1.0
+        opponents = POCKET_INDICES[live[(shifted[:, 0] * len(live)).astype(np.int64)]]
+        dead = np.zeros((size, NUM_CARDS), dtype=bool)
+        dead[:, card_indices(pocket)] = True
+        dead[rows, opponents] = True
+        deck = np.nonzero(~dead)[1].reshape(size, NUM_CARDS - 4)
+        boards = unrank_boards((shifted[:, 1] * BINOMIALS[NUM_CARDS - 4, 5]).astype(np.int64), deck)
+        means.append(showdowns(pocket, opponents, boards, evaluator).mean())
+    return float(np.mean(means)), float(np.std(means, ddof=1) / QMC_REPLICATES ** 0.5)
+
+
+# simulate_games() method -> the function estimating equity with it
+SAMPLERS = {
+    IID: iid_equity,
+    STRATIFIED: stratified_equity,
+    QUASI_RANDOM: quasi_random_equity
+}
@@ -0,0 +1,371 @@
+__author__ = 'montanawong'
+
+# Serves many tables from one process. Clients speak newline delimited JSON over TCP or a unix socket;
+# every request carries an id that its reply echoes, so a client may pipeline requests for many tables
+# on one connection:
+#
+#     {"id": 1, "op": "open", "table": "t1", "name": "bot", "seed": 7}   -> {"id": 1, "ok": true}
+#     {"id": 2, "op": "pocket", "table": "t1", "cards": ["As", "Kd"]}    -> {"id": 2, "ok": true}
+#     {"id": 3, "op": "action", "table": "t1", "context": {...}}         -> {"id": 3, "ok": true, "action": {...}}
+#     {"id": 4, "op": "memory", "table": "t1", "notes": {...}}           -> {"id": 4, "ok": true}
+#     {"id": 5, "op": "close", "table": "t1"}                            -> {"id": 5, "ok": true}
+#     {"id": 6, "op": "stats"}                                           -> {"id": 6, "ok": true, "stats": {...}}
+#
+# An open may also give the table's "time_bank", the seconds its clock allows the bot per match.
+#
+# Failed requests are answered with {"id": ..., "ok": false, "error": "..."}. Tables belong to the
+# connection that opened them and are closed with it.
+#
+# Every table gets its own bot and strategy, which are small. The evaluators, board rank indexes, card
+# abstractions and preflop table are process wide (see evaluation.get_evaluator() and utils/tables.py),
+# so they are built once and shared by every table. Decisions run on a pool of threads, the event loop
+# only moves messages; a table's requests are handled one at a time and in order.
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from time import perf_counter
+from .replay import STREETS, _plain, load_strategy, read_corpus
+
+
+PACKAGE = __package__.rsplit('.', 1)[0]
+# default address of the server
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 7770
+# threads making decisions. With the seven_card backend most of a decision is NumPy work on the mapped tables,
+# which releases the GIL; deuces is pure Python, so its decisions run one at a time whatever the count
+SERVER_WORKERS = 4
+# longest request line accepted, contexts are a few KB
+MAX_MESSAGE_SIZE = 1 << 20
+
+
+def decide(bot, context):
+    # runs on a worker, timed there so the time spent queueing isn't counted
+    start = perf_counter()
+    action = bot.get_action(context)
+    return action, perf_counter() - start
+
+
+class BotServer(object):
+    """
+    Serves bots for many concurrent tables from a single process with asyncio.
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    bot_class             class; the bot created for every table, MyBot by default
+    backend               str; evaluator backend of every table's strategy, seven_card unless A/B testing deuces
+    equity_cache          str or None; database of the persistent equity cache every table shares, see
+                          utils/equity_cache.py
+    policy                str or None; compiled policy table every table's strategy samples its actions from,
+                          see utils/policy.py
+    executor              ThreadPoolExecutor; the workers that make decisions
+    stats                 dict; open tables, requests served, decisions made and the seconds workers spent on them
+
+    FUNCTIONS:
+    start()               start listening on a TCP port or a unix socket
+    close()               stop listening and shut the workers down
+    handle_connection()   serve the requests of one client connection
+    handle()              answer a single request
+    ====================  ====================================================
+    """
+
+    def __init__(self, bot_spec=None, backend='seven_card', workers=SERVER_WORKERS, equity_cache=None, policy=None):
+        self.bot_class = load_strategy(bot_spec or PACKAGE + '.my_bot:MyBot')
+        self.backend = backend
+        self.equity_cache = equity_cache
+        self.policy = policy
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='decide')
+        self.stats = {'tables': 0, 'requests': 0, 'decisions': 0, 'decision_seconds': 0.0, 'errors': 0}
+        self.server = None
+
+    async def start(self, host=SERVER_HOST, port=SERVER_PORT, path=None):
+        """
+        :param host: (str) address to listen on
+        :param port: (int) TCP port to listen on, 0 picks a free one
+        :param path: (str) listen on this unix socket instead of TCP
+
+        :return:
+                (Server) the asyncio server.
+        """
+        from .startup import warm_up
+
+        # build the shared evaluator and tables before the first table needs them
+        await asyncio.get_event_loop().run_in_executor(self.executor, warm_up, (self.backend,))
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path, limit=MAX_MESSAGE_SIZE)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_MESSAGE_SIZE)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+        if self.equity_cache is not None:
+            from .equity_cache import get_equity_cache
+            get_equity_cache(self.equity_cache).flush()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Reads requests until the client hangs up. Every request is answered by its own task, so the
+        tables of a connection are decided concurrently.
+
+        :param reader: (StreamReader) the connection's reader
+        :param writer: (StreamWriter) the connection's writer
+
+        :return: (void)
+        """
+        tables = dict()
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(self.respond(tables, line, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            self.stats['tables'] -= len(tables)
+            writer.close()
+
+    async def respond(self, tables, line, writer):
+        # errors are sent back to the client rather than dropping its connection
+        request = dict()
+        try:
+            request = json.loads(line)
+            reply = await self.handle(tables, request)
+        except Exception as error:
+            self.stats['errors'] += 1
+            reply = {'ok': False, 'error': '%s: %s' % (type(error).__name__, error)}
+        reply['id'] = request.get('id')
+        try:
+            writer.write(json.dumps(reply, separators=(',', ':')).encode() + b'\n')
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def handle(self, tables, request):
+        """
+        :param tables: (dict) table id -> [bot, asyncio.Lock] of the connection
+        :param request: (dict) the decoded request
+
+        :return:
+                (dict) the reply, without its id.
+
+        :exception:
+                (KeyError) if the table or a field of the request is missing.
+                (ValueError) if the op is unknown.
+        """
+        self.stats['requests'] += 1
+        op = request['op']
+        if op == 'stats':
+            return {'ok': True, 'stats': dict(self.stats)}
+        elif op == 'open':
+            bot = self.bot_class(request.get('name'), seed=request.get('seed'))
+            if hasattr(bot, 'strategy'):
+                bot.strategy.backend = self.backend
+                if request.get('time_bank') is not None:
+                    bot.time_bank = bot.strategy.scheduler.time_bank = float(request['time_bank'])
+                if self.equity_cache is not None:
+                    from .equity_cache import get_equity_cache
+                    bot.strategy.equity_cache = get_equity_cache(self.equity_cache)
+                if self.policy is not None:
+                    from .policy import get_policy_table
+                    bot.strategy.policy = get_policy_table(self.policy)
+            if request['table'] not in tables:
+                self.stats['tables'] += 1
+            tables[request['table']] = [bot, asyncio.Lock()]
+            return {'ok': True}
+
+        bot, lock = tables[request['table']]
+        async with lock:
+            if op == 'pocket':
+                bot.set_pocket(*request['cards'])
+            elif op == 'action':
+                action, seconds = await asyncio.get_event_loop().run_in_executor(
+                    self.executor, decide, bot, request['context'])
+                self.stats['decisions'] += 1
+                self.stats['decision_seconds'] += seconds
+                return {'ok': True, 'action': _plain(action)}
+            elif op == 'memory':
+                bot.set_memory(request['notes'])
+            elif op == 'close':
+                del tables[request['table']]
+                self.stats['tables'] -= 1
+            else:
+                raise ValueError('unknown op %r' % op)
+        return {'ok': True}
+
+
+class BotClient(object):
+    """
+    Talks to a BotServer, standing in for the engine. Requests may be sent from many tasks at once;
+    replies are matched to them by id.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = count(1)
+        self.waiting = dict()
+        self.listener = asyncio.ensure_future(self.listen())
+
+    @classmethod
+    async def connect(cls, host=SERVER_HOST, port=SERVER_PORT, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=MAX_MESSAGE_SIZE)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=MAX_MESSAGE_SIZE)
+        return cls(reader, writer)
+
+    async def listen(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = self.waiting.pop(reply.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError('server closed the connection'))
+
+    async def request(self, op, **fields):
+        """
+        :param op: (str) the request's op, see the top of this module
+        :param fields: the request's other fields, e.g. table and context
+
+        :return:
+                (dict) the reply.
+
+        :exception:
+                (RuntimeError) if the server couldn't handle the request.
+        """
+        fields['op'] = op
+        fields['id'] = next(self.ids)
+        future = asyncio.get_event_loop().create_future()
+        self.waiting[fields['id']] = future
+        self.writer.write(json.dumps(fields, separators=(',', ':')).encode() + b'\n')
+        await self.writer.drain()
+        reply = await future
+        if not reply.get('ok'):
+            raise RuntimeError(reply.get('error'))
+        return reply
+
+    async def close(self):
+        self.writer.close()
+        await asyncio.gather(self.listener, return_exceptions=True)
+
+
+async def replay_table(client, table, records, seed=None):
+    """
+    Plays recorded decisions at one table of the server, as the engine would: the pocket, then the context.
+
+    :param client: (BotClient) a connected client
+    :param table: (str) the table's id
+    :param records: (list) records from read_corpus()
+    :param seed: (int) seed of the table's bot
+
+    :return:
+            (list) (table, street, action type, latency in seconds) for every decision.
+    """
+    results = []
+    await client.request('open', table=table, name=records[0]['bot']['name'] if records else None, seed=seed)
+    for record in records:
+        await client.request('pocket', table=table, cards=record['bot']['pocket'])
+        start = perf_counter()
+        reply = await client.request('action', table=table, context=record['context'])
+        results.append((table, len(record['context']['board']), reply['action'].get('type'), perf_counter() - start))
+    await client.request('close', table=table)
+    return results
+
+
+async def replay_tables(filename, tables, host=SERVER_HOST, port=SERVER_PORT, path=None, connections=1, seed=0):
+    """
+    Replays a corpus at many concurrent tables of a running server, dealing its decisions out to the tables
+    in turn and spreading the tables over a few connections.
+
+    :param filename: (str) corpus written by ContextRecorder
+    :param tables: (int) number of concurrent tables
+    :param host: (str) the server's address
+    :param port: (int) the server's port
+    :param path: (str) the server's unix socket, instead of host and port
+    :param connections: (int) client connections to open
+    :param seed: (int) tables' bots are seeded seed, seed + 1, ...
+
+    :return:
+            (tuple) the results of replay_table() for every decision, and the seconds the replay took.
+    """
+    records = list(read_corpus(filename))
+    clients = [await BotClient.connect(host, port, path) for _ in range(connections)]
+    start = perf_counter()
+    try:
+        runs = await asyncio.gather(*[
+            replay_table(clients[table % connections], 't%d' % table, records[table::tables], seed + table)
+            for table in range(tables)
+        ])
+    finally:
+        for client in clients:
+            await client.close()
+    return [result for run in runs for result in run], perf_counter() - start
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve bots for many tables, or replay a corpus against a server.')
+    parser.add_argument('command', choices=('serve', 'replay'))
+    parser.add_argument('corpus', nargs='?', help='corpus written by ContextRecorder, for replay')
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--path', help='unix socket to use instead of TCP')
+    parser.add_argument('--bot', help='bot class as package.module:Class, MyBot if omitted')
+    parser.add_argument('--backend', default='seven_card')
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS)
+    parser.add_argument('--equity-cache', help='database of a persistent equity cache for every table to share')
+    parser.add_argument('--policy', help='compiled policy table for every table to sample its actions from')
+    parser.add_argument('--tables', type=int, default=100)
+    parser.add_argument('--connections', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if args.command == 'serve':
+        server = BotServer(args.bot, args.backend, args.workers, args.equity_cache, args.policy)
+        loop.run_until_complete(server.start(args.host, args.port, args.path))
+        print('serving on %s' % (args.path or '%s:%d' % (args.host, args.port)))
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            loop.run_until_complete(server.close())
+        return
+
+    if args.corpus is None:
+        parser.error('replay needs a corpus')
+    results, seconds = loop.run_until_complete(replay_tables(
+        args.corpus, args.tables, args.host, args.port, args.path, args.connections, args.seed))
+    print('%d decisions at %d tables in %.2fs, %.1f decisions/s' % (
+        len(results), args.tables, seconds, len(results) / seconds))
+    for street in sorted(set(result[1] for result in results)):
+        latencies = sorted(1000 * result[3] for result in results if result[1] == street)
+        print('  %-9s n=%-6d p50 %.2fms  p99 %.2fms' % (
+            STREETS.get(street, street), len(latencies),
+            latencies[int(0.5 * (len(latencies) - 1))], latencies[int(0.99 * (len(latencies) - 1))]))
+
+
+if __name__ == "__main__":
+    main()
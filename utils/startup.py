@@ -0,0 +1,111 @@
+__author__ = 'montanawong'
+
+import os
+import sys
+import json
+import subprocess
+from threading import Thread
+
+
+# name of the package the bot is installed as, e.g. 'montana'
+PACKAGE = __package__.rsplit('.', 1)[0]
+
+# run in a fresh interpreter by measure_cold_start(), prints the time of every phase in ms
+COLD_START_SCRIPT = """
+import json
+import time
+
+start = time.perf_counter()
+from {package}.my_bot import MyBot
+from {package}.utils.contexts import make_context, deal
+from {package}.utils.startup import warm_up
+imported = time.perf_counter()
+
+bot = MyBot('bot')
+constructed = time.perf_counter()
+
+if {warm}:
+    warm_up(({backend!r},))
+warmed = time.perf_counter()
+
+pocket, board = deal({num_board_cards}, seed=0)
+bot.set_pocket(*pocket)
+bot.get_action(make_context(board, name='bot', opponents_last_move='BET', amount_to_call=10))
+acted = time.perf_counter()
+
+print(json.dumps({{
+    'import': 1000 * (imported - start),
+    'construct': 1000 * (constructed - imported),
+    'warm_up': 1000 * (warmed - constructed),
+    'first_action': 1000 * (acted - warmed),
+    'total': 1000 * (acted - start)
+}}))
+"""
+
+
+def warm_up(backends=('seven_card',), background=False):
+    """
+    Loads everything the first decision would otherwise pay for: NumPy, the evaluators of the given
+    backends and the mapped tables. Nothing is loaded when the bot is imported or constructed, so
+    call this once the process has time to spare, e.g. right after spawning a bot for a match.
+    On an install without the shipped seven card table this is also where the table is built and
+    saved to the data directory (see tables.data_path()), rather than on the first decision.
+
+    :param backends: (tuple) evaluator backends to build, see evaluation.EVALUATOR_BACKENDS
+    :param background: (boolean) load on a daemon thread and return at once
+
+    :return:
+            (Thread) the warm-up thread if background is True, None otherwise.
+    """
+    if background:
+        thread = Thread(target=warm_up, args=(backends,), name='warm-up')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    from .evaluation import get_evaluator
+    from .preflop import get_preflop_table
+    from .abstraction import get_abstraction
+    from . import board_index
+
+    for backend in backends:
+        get_evaluator(backend)
+    try:
+        get_preflop_table()
+    except FileNotFoundError:
+        pass
+    for num_board_cards in (3, 4):
+        get_abstraction(num_board_cards)
+
+
+def measure_cold_start(num_board_cards=3, warm=False, backend='seven_card'):
+    """
+    Times a bot from the import of its package to its first get_action() in a fresh interpreter,
+    so that nothing is already imported or cached.
+
+    :param num_board_cards: (int) street of the first action, 0 for pre-flop, 3 for the flop
+    :param warm: (boolean) call warm_up() between constructing the bot and its first action
+    :param backend: (str) evaluator backend to warm up
+
+    :return:
+            (dict) milliseconds spent importing, constructing, warming up and on the first action, and in total.
+    """
+    script = COLD_START_SCRIPT.format(
+        package=PACKAGE,
+        warm=bool(warm),
+        backend=backend,
+        num_board_cards=num_board_cards
+    )
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(path for path in sys.path if path)
+    output = subprocess.check_output([sys.executable, '-c', script], env=env)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    for street, num_board_cards in (('pre-flop', 0), ('flop', 3)):
+        for warm in (False, True):
+            timings = measure_cold_start(num_board_cards, warm)
+            print("%-9s %-7s " % (street, 'warm' if warm else 'cold') +
+                  '  '.join('%s %.1fms' % (phase, timings[phase])
+                            for phase in ('import', 'construct', 'warm_up', 'first_action', 'total')))
@@ -0,0 +1,114 @@
+__author__ = 'montanawong'
+
+# Hosts the precomputed tables of the bot so that every process on a host shares a single copy.
+#
+# Tables are files mapped read-only with mmap. The operating system backs every read-only mapping of a
+# file with the same page cache pages, so the first process to touch a page pays for reading it and
+# every other bot process, forked or spawned, reads the very same physical memory. Nothing is copied
+# into the Python heap; the NumPy arrays handed out are read-only views of the mapping.
+#
+# Memory footprint, shared once per host however many workers are running:
+#     seven_card_table.bin    ~450KB  SevenCardEvaluator flush ranks, keys and ranks
+#     preflop_equity.bin      ~57KB   169x169 preflop all-in equities
+#     abstraction_flop.bin    ~2.3MB  bucket ids of every flop hand, see abstraction.py
+#     <table>.bin             16 bytes per entry, HS/EHS caches written by save_cache_table()
+# Still private to every process:
+#     deuces lookup tables    ~1MB    python dicts can't live in shared memory, load them with
+#                                     evaluation.load_evaluator() to at least skip generating them
+#     board rank indexes      ~90KB per cached board, up to BOARD_INDEX_CACHE_SIZE (256) boards, ~23MB
+#
+# Tables shipped with the bot are read from the package. Whatever the bot builds or caches at run time goes to
+# the data directory instead (see data_path()), so the package may be installed read-only.
+
+import os
+import mmap
+from threading import Lock
+import numpy as np
+
+
+# name of the package the bot is installed as, e.g. 'montana'
+PACKAGE = __package__.rsplit('.', 1)[0]
+# environment variable naming the data directory, the user's cache directory is used if it isn't set
+DATA_DIR_VARIABLE = 'MONTANA_DATA_DIR'
+
+_maps = dict()
+_arrays = dict()
+_tables_lock = Lock()
+
+
+def data_path(filename):
+    """
+    Returns where a file the bot builds or caches at run time is kept: in the directory named by the
+    MONTANA_DATA_DIR environment variable, or else in ~/.cache/<package> (or $XDG_CACHE_HOME/<package>).
+    The directory may not exist yet.
+
+    :param filename: (str) name of the file, e.g. 'seven_card_table.bin'
+
+    :return:
+            (str) absolute path of the file.
+    """
+    directory = os.environ.get(DATA_DIR_VARIABLE)
+    if not directory:
+        cache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        directory = os.path.join(cache, PACKAGE)
+    return os.path.abspath(os.path.join(directory, filename))
+
+
+def map_file(filename):
+    """
+    Maps a whole file read-only, once per process.
+
+    :param filename: (str) path of the table file
+
+    :return:
+            (mmap) the mapping, shared with every other process mapping the file.
+
+    :exception:
+            (FileNotFoundError) if the file doesn't exist.
+    """
+    filename = os.path.abspath(filename)
+    mapping = _maps.get(filename)
+    if mapping is None:
+        with _tables_lock:
+            mapping = _maps.get(filename)
+            if mapping is None:
+                with open(filename, 'rb') as file:
+                    mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                _maps[filename] = mapping
+    return mapping
+
+
+def get_table(filename, dtype, shape=None, offset=0):
+    """
+    Returns a read-only NumPy view of (part of) a table file without copying it.
+
+    :param filename: (str) path of the table file
+    :param dtype: (str or dtype) type of the table's entries, e.g. '<u2'
+    :param shape: (tuple) shape of the table, the rest of the file as a flat array if omitted
+    :param offset: (int) number of bytes to skip at the start of the file
+
+    :return:
+            (ndarray) the table.
+    """
+    key = (os.path.abspath(filename), np.dtype(dtype).str, shape, offset)
+    table = _arrays.get(key)
+    if table is None:
+        mapping = map_file(filename)
+        count = -1 if shape is None else int(np.prod(shape))
+        table = np.frombuffer(mapping, dtype=dtype, count=count, offset=offset)
+        if shape is not None:
+            table = table.reshape(shape)
+        with _tables_lock:
+            table = _arrays.setdefault(key, table)
+    return table
+
+
+def mapped_bytes():
+    """
+    Reports how much of each table file this process has mapped.
+
+    :return:
+            (dict) file path -> size of its mapping in bytes.
+    """
+    with _tables_lock:
+        return dict((filename, len(mapping)) for filename, mapping in _maps.items())
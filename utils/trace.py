@@ -0,0 +1,229 @@
+__author__ = 'montanawong'
+
+import os
+import glob
+import time
+import struct
+from collections import namedtuple
+from queue import Queue, Full
+from threading import Thread
+from deuces3x.deuces.card import Card
+
+
+TRACE_MAGIC = b'DTRC'
+TRACE_VERSION = 1
+# magic, version, record size
+TRACE_HEADER = struct.Struct('<4sHH')
+# time, street, 2 pocket cards, 5 board cards, HS, PPot, NPot, risk, action, amount, compute time (s)
+TRACE_RECORD = struct.Struct('<dB2B5BffffBIf')
+# board slots without a card
+NO_CARD = 255
+
+ACTIONS = ('fold', 'check', 'call', 'bet', 'raise')
+ACTION_CODES = dict((action, code) for code, action in enumerate(ACTIONS))
+
+DecisionRecord = namedtuple('DecisionRecord', [
+    'time', 'street', 'pocket', 'board', 'hand_strength', 'pos_potential', 'neg_potential',
+    'risk', 'action', 'amount', 'compute_time'
+])
+
+
+def card_index(card):
+    """
+    :param card: (str) a card, e.g. 'Ah'
+
+    :return:
+            (int) the card's index in cards.DECK, between 0 and 51.
+    """
+    card = Card.new(card)
+    return 4 * Card.get_rank_int(card) + Card.get_suit_int(card).bit_length() - 1
+
+
+def card_string(index):
+    """
+    :param index: (int) a card index, between 0 and 51
+
+    :return:
+            (str) the card, e.g. 'Ah'.
+    """
+    return Card.STR_RANKS[index // 4] + 'shdc'[index % 4]
+
+
+class DecisionTracer(object):
+    """
+    Appends a fixed width binary record of every decision to a rotating log. record() only puts
+    the raw values on a queue; packing and writing happen on a background thread, so tracing
+    never blocks get_action(). If the writer falls behind and the queue is full the record is
+    dropped and counted rather than waiting. So is a record that can't be packed (e.g. an amount
+    out of range) or written (e.g. a full disk); the writer carries on with the next one.
+
+    Files are named <prefix>.<number>.trace and start with a small header. A new file is started once
+    the current one reaches max_bytes, and the oldest files are deleted beyond max_files.
+
+    ====================  =====================================================
+    Attribute             Description
+    ====================  =====================================================
+
+    DATA:
+    directory             str; where the trace files are written
+    prefix                str; start of every trace file's name
+    max_bytes             int; size at which a new file is started
+    max_files             int or None; number of files to keep, at least 1, all of them if None
+    dropped               int; records dropped because the queue was full or they couldn't be packed or written
+
+    FUNCTIONS:
+    record()              queue a decision to be written
+    close()               write out every queued record and stop the writer
+    ====================  ====================================================
+    """
+
+    def __init__(self, directory, prefix='decisions', max_bytes=64 * 1024 * 1024, max_files=None,
+                 queue_size=100000):
+        if max_files is not None and max_files < 1:
+            raise ValueError('max_files must be at least 1, or None to keep every file')
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.dropped = 0
+
+        os.makedirs(directory, exist_ok=True)
+        existing = self._files()
+        self._number = int(existing[-1].rsplit('.', 2)[-2]) + 1 if existing else 0
+        self._file = None
+        self._size = 0
+
+        self._queue = Queue(queue_size)
+        self._writer = Thread(target=self._write, name='decision-tracer')
+        self._writer.daemon = True
+        self._writer.start()
+
+    def record(self, street, pocket, board, hand_strength, pos_potential, neg_potential, risk, action,
+               amount, compute_time):
+        """
+        Queues a decision to be written.
+
+        :param street: (int) number of board cards, 0 pre-flop
+        :param pocket: (list) our 2 card strs
+        :param board: (list) the board's card strs
+        :param hand_strength: (float) HS or EHS the decision was based on
+        :param pos_potential: (float) positive potential, 0 if not computed
+        :param neg_potential: (float) negative potential, 0 if not computed
+        :param risk: (float) risk of the chosen bet/raise/call
+        :param action: (str) 'fold', 'check', 'call', 'bet' or 'raise'
+        :param amount: (int) chips put in by the action
+        :param compute_time: (float) seconds spent deciding
+
+        :return: (void)
+        """
+        try:
+            self._queue.put_nowait((time.time(), street, pocket, board, hand_strength, pos_potential,
+                                    neg_potential, risk, action, amount, compute_time))
+        except Full:
+            self.dropped += 1
+
+    def close(self):
+        """
+        Writes every queued record, closes the current file and stops the writer thread.
+
+        :return: (void)
+        """
+        # a writer that is gone would never take the sentinel off a full queue
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def _files(self):
+        return sorted(glob.glob(os.path.join(self.directory, self.prefix + '.*.trace')))
+
+    def _open(self):
+        path = os.path.join(self.directory, '%s.%06d.trace' % (self.prefix, self._number))
+        self._number += 1
+        self._file = open(path, 'ab', buffering=1024 * 1024)
+        self._file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, TRACE_RECORD.size))
+        self._size = TRACE_HEADER.size
+
+        if self.max_files is not None:
+            for old in self._files()[:-self.max_files]:
+                os.remove(old)
+
+    def _write(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            # a bad record or a failed write loses that record only, the writer must outlive it
+            try:
+                self._write_record(item)
+            except Exception:
+                self.dropped += 1
+                continue
+
+            # flush whenever the writer catches up so that readers see every record
+            if self._queue.empty():
+                try:
+                    self._file.flush()
+                except OSError:
+                    pass
+
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+
+    def _write_record(self, item):
+        (timestamp, street, pocket, board, hand_strength, pos_potential, neg_potential, risk, action,
+         amount, compute_time) = item
+        board = [card_index(card) for card in board] + [NO_CARD] * (5 - len(board))
+        packed = TRACE_RECORD.pack(
+            timestamp, street, card_index(pocket[0]), card_index(pocket[1]), *board,
+            hand_strength, pos_potential, neg_potential, risk, ACTION_CODES[action], amount, compute_time
+        )
+
+        if self._file is None or self._size >= self.max_bytes:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._open()
+        self._file.write(packed)
+        self._size += TRACE_RECORD.size
+
+
+def read_traces(paths, chunk_records=4096):
+    """
+    Streams the decisions out of trace files, reading a chunk at a time, so that any amount of
+    trace data is read in constant memory.
+
+    :param paths: (str or list) a trace file, a directory of trace files, or a list of trace files
+    :param chunk_records: (int) records read per chunk
+
+    :return:
+            (generator) DecisionRecord objects in the order they were written; cards are card indices
+            (see card_string()) and the board holds only the cards that were dealt.
+    """
+    if isinstance(paths, str):
+        if os.path.isdir(paths):
+            paths = sorted(glob.glob(os.path.join(paths, '*.trace')))
+        else:
+            paths = [paths]
+
+    for path in paths:
+        with open(path, 'rb') as file:
+            magic, version, record_size = TRACE_HEADER.unpack(file.read(TRACE_HEADER.size))
+            if magic != TRACE_MAGIC or record_size != TRACE_RECORD.size:
+                raise IOError("%s is not a version %d trace file" % (path, TRACE_VERSION))
+
+            while True:
+                chunk = file.read(record_size * chunk_records)
+                # a trailing partial record is still being written
+                chunk = chunk[:len(chunk) - len(chunk) % record_size]
+                if not chunk:
+                    break
+                for fields in TRACE_RECORD.iter_unpack(chunk):
+                    yield DecisionRecord(
+                        fields[0], fields[1], fields[2:4],
+                        tuple(card for card in fields[4:9] if card != NO_CARD),
+                        fields[9], fields[10], fields[11], fields[12], ACTIONS[fields[13]],
+                        fields[14], fields[15]
+                    )